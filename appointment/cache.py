@@ -0,0 +1,36 @@
+import hashlib
+import logging
+import uuid
+
+from django.core.cache import cache
+
+logger = logging.getLogger('fuelapp')
+
+# replaced on every appointment write of the clinic, which retires all the
+# cached doctor counts of that clinic at once
+VERSION_KEY = 'doctor_counts:version:{}'
+
+
+def clinic_version(clinic_id):
+    return cache.get_or_set(VERSION_KEY.format(clinic_id), new_version, None)
+
+
+def new_version():
+    return uuid.uuid4().hex
+
+
+def doctor_counts_key(clinic_id, params):
+    query = hashlib.md5(repr(sorted(params.items())).encode()).hexdigest()
+    return f'doctor_counts:{clinic_id}:{clinic_version(clinic_id)}:{query}'
+
+
+def invalidate_doctor_counts(clinic_id):
+    # counts over every clinic go stale on a write in any of them
+    try:
+        cache.set_many({VERSION_KEY.format(clinic_id): new_version(),
+                        VERSION_KEY.format(None): new_version()}, None)
+    except Exception as e:
+        # runs after the commit, the write stands; the cached counts expire
+        # with DOCTOR_COUNTS_CACHE_TIMEOUT
+        logger.warning(f'doctor counts: could not invalidate clinic '
+                       f'{clinic_id}: {e}')
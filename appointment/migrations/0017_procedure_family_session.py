@@ -0,0 +1,41 @@
+# Generated by Django 4.2.13 on 2026-10-18 18:16
+
+import re
+
+from django.db import migrations, models
+
+
+def backfill_family_session(apps, schema_editor):
+    # same rules as appointment.models.procedure_family/procedure_session
+    Procedure = apps.get_model('appointment', 'Procedure')
+    procedures = list(Procedure.objects.all())
+    for procedure in procedures:
+        name = procedure.name
+        procedure.family = name.split(' ')[0].strip() \
+            if '>' in name or '-' in name else name
+        session = re.search(r'(\d+)\s*/\s*(\d+)', name)
+        procedure.session = f'{session.group(1)}/{session.group(2)}' \
+            if session else None
+    Procedure.objects.bulk_update(procedures, ['family', 'session'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointment', '0016_doctorcategory'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='procedure',
+            name='family',
+            field=models.CharField(blank=True, db_index=True, max_length=100, null=True),
+        ),
+        migrations.AddField(
+            model_name='procedure',
+            name='session',
+            field=models.CharField(blank=True, max_length=10, null=True),
+        ),
+        migrations.RunPython(backfill_family_session,
+                             migrations.RunPython.noop),
+    ]
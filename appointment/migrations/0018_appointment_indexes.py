@@ -0,0 +1,40 @@
+# Generated by Django 4.2.13 on 2026-10-18 18:48
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # build the indexes without locking appointment writes
+    atomic = False
+
+    dependencies = [
+        ('appointment', '0017_procedure_family_session'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='appointment',
+            index=models.Index(fields=['clinic', 'scheduled_from'], name='appointment_clinic_from_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='appointment',
+            index=models.Index(fields=['doctor', 'scheduled_from'], name='appointment_doctor_from_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='appointment',
+            index=models.Index(fields=['patient', 'scheduled_from'], name='appointment_patient_from_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='appointment',
+            index=models.Index(fields=['scheduled_from'], name='appointment_from_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='appointment',
+            index=models.Index(condition=models.Q(('appointment_status__in', ['cancelled', 'checked_out']), _negated=True), fields=['created_by', 'scheduled_from'], name='appointment_open_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='appointment',
+            index=models.Index(condition=models.Q(('appointment_status', 'cancelled')), fields=['clinic', 'scheduled_from'], name='appointment_cancelled_idx'),
+        ),
+    ]
@@ -1,3 +1,5 @@
+import re
+
 from django.db import models
 
 from clinic.models import Clinic
@@ -20,8 +22,26 @@ class Tax(models.Model):
         return f'{self.name} {self.percentage}'
 
 
+def procedure_family(name):
+    # 'Chiropractic Treatment Plan > Session 1/12' -> 'Chiropractic',
+    # 'Physiotherapy Plus - 1/12' -> 'Physiotherapy'
+    if '>' in name or '-' in name:
+        return name.split(' ')[0].strip()
+    return name
+
+
+def procedure_session(name):
+    # 'Physiotherapy Plus - 1/12' -> '1/12'
+    session = re.search(r'(\d+)\s*/\s*(\d+)', name)
+    return f'{session.group(1)}/{session.group(2)}' if session else None
+
+
 class Procedure(models.Model):
     name = models.CharField(max_length=100)
+    # derived from name on save, reports group by these
+    family = models.CharField(max_length=100, null=True, blank=True,
+                              db_index=True)
+    session = models.CharField(max_length=10, null=True, blank=True)
     clinic = models.ForeignKey(Clinic, on_delete=models.DO_NOTHING, blank=True,
                                null=True)
     description = models.TextField(null=True, blank=True)
@@ -41,6 +61,15 @@ class Procedure(models.Model):
     def __str__(self):
         return "{} - {} - {}".format(self.name, self.cost, self.clinic)
 
+    def save(self, *args, **kwargs):
+        self.family = procedure_family(self.name)
+        self.session = procedure_session(self.name)
+        if kwargs.get('update_fields') is not None and \
+                'name' in kwargs['update_fields']:
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'family',
+                                       'session'}
+        super().save(*args, **kwargs)
+
 
 class Category(models.Model):
     name = models.CharField(max_length=100)
@@ -106,6 +135,29 @@ class Appointment(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # calendar, upcomings and every report window of a clinic
+            models.Index(fields=['clinic', 'scheduled_from'],
+                         name='appointment_clinic_from_idx'),
+            models.Index(fields=['doctor', 'scheduled_from'],
+                         name='appointment_doctor_from_idx'),
+            models.Index(fields=['patient', 'scheduled_from'],
+                         name='appointment_patient_from_idx'),
+            # date windows across all clinics
+            models.Index(fields=['scheduled_from'],
+                         name='appointment_from_idx'),
+            # a user's upcoming appointments that are still open
+            models.Index(fields=['created_by', 'scheduled_from'],
+                         name='appointment_open_idx',
+                         condition=~models.Q(appointment_status__in=[
+                             'cancelled', 'checked_out'])),
+            # cancellation reports
+            models.Index(fields=['clinic', 'scheduled_from'],
+                         name='appointment_cancelled_idx',
+                         condition=models.Q(appointment_status='cancelled')),
+        ]
+
     def __str__(self):
         return "#{} {} {}".format(self.id, self.patient, self.scheduled_from)
 
@@ -58,6 +58,25 @@ class AppointmentSerializer(serializers.ModelSerializer):
             'updated_by'
         )
 
+    @staticmethod
+    def setup_eager_loading(queryset):
+        """
+        Only the columns the serializer reads, with the doctor, patient,
+        clinic, category and procedure joined in, so a list is one query
+        whatever its size.
+        """
+        return queryset.select_related(
+            'doctor', 'patient', 'clinic', 'category', 'procedure'
+        ).only(
+            'id', 'is_new', 'scheduled_from', 'scheduled_to', 'notes',
+            'payment_status', 'checked_in', 'engaged_at', 'checked_out',
+            'appointment_status', 'created_by', 'updated_by',
+            'doctor__first_name', 'doctor__last_name',
+            'doctor__doctor_calender_color', 'patient__first_name',
+            'patient__last_name', 'patient__email', 'patient__phone_number',
+            'clinic__name', 'category__name', 'procedure__name',
+        )
+
     def get_doctor_name(self, obj):
         return f"{obj.doctor.first_name} {obj.doctor.last_name}"
 
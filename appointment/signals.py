@@ -1,6 +1,10 @@
-from django.db.models.signals import post_save, pre_save
+import functools
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
 
+from appointment.cache import invalidate_doctor_counts
 from appointment.models import Appointment
 from base.utils import send_appointment_cancelled_email, \
     send_appointment_reschedule_email
@@ -29,3 +33,16 @@ def cancel_email(sender, instance, created, **kwargs):
             instance.pk).scheduled_to:
             send_appointment_reschedule_email(
                 {"appointment": instance.__dict__})
+
+
+@receiver(post_save, sender=Appointment)
+@receiver(post_delete, sender=Appointment)
+def clear_doctor_counts(sender, instance, **kwargs):
+    clinic_ids = {instance.clinic_id}
+    prev = previous_statuses.get(instance.pk)
+    if prev is not None:
+        # a moved appointment also leaves its old clinic's counts
+        clinic_ids.add(prev.clinic_id)
+    for clinic_id in clinic_ids:
+        transaction.on_commit(
+            functools.partial(invalidate_doctor_counts, clinic_id))
@@ -1,3 +1,176 @@
-from django.test import TestCase
+import datetime
+from unittest import skipUnless
 
-# Create your tests here.
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from clinic.models import Clinic
+from report.utils import AppointmentReport
+from user.models import User
+from .models import Appointment, Category, Procedure
+
+
+class AppointmentListQueriesTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create(username='admin', email='admin@x.com')
+        audit = {'created_by': cls.admin, 'updated_by': cls.admin}
+        cls.clinic = Clinic.objects.create(name='Clinic', tagline='',
+                                           city='City', state='State',
+                                           country='India', **audit)
+        cls.doctors = [User.objects.create(username=f'doctor{i}',
+                                           first_name='Doctor')
+                       for i in range(3)]
+        cls.patients = [User.objects.create(username=f'patient{i}',
+                                            first_name='Patient')
+                        for i in range(3)]
+        cls.category = Category.objects.create(name='Chiropractic',
+                                               clinic=cls.clinic, **audit)
+        cls.procedure = Procedure.objects.create(name='Consultation',
+                                                 clinic=cls.clinic, cost=500,
+                                                 **audit)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.admin)
+
+    def add_appointments(self, count):
+        scheduled_from = timezone.now() + datetime.timedelta(hours=1)
+        for i in range(count):
+            Appointment.objects.create(
+                clinic=self.clinic, doctor=self.doctors[i % 3],
+                patient=self.patients[i % 3], category=self.category,
+                procedure=self.procedure, scheduled_from=scheduled_from,
+                scheduled_to=scheduled_from + datetime.timedelta(minutes=30),
+                created_by=self.admin, updated_by=self.admin)
+
+    def count_queries(self, url, params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def assertConstantQueries(self, url, params=None):
+        self.add_appointments(2)
+        few = self.count_queries(url, params)
+        self.add_appointments(8)
+        self.assertEqual(self.count_queries(url, params), few)
+
+    def test_appointment_list(self):
+        self.assertConstantQueries('/api/appointment/')
+
+    def test_appointment_all(self):
+        self.assertConstantQueries('/api/appointment/all/')
+
+    def test_upcomings(self):
+        self.assertConstantQueries('/api/upcomings/', {
+            'clinic': self.clinic.id,
+            'scheduled_from': timezone.localdate().isoformat()})
+
+    def test_upcoming_appointments(self):
+        self.assertConstantQueries('/api/appointment/upcoming-appointments/',
+                                   {'created_by': self.admin.id})
+
+    def test_appointment_names(self):
+        self.add_appointments(1)
+        appointment = self.client.get('/api/appointment/all/').json()[0]
+        self.assertEqual(appointment['doctor_name'], 'Doctor ')
+        self.assertEqual(appointment['clinic_name'], 'Clinic')
+        self.assertEqual(appointment['category_name'], 'Chiropractic')
+        self.assertEqual(appointment['procedure_name'], 'Consultation')
+
+
+@skipUnless(connection.vendor == 'postgresql', 'needs postgres query plans')
+@override_settings(DOCTOR_COUNTS_CACHE_TIMEOUT=0)
+class AppointmentQueryPlanTest(TestCase):
+    """
+    The key appointment queries must be served by an index, not a
+    sequential scan, on a seeded and analyzed table spanning a few years.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create(username='admin', email='admin@x.com')
+        audit = {'created_by': cls.admin, 'updated_by': cls.admin}
+        cls.clinics = [Clinic.objects.create(name=f'Clinic {i}', tagline='',
+                                             city='City', state='State',
+                                             country='India', **audit)
+                       for i in range(2)]
+        cls.doctors = User.objects.bulk_create([
+            User(username=f'doctor{i}', first_name='Doctor')
+            for i in range(5)])
+        cls.patients = User.objects.bulk_create([
+            User(username=f'patient{i}', first_name='Patient')
+            for i in range(50)])
+        statuses = ['booked', 'checked_out', 'cancelled', 'not_visited']
+        # every 6 hours, the last few days still to come
+        start = timezone.now() - datetime.timedelta(days=990)
+        Appointment.objects.bulk_create([
+            Appointment(
+                clinic=cls.clinics[i % 2], doctor=cls.doctors[i % 5],
+                patient=cls.patients[i % 50],
+                scheduled_from=start + datetime.timedelta(hours=6 * i),
+                scheduled_to=start + datetime.timedelta(hours=6 * i,
+                                                        minutes=30),
+                appointment_status=statuses[i % 4], **audit)
+            for i in range(4000)])
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE appointment_appointment')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.admin)
+
+    def appointment_queries(self, func):
+        with CaptureQueriesContext(connection) as queries:
+            func()
+        return [query['sql'] for query in queries
+                if 'appointment_appointment' in query['sql']]
+
+    def assertIndexed(self, func):
+        sqls = self.appointment_queries(func)
+        self.assertTrue(sqls)
+        with connection.cursor() as cursor:
+            for sql in sqls:
+                cursor.execute(f'EXPLAIN {sql}')
+                plan = '\n'.join(row[0] for row in cursor.fetchall())
+                self.assertNotIn('Seq Scan on appointment_appointment',
+                                 plan, f'{sql}\n{plan}')
+
+    def get(self, url, params):
+        return lambda: self.assertEqual(
+            self.client.get(url, params).status_code, 200)
+
+    def test_calendar(self):
+        today = timezone.localdate()
+        for params in ({'clinic': self.clinics[0].id},
+                       {'doctor': self.doctors[0].id}):
+            self.assertIndexed(self.get('/api/appointment/doctors/count/', {
+                'scheduled_from': f'{today}T00:00:00',
+                'scheduled_to': f'{today}T23:59:59', **params}))
+
+    def test_upcomings(self):
+        self.assertIndexed(self.get('/api/upcomings/', {
+            'clinic': self.clinics[0].id,
+            'scheduled_from': timezone.localdate().isoformat()}))
+
+    def test_upcoming_appointments(self):
+        self.assertIndexed(self.get(
+            '/api/appointment/upcoming-appointments/',
+            {'created_by': self.admin.id}))
+
+    def test_patient_appointments(self):
+        self.assertIndexed(self.get('/api/appointment/', {
+            'patient': self.patients[0].id}))
+
+    def test_reports(self):
+        to_day = timezone.localdate()
+        app = AppointmentReport(
+            clinic_id=self.clinics[0].id,
+            from_date=f'{to_day - datetime.timedelta(days=7)}T00:00:00',
+            to_date=f'{to_day}T00:00:00')
+        self.assertIndexed(lambda: app.get_count_on_status('booked'))
+        self.assertIndexed(app.get_cancelled_patients_count)
+        self.assertIndexed(app.get_cancelled_doctors_count)
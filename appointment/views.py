@@ -18,6 +18,10 @@ from rest_framework.views import APIView
 
 from base.utils import send_appointment_followup_email, \
     appointment_booked_notification
+from fuelapp.filters import COMPARE, EXACT, filter_params
+from fuelapp.pagination import OptionalCursorPagination
+from .cache import doctor_counts_key
+from user.models import normalize_phone
 from user.serializers import UserSerializer
 from .models import Appointment, Procedure, Tax, Category, PatientDirectory, \
     Files, Exercise, PatientDirectoryExercises, NoteCategory
@@ -35,6 +39,9 @@ User = get_user_model()
 class AppointmentList(generics.ListCreateAPIView):
     queryset = Appointment.objects.all()
     serializer_class = AppointmentSerializer
+    filter_lookups = {'appointment_status': EXACT, 'payment_status': EXACT,
+                      'status': EXACT, 'is_new': EXACT,
+                      'scheduled_to': COMPARE}
 
     def perform_create(self, serializer):
         # Set created_by and updated_by fields
@@ -45,27 +52,25 @@ class AppointmentList(generics.ListCreateAPIView):
             send_appointment_followup_email({"appointment": serializer.data})
 
     def get_queryset(self):
-        queryset = Appointment.objects.all()
-        params = self.request.query_params
-        if params and len(params) > 0:
-            for param in params:
-                if param not in ['page', 'search']:
-                    queryset = queryset.filter(**{param: params[param]})
+        queryset = AppointmentSerializer.setup_eager_loading(
+            Appointment.objects.all())
+        queryset = filter_params(self, queryset)
         return queryset
 
 
 class AppointmentAll(generics.ListAPIView):
     queryset = Appointment.objects.all()
     serializer_class = AppointmentSerializer
-    pagination_class = None
+    pagination_class = OptionalCursorPagination
+    cursor_ordering = ('-scheduled_from', '-id')
+    filter_lookups = {'appointment_status': EXACT, 'payment_status': EXACT,
+                      'status': EXACT, 'is_new': EXACT,
+                      'scheduled_to': COMPARE}
 
     def get_queryset(self):
-        queryset = Appointment.objects.all().order_by('-scheduled_from')
-        params = self.request.query_params
-        if params and len(params) > 0:
-            for param in params:
-                if param not in ['page', 'search']:
-                    queryset = queryset.filter(**{param: params[param]})
+        queryset = AppointmentSerializer.setup_eager_loading(
+            Appointment.objects.all()).order_by('-scheduled_from')
+        queryset = filter_params(self, queryset)
         return queryset
 
 
@@ -73,6 +78,12 @@ class AppointmentView(generics.RetrieveUpdateDestroyAPIView):
     queryset = Appointment.objects.all()
     serializer_class = AppointmentSerializer
 
+    def get_queryset(self):
+        # updates save whole rows, so only reads can skip columns
+        if self.request.method == 'GET':
+            return AppointmentSerializer.setup_eager_loading(self.queryset)
+        return self.queryset
+
     def perform_update(self, serializer):
         # Set updated_by field
         serializer.save(updated_by=self.request.user)
@@ -84,6 +95,7 @@ class ProcedureList(generics.ListCreateAPIView):
     serializer_class = ProcedureSerializer
     filter_backends = [filters.SearchFilter]
     search_fields = ['name', 'description']
+    filter_lookups = {'name': EXACT, 'session': EXACT, 'status': EXACT}
 
     def perform_create(self, serializer):
         # Set created_by and updated_by fields
@@ -92,11 +104,7 @@ class ProcedureList(generics.ListCreateAPIView):
 
     def get_queryset(self):
         queryset = Procedure.objects.all().order_by('-created_at')
-        params = self.request.query_params
-        if params and len(params) > 0:
-            for param in params:
-                if param not in ['page', 'search', 'page_size']:
-                    queryset = queryset.filter(**{param: params[param]})
+        queryset = filter_params(self, queryset)
         return queryset
 
 
@@ -112,6 +120,7 @@ class ProcedureView(generics.RetrieveUpdateDestroyAPIView):
 class TaxList(generics.ListCreateAPIView):
     queryset = Tax.objects.all()
     serializer_class = TaxSerializer
+    filter_lookups = {'name': EXACT, 'status': EXACT}
 
     def perform_create(self, serializer):
         # Set created_by and updated_by fields
@@ -120,11 +129,7 @@ class TaxList(generics.ListCreateAPIView):
 
     def get_queryset(self):
         queryset = Tax.objects.all().order_by('-created_at')
-        params = self.request.query_params
-        if len(params) > 0:
-            for param in params:
-                if param not in ['page', 'search']:
-                    queryset = queryset.filter(**{param: params[param]})
+        queryset = filter_params(self, queryset)
         return queryset
 
 
@@ -140,6 +145,7 @@ class TaxView(generics.RetrieveUpdateDestroyAPIView):
 class CategoryList(generics.ListCreateAPIView):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
+    filter_lookups = {'name': EXACT, 'status': EXACT}
 
     def perform_create(self, serializer):
         # Set created_by and updated_by fields
@@ -148,11 +154,7 @@ class CategoryList(generics.ListCreateAPIView):
 
     def get_queryset(self):
         queryset = Category.objects.all().order_by('-created_at')
-        params = self.request.query_params
-        if len(params) > 0:
-            for param in params:
-                if param not in ['page', 'search', 'page_size']:
-                    queryset = queryset.filter(**{param: params[param]})
+        queryset = filter_params(self, queryset)
         return queryset
 
 
@@ -169,6 +171,7 @@ class NoteCategoryList(generics.ListCreateAPIView):
     queryset = NoteCategory.objects.all()
     serializer_class = NoteCategorySerializer
     search_fields = ['name']
+    filter_lookups = {'name': EXACT, 'status': EXACT}
 
     def perform_create(self, serializer):
         # Set created_by and updated_by fields
@@ -177,11 +180,7 @@ class NoteCategoryList(generics.ListCreateAPIView):
 
     def get_queryset(self):
         queryset = NoteCategory.objects.all().order_by('-created_at')
-        params = self.request.query_params
-        if len(params) > 0:
-            for param in params:
-                if param not in ['page', 'search']:
-                    queryset = queryset.filter(**{param: params[param]})
+        queryset = filter_params(self, queryset)
         return queryset
 
 
@@ -197,6 +196,7 @@ class NoteCategoryView(generics.RetrieveUpdateDestroyAPIView):
 class PatientDirectoryList(generics.ListCreateAPIView):
     queryset = PatientDirectory.objects.all()
     serializer_class = PatientDirectorySerializer
+    filter_lookups = {'clinical_note_type': EXACT, 'status': EXACT}
 
     def perform_create(self, serializer):
         # Set created_by and updated_by fields
@@ -205,11 +205,7 @@ class PatientDirectoryList(generics.ListCreateAPIView):
 
     def get_queryset(self):
         queryset = PatientDirectory.objects.all()
-        params = self.request.query_params
-        if params and len(params) > 0:
-            for param in params:
-                if param not in ['page', 'search']:
-                    queryset = queryset.filter(**{param: params[param]})
+        queryset = filter_params(self, queryset)
         return queryset
 
 
@@ -225,6 +221,7 @@ class PatientDirectoryView(generics.RetrieveUpdateDestroyAPIView):
 class FilesList(generics.ListCreateAPIView):
     queryset = Files.objects.all()
     serializer_class = FilesSerializer
+    filter_lookups = {'status': EXACT}
 
     def perform_create(self, serializer):
         # Set created_by and updated_by fields
@@ -233,11 +230,7 @@ class FilesList(generics.ListCreateAPIView):
 
     def get_queryset(self):
         queryset = Files.objects.all()
-        params = self.request.query_params
-        if params and len(params) > 0:
-            for param in params:
-                if param not in ['page', 'search']:
-                    queryset = queryset.filter(**{param: params[param]})
+        queryset = filter_params(self, queryset)
         return queryset
 
 
@@ -253,6 +246,7 @@ class FilesView(generics.RetrieveUpdateDestroyAPIView):
 class ExerciseList(generics.ListCreateAPIView):
     queryset = Exercise.objects.all()
     serializer_class = ExerciseSerializer
+    filter_lookups = {'title': EXACT, 'status': EXACT}
 
     def perform_create(self, serializer):
         # Set created_by and updated_by fields
@@ -261,11 +255,7 @@ class ExerciseList(generics.ListCreateAPIView):
 
     def get_queryset(self):
         queryset = Exercise.objects.all()
-        params = self.request.query_params
-        if params and len(params) > 0:
-            for param in params:
-                if param not in ['page', 'search']:
-                    queryset = queryset.filter(**{param: params[param]})
+        queryset = filter_params(self, queryset)
         return queryset
 
 
@@ -281,6 +271,7 @@ class ExerciseView(generics.RetrieveUpdateDestroyAPIView):
 class PatientDirectoryExercisesList(generics.ListCreateAPIView):
     queryset = PatientDirectoryExercises.objects.all()
     serializer_class = PatientDirectoryExercisesSerializer
+    filter_lookups = {'status': EXACT}
 
     def perform_create(self, serializer):
         # Set created_by and updated_by fields
@@ -289,11 +280,7 @@ class PatientDirectoryExercisesList(generics.ListCreateAPIView):
 
     def get_queryset(self):
         queryset = PatientDirectoryExercises.objects.all()
-        params = self.request.query_params
-        if params and len(params) > 0:
-            for param in params:
-                if param not in ['page', 'search']:
-                    queryset = queryset.filter(**{param: params[param]})
+        queryset = filter_params(self, queryset)
         return queryset
 
 
@@ -466,10 +453,25 @@ class UpComingsListView(generics.ListAPIView):
         if clinic:
             queryset = queryset.filter(clinic=clinic)
 
-        return queryset
+        return AppointmentSerializer.setup_eager_loading(queryset)
 
 class DoctorsAppointmentsListView(APIView):
+    filter_lookups = {'appointment_status': EXACT, 'payment_status': EXACT,
+                      'status': EXACT, 'is_new': EXACT,
+                      'scheduled_to': COMPARE}
+
     def get(self, request):
+        if not settings.DOCTOR_COUNTS_CACHE_TIMEOUT:
+            return Response(self.doctor_counts(request))
+        key = doctor_counts_key(request.query_params.get('clinic'),
+                                request.query_params.dict())
+        data = cache.get(key)
+        if data is None:
+            data = self.doctor_counts(request)
+            cache.set(key, data, settings.DOCTOR_COUNTS_CACHE_TIMEOUT)
+        return Response(data)
+
+    def doctor_counts(self, request):
         scheduled_from = request.query_params.get('scheduled_from')
         scheduled_to = request.query_params.get('scheduled_to')
         clinic = request.query_params.get('clinic')
@@ -487,37 +489,31 @@ class DoctorsAppointmentsListView(APIView):
             queryset = queryset.filter(doctor_id=doctor)
 
         # Filter appointments based on the query parameters
-        params = self.request.query_params
-        if params and len(params) > 0:
-            for param in params:
-                if param not in ['page', 'search', 'scheduled_from', 'scheduled_to', 'clinic', 'doctor']:
-                    queryset = queryset.filter(**{param: params[param]})
-        # Count the filtered appointments
-        appointments_count = queryset.count()
-        # Get count of individual doctors' appointments with their names
-        queryset = queryset.values('doctor').annotate(count=Count('doctor'))
+        queryset = filter_params(self, queryset, exclude=(
+            'scheduled_from', 'scheduled_to', 'clinic', 'doctor'))
+        # Counts, names and colors of every doctor in one grouped query
+        doctors = queryset.values(
+            'doctor', 'doctor__first_name', 'doctor__last_name',
+            'doctor__doctor_calender_color'
+        ).annotate(count=Count('doctor')).order_by('doctor')
 
         # Prepare data for response
 
         doctors_data = []
-        for doctor_count in queryset:
-            doctor_id = doctor_count['doctor']
-            doctor = User.objects.get(id=doctor_id)
-            doctor_first_name = doctor.first_name
-            doctor_last_name = doctor.last_name
-            full_name = doctor_first_name + " " + doctor_last_name
-            doctor_color = doctor.doctor_calender_color
+        for doctor_count in doctors:
             doctors_data.append({
-                'doctor_id': doctor_id,
-                'full_name': full_name,
-                'doctor_color': doctor_color,
+                'doctor_id': doctor_count['doctor'],
+                'full_name': doctor_count['doctor__first_name'] + " " +
+                doctor_count['doctor__last_name'],
+                'doctor_color': doctor_count['doctor__doctor_calender_color'],
                 'count': doctor_count['count']
             })
+        appointments_count = sum(doctor['count'] for doctor in doctors_data)
 
-        return Response({
+        return {
             'all': appointments_count,
             'doctors_appointments_count': doctors_data
-        })
+        }
         
 class PatientCreateAppointment(APIView):
     permission_classes = []
@@ -551,7 +547,7 @@ class PatientCreateAppointment(APIView):
             }, status=status.HTTP_400_BAD_REQUEST)
 
         email = patient.get('email')
-        phone_number = str(patient.get('phone_number', ''))[-10:]
+        phone_number = normalize_phone(patient.get('phone_number'))
         full_name = patient.get('full_name')
 
         errors = self.validate_data(data_object, full_name, email, phone_number)
@@ -564,7 +560,7 @@ class PatientCreateAppointment(APIView):
         if email:
             patient_query = Q(email=email)
         if phone_number:
-            patient_query &= Q(phone_number__endswith=phone_number)
+            patient_query &= Q(phone_key=phone_number)
 
         try:
             user = User.objects.get(patient_query)
@@ -630,12 +626,14 @@ class UpcomingAppointmentsView(generics.ListAPIView):
         except User.DoesNotExist:
             return Appointment.objects.none()
     
-        return Appointment.objects.filter(
+        queryset = Appointment.objects.filter(
             created_by=user,
             scheduled_from__gte=timezone.now()
         ).exclude(
-            Q(appointment_status='cancelled') | Q(appointment_status='checked_out')
+            # spelled as in the partial index appointment_open_idx
+            appointment_status__in=['cancelled', 'checked_out']
         ).order_by('scheduled_from')
+        return AppointmentSerializer.setup_eager_loading(queryset)
 
     def list(self, request, *args, **kwargs):
         try:
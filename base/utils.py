@@ -10,6 +10,10 @@ from fuelapp.constants import MANAGER
 
 logger = logging.getLogger('fuelapp')
 
+# all the notifications read of a patient or doctor
+NOTIFICATION_USER_FIELDS = ('id', 'email', 'first_name', 'last_name',
+                            'full_name', 'phone_number')
+
 
 def get_appointment_related_object(appointment, include_doctor=False):
     from clinic.models import Clinic
@@ -28,13 +32,15 @@ def get_appointment_related_object(appointment, include_doctor=False):
     ret = []
     if patient_id:
         user = User.objects.get(id=patient_id)
-        ret.append(UserSerializer(user).data)
+        ret.append(UserSerializer(
+            user, fields=NOTIFICATION_USER_FIELDS).data)
     if clinic_id:
         clinic = Clinic.objects.get(id=clinic_id)
         ret.append(ClinicSerializer(clinic).data)
     if include_doctor and doctor_id:
         doctor = User.objects.get(id=doctor_id)
-        ret.append(UserSerializer(doctor).data)
+        ret.append(UserSerializer(
+            doctor, fields=NOTIFICATION_USER_FIELDS).data)
     return ret
 
 
@@ -3,6 +3,7 @@ from rest_framework import generics, status
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from fuelapp.filters import EXACT, filter_params
 from .models import Clinic, ClinicPeople, ClinicTiming
 from .serializers import ClinicSerializer, ClinicPeopleSerializer, \
     ClinicTimingSerializer, ClinicTimingMultipleSerializer
@@ -14,6 +15,7 @@ User = get_user_model()
 class ClinicList(generics.ListCreateAPIView):
     queryset = Clinic.objects.all()
     serializer_class = ClinicSerializer
+    filter_lookups = {'name': EXACT, 'city': EXACT, 'status': EXACT}
 
     def perform_create(self, serializer):
         # Set created_by and updated_by fields
@@ -22,11 +24,7 @@ class ClinicList(generics.ListCreateAPIView):
 
     def get_queryset(self):
         queryset = Clinic.objects.all()
-        params = self.request.query_params
-        if params and len(params) > 0:
-            for param in params:
-                if param not in ['page', 'search']:
-                    queryset = queryset.filter(**{param: params[param]})
+        queryset = filter_params(self, queryset)
         return queryset
 
 
@@ -42,6 +40,8 @@ class ClinicView(generics.RetrieveUpdateDestroyAPIView):
 class ClinicPeopleList(generics.ListCreateAPIView):
     queryset = ClinicPeople.objects.all()
     serializer_class = ClinicPeopleSerializer
+    # the clinic join table is indexed on both sides
+    filter_lookups = {'clinic': EXACT, 'status': EXACT}
 
     def perform_create(self, serializer):
         # Set created_by and updated_by fields
@@ -50,11 +50,7 @@ class ClinicPeopleList(generics.ListCreateAPIView):
 
     def get_queryset(self):
         queryset = ClinicPeople.objects.all()
-        params = self.request.query_params
-        if params and len(params) > 0:
-            for param in params:
-                if param not in ['page', 'search']:
-                    queryset = queryset.filter(**{param: params[param]})
+        queryset = filter_params(self, queryset)
         return queryset
 
 
@@ -70,6 +66,8 @@ class ClinicPeopleView(generics.RetrieveUpdateDestroyAPIView):
 class ClinicTimingList(generics.ListCreateAPIView):
     queryset = ClinicTiming.objects.all().order_by('id')
     serializer_class = ClinicTimingSerializer
+    filter_lookups = {'week_day': EXACT, 'is_available': EXACT,
+                      'status': EXACT}
 
     def perform_create(self, serializer):
         # Set created_by and updated_by fields
@@ -78,11 +76,7 @@ class ClinicTimingList(generics.ListCreateAPIView):
 
     def get_queryset(self):
         queryset = ClinicTiming.objects.all().order_by('id')
-        params = self.request.query_params
-        if params and len(params) > 0:
-            for param in params:
-                if param not in ['page', 'search']:
-                    queryset = queryset.filter(**{param: params[param]})
+        queryset = filter_params(self, queryset)
         return queryset
 
 
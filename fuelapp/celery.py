@@ -25,6 +25,16 @@ app.conf.beat_schedule = {
     'daily_task': {
         'task': 'fuelapp.tasks.daily_task',
         'schedule': crontab(minute='0', hour='10'),
+    },
+    # catches rows changed by queryset.update(), which sends no signals
+    'backfill_report_rollups': {
+        'task': 'report.tasks.backfill_report_rollups',
+        'schedule': crontab(minute='30', hour='2'),
+        'kwargs': {'days': 2},
+    },
+    'expire_export_jobs': {
+        'task': 'report.tasks.expire_export_jobs',
+        'schedule': crontab(minute='0'),
     }
 }
 
@@ -0,0 +1,131 @@
+import json
+import logging
+import re
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist, FieldError, \
+    ValidationError as DjangoValidationError
+from django.db.models.constants import LOOKUP_SEP
+from rest_framework.exceptions import ValidationError
+
+logger = logging.getLogger('fuelapp')
+
+# paging, search and response shape params, never filters
+RESERVED_PARAMS = {'page', 'page_size', 'search', 'cursor', 'pagination',
+                   'fields'}
+# lookups a btree index can serve
+EXACT = ('exact', 'isnull')
+COMPARE = ('exact', 'isnull', 'gt', 'gte', 'lt', 'lte', 'range')
+
+
+def indexed_lookups(model):
+    """
+    Lookups on the indexed columns of ``model``: its primary key, foreign
+    keys, unique and db_index fields and the leading column of every
+    Meta index.
+    """
+    lookups = {}
+    for field in model._meta.concrete_fields:
+        if field.primary_key or field.unique or field.db_index:
+            lookups[field.name] = EXACT if field.is_relation else COMPARE
+    for index in model._meta.indexes:
+        if index.fields:
+            field = model._meta.get_field(index.fields[0].lstrip('-'))
+            lookups.setdefault(field.name,
+                               EXACT if field.is_relation else COMPARE)
+    return lookups
+
+
+def field_name(model, path):
+    """
+    ``path`` with the ways to spell a foreign key's column (``clinic_id``,
+    ``clinic__id``, ``clinic__pk``) and ``pk`` spelled by field name.
+    """
+    if path == 'pk':
+        return model._meta.pk.name
+    name, _, rest = path.partition(LOOKUP_SEP)
+    try:
+        field = model._meta.get_field(name)
+    except FieldDoesNotExist:
+        return path
+    if field.is_relation and field.concrete and \
+            (not rest or rest in ('id', 'pk')):
+        return field.name
+    return path
+
+
+def is_listed(model, lookups, param):
+    if 'exact' in lookups.get(field_name(model, param), ()):
+        return True
+    path, _, lookup = param.rpartition(LOOKUP_SEP)
+    return bool(path) and lookup in lookups.get(field_name(model, path), ())
+
+
+def plan_cost(queryset):
+    # the cost of finding the rows, not of the ordering and the annotations
+    # of the page the view will go on to cut
+    queryset = queryset.order_by().values('pk')
+    return json.loads(queryset.explain(format='json'))[0]['Plan'][
+        'Total Cost']
+
+
+def filter_params(view, queryset, params=None, exclude=(),
+                  skip_unknown=False):
+    """
+    Filter ``queryset`` by the request's query params, one ``filter()`` per
+    param. Lookups on indexed columns, and the ``filter_lookups`` of the
+    view, always apply. Others are handled by QUERY_FILTER_MODE: allowed,
+    rejected, or under 'cost' rejected when the planner estimates the
+    filtered query above QUERY_FILTER_MAX_COST. Params that aren't fields
+    of the model are ignored with ``skip_unknown``, bad ones are a 400.
+    """
+    params = view.request.query_params if params is None else params
+    model = queryset.model
+    lookups = {**indexed_lookups(model),
+               **getattr(view, 'filter_lookups', {})}
+    listed, unlisted = [], []
+    for param in params:
+        if param in RESERVED_PARAMS or param in exclude:
+            continue
+        if skip_unknown:
+            try:
+                model._meta.get_field(param.split(LOOKUP_SEP)[0])
+            except FieldDoesNotExist:
+                continue
+        try:
+            queryset = queryset.filter(**{param: params[param]})
+        except (FieldError, DjangoValidationError, ValueError) as e:
+            raise ValidationError({param: [str(e)]})
+        if is_listed(model, lookups, param):
+            listed.append(param)
+        else:
+            unlisted.append(param)
+
+    if not listed and not unlisted:
+        return queryset
+    name = type(view).__name__
+    logger.info(f'{name} filters on {model._meta.label}: '
+                f'indexed {listed}, other {unlisted}')
+
+    mode = settings.QUERY_FILTER_MODE
+    if unlisted and mode == 'reject':
+        raise ValidationError({param: ['Filtering on this is not supported.']
+                               for param in unlisted})
+    if unlisted and mode == 'allow':
+        logger.warning(f'{name} filters {model._meta.label} on unindexed '
+                       f'{unlisted}')
+    if unlisted and mode == 'cost':
+        cost = plan_cost(queryset)
+        if cost > settings.QUERY_FILTER_MAX_COST:
+            logger.warning(f'{name} rejected filters {unlisted}: '
+                           f'estimated cost {cost}')
+            raise ValidationError({param: ['This filter is too expensive, '
+                                           'narrow it down.']
+                                   for param in unlisted})
+    if settings.QUERY_FILTER_EXPLAIN:
+        plan = queryset.explain()
+        scanned = sorted(set(re.findall(r'Seq Scan on (\w+)', plan)))
+        if scanned:
+            logger.warning(f'{name} filters {listed + unlisted} scan '
+                           f'{scanned} sequentially:\n{plan}')
+    return queryset
@@ -1,4 +1,17 @@
+import base64
+import functools
+import hashlib
+import json
+import math
+import operator
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F, Q
 from rest_framework import pagination
+from rest_framework.exceptions import NotFound
 from rest_framework.response import Response
 
 
@@ -17,3 +30,123 @@ class CustomPagination(pagination.PageNumberPagination):
             },
             'results': data
         })
+
+
+class CursorPagination(CustomPagination):
+    """
+    Opt-in keyset pagination. Requests with ?pagination=cursor or a
+    ?cursor= get the page after the cursor by a range scan on the view's
+    ``cursor_ordering`` (default ``ordering``) instead of COUNT(*) and
+    OFFSET, in the CustomPagination envelope plus the next ``cursor``.
+    Other requests are paginated by page number as before, or not at all
+    when ``page_fallback`` is off.
+    """
+    ordering = ('-id',)
+    page_fallback = True
+    # 'cached' exact count, 'estimated' by the query planner, or None
+    count = 'cached'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_mode = 'cursor' in request.query_params or \
+            request.query_params.get('pagination') == 'cursor'
+        if not self.cursor_mode:
+            if not self.page_fallback:
+                return None
+            return super().paginate_queryset(queryset, request, view)
+
+        self.model = queryset.model
+        self.page_size = self.get_page_size(request)
+        self.keys = [(name.lstrip('-'), name.startswith('-')) for name in
+                     getattr(view, 'cursor_ordering', self.ordering)]
+        self.total = self.get_count(queryset)
+
+        cursor = request.query_params.get('cursor')
+        queryset = queryset.order_by(*(
+            F(name).desc(nulls_last=True) if descending else
+            F(name).asc(nulls_last=True) for name, descending in self.keys))
+        if cursor:
+            try:
+                queryset = queryset.filter(
+                    self.after(self.decode_cursor(cursor)))
+            except (TypeError, ValueError, ValidationError):
+                raise NotFound('Invalid cursor')
+
+        page = list(queryset[:self.page_size + 1])
+        self.has_previous = bool(cursor)
+        self.next_cursor = self.encode_cursor(page[self.page_size - 1]) \
+            if len(page) > self.page_size else None
+        return page[:self.page_size]
+
+    def get_paginated_response(self, data):
+        if not self.cursor_mode:
+            return super().get_paginated_response(data)
+        return Response({
+            'pagination': {
+                'next': self.next_cursor is not None,
+                'previous': self.has_previous,
+                'count': self.total,
+                'page_size': self.page_size,
+                'current_page': None,
+                'pages': math.ceil(self.total / self.page_size)
+                if self.total is not None else None,
+                'cursor': self.next_cursor,
+            },
+            'results': data
+        })
+
+    def get_count(self, queryset):
+        if self.count == 'estimated':
+            plan = json.loads(queryset.order_by().explain(format='json'))
+            return plan[0]['Plan']['Plan Rows']
+        if self.count == 'cached':
+            sql, params = queryset.order_by().query.sql_with_params()
+            key = 'pagination_count:' + hashlib.md5(
+                f'{sql}{params}'.encode()).hexdigest()
+            total = cache.get(key)
+            if total is None:
+                total = queryset.count()
+                cache.set(key, total, settings.PAGINATION_COUNT_TIMEOUT)
+            return total
+        return None
+
+    def after(self, position):
+        # rows past ``position`` in the ordering, nulls last
+        after, same = [], Q()
+        for (name, descending), value in zip(self.keys, position):
+            if value is None:
+                same &= Q(**{f'{name}__isnull': True})
+                continue
+            past = Q(**{f'{name}__{"lt" if descending else "gt"}': value})
+            field = self.field(name)
+            if field is not None and field.null:
+                past |= Q(**{f'{name}__isnull': True})
+            after.append(same & past)
+            same &= Q(**{name: value})
+        return functools.reduce(operator.or_, after, Q(pk__in=[]))
+
+    def encode_cursor(self, obj):
+        position = [getattr(obj, name) for name, _ in self.keys]
+        return base64.urlsafe_b64encode(json.dumps(
+            position, cls=DjangoJSONEncoder).encode()).decode()
+
+    def decode_cursor(self, cursor):
+        position = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if len(position) != len(self.keys):
+            raise ValueError(cursor)
+        return [self.field(name).to_python(value)
+                if value is not None and self.field(name) else value
+                for (name, _), value in zip(self.keys, position)]
+
+    def field(self, name):
+        # None for annotations, their cursor values are kept as they are
+        try:
+            return self.model._meta.get_field(name)
+        except FieldDoesNotExist:
+            return None
+
+
+class OptionalCursorPagination(CursorPagination):
+    """
+    CursorPagination for lists that are not paginated without a cursor.
+    """
+    page_fallback = False
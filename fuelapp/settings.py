@@ -47,6 +47,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'django_rest_passwordreset',
     'drf_yasg',
@@ -164,6 +165,9 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 20
 }
 
+# How long CursorPagination keeps the total count of a list
+PAGINATION_COUNT_TIMEOUT = env.int('PAGINATION_COUNT_TIMEOUT', 60)
+
 REST_KNOX = {
     'USER_SERIALIZER': 'user.serializers.LoginUserSerializer',
     'TOKEN_TTL': timedelta(hours=10)}
@@ -229,6 +233,9 @@ SMS_API_PASS = env('SMS_API_PASS')
 SMS_API_SENDER = env('SMS_API_SENDER')
 
 MEDIA_URL = ''
+# Uploads and report exports are saved under here, whatever the process's
+# working directory; celery workers and the web app have to share it
+MEDIA_ROOT = env('MEDIA_ROOT', default=BASE_DIR)
 UPLOADS_ROOT = os.path.join(BASE_DIR, 'uploads')
 MAX_FILE_SIZE = 10 * 1024 * 1024  # 10 MB
 ALLOWED_FILE_TYPES = [
@@ -253,8 +260,6 @@ ALLOWED_FILE_TYPES = [
     # 'image/tiff',  # .tiff
     # 'image/svg+xml',  # .svg
 ]
-# MEDIA_URL,
-# MEDIA_ROOT
 CSRF_TRUSTED_ORIGINS = ['http://localhost:3000']
 
 FRONTEND_URL = env('FRONTEND_URL')
@@ -263,6 +268,41 @@ CELERY_BROKER_URL = 'redis://localhost:6379/11'
 CELERY_RESULT_BACKEND = 'redis://localhost:6379/11'
 CELERY_BROKER_CONNECTION_RETRY_ON_STARTUP = True
 
+# Keep the daily rollup tables up to date on every write, and serve report
+# totals from them (run the rollup backfill, with writes on, before
+# switching reads on)
+REPORT_WRITE_ROLLUPS = env.bool('REPORT_WRITE_ROLLUPS', True)
+REPORT_USE_ROLLUPS = env.bool('REPORT_USE_ROLLUPS', False)
+
+# Seconds the calendar's per doctor appointment counts stay cached, 0 to
+# turn the cache off. Appointment writes of the clinic clear them earlier
+DOCTOR_COUNTS_CACHE_TIMEOUT = env.int('DOCTOR_COUNTS_CACHE_TIMEOUT', 30)
+
+# Cache report summaries in redis until a write in their clinic/date window
+REPORT_CACHE_ENABLED = env.bool('REPORT_CACHE_ENABLED', False)
+REPORT_CACHE_TIMEOUT = env.int('REPORT_CACHE_TIMEOUT', 60 * 60)
+
+# Finished report export files are deleted after this many hours
+EXPORT_JOB_EXPIRY_HOURS = env.int('EXPORT_JOB_EXPIRY_HOURS', 24)
+
+# Dashboard sections run on a shared pool of this many threads, a section
+# still running after the timeout (seconds) is left out of the response
+REPORT_DASHBOARD_WORKERS = env.int('REPORT_DASHBOARD_WORKERS', 4)
+REPORT_DASHBOARD_TIMEOUT = env.int('REPORT_DASHBOARD_TIMEOUT', 10)
+
+# Read wallet and advance balances from the wallet ledger (reconcile it with
+# --fix before switching this on)
+WALLET_USE_LEDGER = env.bool('WALLET_USE_LEDGER', False)
+
+# Query param filters of the list views outside the indexed lookups (and the
+# view's filter_lookups) are 'reject'ed, 'allow'ed and logged, or under 'cost'
+# allowed while the planner's estimate of the filtered rows stays under
+# QUERY_FILTER_MAX_COST
+QUERY_FILTER_MODE = env('QUERY_FILTER_MODE', default='reject')
+QUERY_FILTER_MAX_COST = env.int('QUERY_FILTER_MAX_COST', 50000)
+# EXPLAIN every filtered list and log sequential scans (staging only)
+QUERY_FILTER_EXPLAIN = env.bool('QUERY_FILTER_EXPLAIN', False)
+
 PREFIX_ATLAS_ID = env('PREFIX_ATLAS_ID')
 PATIENT_GROUP_ID = env('PATIENT_GROUP_ID')
 
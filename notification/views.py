@@ -1,5 +1,7 @@
 from rest_framework import generics
 
+from fuelapp.filters import COMPARE, EXACT, filter_params
+from fuelapp.pagination import CursorPagination
 from .models import NotificationLog, NotificationConfig, Reminder, LetterRequest
 from .serializers import NotificationLogSerializer, \
     NotificationConfigSerializer, \
@@ -15,14 +17,12 @@ from .serializers import NotificationLogSerializer, \
 class NotificationLogList(generics.ListCreateAPIView):
     queryset = NotificationLog.objects.all()
     serializer_class = NotificationLogSerializer
+    pagination_class = CursorPagination
+    filter_lookups = {'type': EXACT, 'mode': EXACT, 'status': EXACT}
 
     def get_queryset(self):
         queryset = NotificationLog.objects.all()
-        params = self.request.query_params
-        if params and len(params) > 0:
-            for param in params:
-                if param not in ['page', 'search']:
-                    queryset = queryset.filter(**{param: params[param]})
+        queryset = filter_params(self, queryset)
         return queryset
 
 
@@ -37,11 +37,7 @@ class NotificationConfigList(generics.ListCreateAPIView):
 
     def get_queryset(self):
         queryset = NotificationConfig.objects.all()
-        params = self.request.query_params
-        if params and len(params) > 0:
-            for param in params:
-                if param not in ['page', 'search']:
-                    queryset = queryset.filter(**{param: params[param]})
+        queryset = filter_params(self, queryset)
         return queryset
 
 
@@ -53,14 +49,12 @@ class NotificationConfigView(generics.RetrieveUpdateDestroyAPIView):
 class ReminderList(generics.ListCreateAPIView):
     queryset = Reminder.objects.all()
     serializer_class = ReminderSerializer
+    filter_lookups = {'scheduled_from': COMPARE, 'scheduled_to': COMPARE,
+                      'status': EXACT}
 
     def get_queryset(self):
         queryset = Reminder.objects.all()
-        params = self.request.query_params
-        if params and len(params) > 0:
-            for param in params:
-                if param not in ['page', 'search']:
-                    queryset = queryset.filter(**{param: params[param]})
+        queryset = filter_params(self, queryset)
         return queryset
 
 
@@ -94,14 +88,12 @@ class ReminderView(generics.RetrieveUpdateDestroyAPIView):
 class LetterRequestList(generics.ListCreateAPIView):
     queryset = LetterRequest.objects.all()
     serializer_class = LetterRequestSerializer
+    filter_lookups = {'date_and_time': COMPARE, 'type': EXACT,
+                      'status': EXACT}
 
     def get_queryset(self):
         queryset = LetterRequest.objects.all()
-        params = self.request.query_params
-        if params and len(params) > 0:
-            for param in params:
-                if param not in ['page', 'search']:
-                    queryset = queryset.filter(**{param: params[param]})
+        queryset = filter_params(self, queryset)
         return queryset
 
 class LetterRequestView(generics.RetrieveUpdateDestroyAPIView):
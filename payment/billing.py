@@ -0,0 +1,89 @@
+import base64
+import datetime
+import json
+
+from django.db.models import CharField, F, Q, Value
+from django.db.models.functions import Coalesce, TruncDate
+
+from .models import Invoice, Payment
+from .serializers import BillingSerializer, InvoiceSerializer, \
+    PaymentSerializer
+
+# newest first; on the same date payments come before invoices, as in the
+# unpaginated billing list
+ORDERING = ('-sorting_date', '-data_type', '-id')
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(row):
+    position = [row['sorting_date'].isoformat(), row['data_type'], row['id']]
+    return base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        sorting_date, data_type, id = json.loads(
+            base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.date.fromisoformat(sorting_date), data_type, int(id)
+    except (TypeError, ValueError) as e:
+        raise InvalidCursor(cursor) from e
+
+
+def after(cursor, data_type):
+    """
+    Rows of ``data_type`` that come after the ``cursor`` position.
+    """
+    sorting_date, cursor_type, id = cursor
+    older = Q(sorting_date__lt=sorting_date)
+    if data_type == cursor_type:
+        return older | Q(sorting_date=sorting_date, id__lt=id)
+    if data_type < cursor_type:
+        return older | Q(sorting_date=sorting_date)
+    return older
+
+
+def billing_page(invoices, payments, cursor=None, page_size=20):
+    """
+    One page of the billing feed of ``invoices`` and unattached
+    ``payments``, starting after ``cursor``. Both are projected to
+    (sorting_date, data_type, id) and merged with a UNION ALL ordered in the
+    database, so a page reads ``page_size`` rows however long the feed is.
+    Returns the serialized rows and the cursor of the next page.
+    """
+    position = decode_cursor(cursor) if cursor else None
+    branches = []
+    for data_type, queryset, sorting_date in (
+            ('invoice', invoices, F('date')),
+            # payments without a collection date sort by their creation
+            ('payment', payments, Coalesce('collected_on',
+                                           TruncDate('created_at')))):
+        queryset = queryset.order_by().annotate(
+            sorting_date=sorting_date,
+            data_type=Value(data_type, output_field=CharField()))
+        if position:
+            queryset = queryset.filter(after(position, data_type))
+        branches.append(queryset.values('sorting_date', 'data_type', 'id'))
+
+    rows = list(branches[0].union(branches[1], all=True).order_by(
+        *ORDERING)[:page_size + 1])
+    next_cursor = encode_cursor(rows[page_size - 1]) \
+        if len(rows) > page_size else None
+    rows = rows[:page_size]
+
+    objects = {
+        ('invoice', invoice.id): invoice for invoice in
+        InvoiceSerializer.setup_eager_loading(Invoice.objects.filter(
+            id__in=[row['id'] for row in rows
+                    if row['data_type'] == 'invoice']))}
+    objects.update(
+        (('payment', payment.id), payment) for payment in
+        PaymentSerializer.setup_eager_loading(Payment.objects.filter(
+            id__in=[row['id'] for row in rows
+                    if row['data_type'] == 'payment'])))
+    results = BillingSerializer(
+        [objects[row['data_type'], row['id']] for row in rows],
+        many=True).data
+    return results, next_cursor
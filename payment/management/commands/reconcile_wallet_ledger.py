@@ -0,0 +1,62 @@
+import math
+
+from django.core.management.base import BaseCommand, CommandError
+
+from payment.models import Invoice, Payment, WalletLedger
+from payment.utils import compute_users_advance_balance, \
+    compute_users_wallet_balance, latest_wallet_ledger, \
+    reconcile_wallet_ledger
+
+
+def differs(recorded, computed):
+    return not math.isclose(recorded, computed, abs_tol=0.005)
+
+
+class Command(BaseCommand):
+    help = 'Check the wallet ledger of every patient against the balances ' \
+           'computed from their payments and invoices.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--fix', action='store_true',
+                            help='append a reconcile entry for every patient '
+                                 'that is off, this also backfills patients '
+                                 'with no ledger yet')
+
+    def handle(self, *args, **options):
+        patient_ids = sorted(set().union(*(
+            model.objects.filter(patient__isnull=False).order_by()
+            .values_list('patient', flat=True)
+            .distinct() for model in (Payment, Invoice, WalletLedger))))
+
+        mismatches = 0
+        batch_size = options['batch_size']
+        for start in range(0, len(patient_ids), batch_size):
+            batch = patient_ids[start:start + batch_size]
+            ledger = latest_wallet_ledger(batch)
+            balances = compute_users_wallet_balance(batch)
+            advances = compute_users_advance_balance(batch)
+            for patient_id in batch:
+                entry = ledger.get(patient_id)
+                computed = (balances[patient_id], advances[patient_id])
+                if entry:
+                    recorded = (entry.balance, entry.advance_balance)
+                    if not any(map(differs, recorded, computed)):
+                        continue
+                    self.stdout.write(f'patient {patient_id}: ledger '
+                                      f'{recorded}, computed {computed}')
+                elif options['fix']:
+                    # without a ledger the computed balances are read, so
+                    # these only need backfilling
+                    self.stdout.write(f'patient {patient_id}: no ledger, '
+                                      f'computed {computed}')
+                else:
+                    continue
+                mismatches += 1
+                if options['fix']:
+                    reconcile_wallet_ledger(patient_id)
+
+        self.stdout.write(f'{len(patient_ids)} patients checked, '
+                          f'{mismatches} off')
+        if mismatches and not options['fix']:
+            raise CommandError('wallet ledger is out of date, run with --fix')
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.13 on 2026-10-18 18:33
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('payment', '0020_payment_receipt_id_alter_payment_type'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WalletLedger',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('reason', models.CharField(choices=[('collect_payment', 'Collect Payment'), ('update_payment', 'Update Payment'), ('collect_due_payment', 'Collect Due Payment'), ('online_payment', 'Online Payment'), ('delete_invoice', 'Delete Invoice'), ('reconcile', 'Reconcile')], max_length=30)),
+                ('amount', models.FloatField()),
+                ('balance', models.FloatField()),
+                ('advance_balance', models.FloatField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='wallet_ledger_created_by', to=settings.AUTH_USER_MODEL)),
+                ('invoice', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='payment.invoice')),
+                ('patient', models.ForeignKey(on_delete=django.db.models.deletion.DO_NOTHING, related_name='wallet_ledger', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['patient', '-id'], name='payment_wal_patient_f4180b_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 4.2.13 on 2026-10-18 18:52
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # build the indexes without locking billing writes
+    atomic = False
+
+    dependencies = [
+        ('payment', '0021_wallet_ledger'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='invoice',
+            index=models.Index(fields=['clinic', 'date'], name='invoice_clinic_date_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='invoice',
+            index=models.Index(condition=models.Q(('is_paid', False)), fields=['patient'], name='invoice_unpaid_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='invoiceitems',
+            index=models.Index(fields=['created_at', 'invoice'], name='invoiceitems_created_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='payment',
+            index=models.Index(fields=['clinic', 'collected_on', 'transaction_type'], name='payment_clinic_collected_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='payment',
+            index=models.Index(condition=models.Q(('balance__gt', 0)), fields=['patient', 'id'], name='payment_balance_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='wallet',
+            index=models.Index(fields=['user', 'invoice'], name='wallet_user_invoice_idx'),
+        ),
+    ]
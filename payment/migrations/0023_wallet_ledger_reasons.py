@@ -0,0 +1,18 @@
+# Generated by Django 4.2.13 on 2026-10-18 19:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payment', '0022_payment_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='walletledger',
+            name='reason',
+            field=models.CharField(choices=[('collect_payment', 'Collect Payment'), ('update_payment', 'Update Payment'), ('collect_due_payment', 'Collect Due Payment'), ('online_payment', 'Online Payment'), ('delete_invoice', 'Delete Invoice'), ('reconcile', 'Reconcile'), ('payment_change', 'Payment Change'), ('invoice_change', 'Invoice Change'), ('wallet_change', 'Wallet Change')], max_length=30),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 4.2.13 on 2026-10-18 19:58
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('payment', '0023_wallet_ledger_reasons'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='walletledger',
+            name='patient',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='wallet_ledger', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='walletledger',
+            name='reason',
+            field=models.CharField(choices=[('collect_payment', 'Collect Payment'), ('update_payment', 'Update Payment'), ('collect_due_payment', 'Collect Due Payment'), ('online_payment', 'Online Payment'), ('delete_invoice', 'Delete Invoice'), ('reconcile', 'Reconcile'), ('payment_change', 'Payment Change'), ('invoice_change', 'Invoice Change')], max_length=30),
+        ),
+    ]
@@ -31,6 +31,16 @@ class Invoice(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # clinic billing and report windows
+            models.Index(fields=['clinic', 'date'],
+                         name='invoice_clinic_date_idx'),
+            # a patient's unpaid invoices for wallet and due balances
+            models.Index(fields=['patient'], name='invoice_unpaid_idx',
+                         condition=models.Q(is_paid=False)),
+        ]
+
     def __str__(self):
         return f"#{self.id} - INV: {self.invoice_number}"
 
@@ -59,6 +69,13 @@ class InvoiceItems(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # report windows, joined to the invoice for its clinic
+            models.Index(fields=['created_at', 'invoice'],
+                         name='invoiceitems_created_idx'),
+        ]
+
     def __str__(self):
         return f"{self.procedure} - {self.quantity}"
 
@@ -116,6 +133,16 @@ class Payment(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # payment reports of a clinic by collection date and type
+            models.Index(fields=['clinic', 'collected_on', 'transaction_type'],
+                         name='payment_clinic_collected_idx'),
+            # the payments add_user_wallet_balance settles, oldest first
+            models.Index(fields=['patient', 'id'], name='payment_balance_idx',
+                         condition=models.Q(balance__gt=0)),
+        ]
+
     def __str__(self):
         return f"{self.transaction_id} - {self.price}"
 
@@ -142,6 +169,12 @@ class Wallet(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'invoice'],
+                         name='wallet_user_invoice_idx'),
+        ]
+
     def __str__(self):
         return f"{self.type} - {self.amount}"
 
@@ -157,3 +190,40 @@ class WalletPayment(models.Model):
 
     def __str__(self):
         return f"{self.wallet} - {self.payment} - {self.contribution_amount}"
+
+
+class WalletLedger(models.Model):
+    """
+    Append-only history of a patient's wallet and advance balances. The
+    latest row of a patient holds the current balances.
+    """
+    REASON = (
+        ('collect_payment', 'Collect Payment'),
+        ('update_payment', 'Update Payment'),
+        ('collect_due_payment', 'Collect Due Payment'),
+        ('online_payment', 'Online Payment'),
+        ('delete_invoice', 'Delete Invoice'),
+        ('reconcile', 'Reconcile'),
+        # writes through the plain payment and invoice endpoints
+        ('payment_change', 'Payment Change'),
+        ('invoice_change', 'Invoice Change'),
+    )
+    patient = models.ForeignKey(User, on_delete=models.CASCADE,
+                                related_name='wallet_ledger')
+    invoice = models.ForeignKey(Invoice, on_delete=models.SET_NULL,
+                                null=True, blank=True)
+    reason = models.CharField(choices=REASON, max_length=30)
+    # change of the wallet balance, and both balances after it
+    amount = models.FloatField()
+    balance = models.FloatField()
+    advance_balance = models.FloatField()
+    created_by = models.ForeignKey(
+        User, on_delete=models.DO_NOTHING, null=True, blank=True,
+        related_name='wallet_ledger_created_by')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['patient', '-id'])]
+
+    def __str__(self):
+        return f"{self.patient_id} - {self.balance}"
@@ -1,12 +1,32 @@
-from django.db.models import Sum
+from django.contrib.postgres.aggregates import StringAgg
+from django.db.models import OuterRef, Prefetch, Subquery, Sum, TextField, \
+    Value
+from django.db.models.functions import Coalesce
 from rest_framework import serializers
 
-from appointment.models import Procedure
 from clinic.serializers import ClinicSerializer
 from user.models import User
 from .models import Invoice, InvoiceItems, Payment, Wallet, WalletPayment
 
 
+def invoice_sum(model, field):
+    # SUM of one invoice's child rows, without joining them into the query
+    return Coalesce(Subquery(
+        model.objects.filter(invoice=OuterRef('pk')).order_by().values(
+            'invoice').annotate(total=Sum(field)).values('total')[:1]
+    ), Value(0.0))
+
+
+def invoice_procedure_names(invoice):
+    # one invoice's procedure names joined in item order, by string_agg
+    return Coalesce(Subquery(
+        InvoiceItems.objects.filter(invoice=invoice).order_by().values(
+            'invoice'
+        ).annotate(
+            names=StringAgg('procedure__name', ', ', ordering='id')
+        ).values('names')[:1]), Value(''), output_field=TextField())
+
+
 class InvoiceAllSerializer(serializers.ModelSerializer):
     due_amount = serializers.SerializerMethodField(read_only=True)
     paid_amount = serializers.SerializerMethodField(read_only=True)
@@ -29,23 +49,27 @@ class InvoiceAllSerializer(serializers.ModelSerializer):
             'advance_amount'
         )
 
+    @staticmethod
+    def setup_eager_loading(queryset):
+        return queryset.select_related('clinic', 'appointment').annotate(
+            payment_amount=invoice_sum(Payment, 'price'),
+            wallet_amount=invoice_sum(Wallet, 'amount'),
+        )
+
+    def to_representation(self, instance):
+        if not hasattr(instance, 'payment_amount'):
+            instance = self.setup_eager_loading(
+                Invoice.objects.filter(pk=instance.pk)).get()
+        return super().to_representation(instance)
+
     def get_due_amount(self, obj):
-        paid = Payment.objects.filter(invoice=obj.id).aggregate(
-            paid=Sum('price', default=0))['paid']
-        wallet_paid = Wallet.objects.filter(invoice=obj.id).aggregate(
-            paid=Sum('amount', default=0))['paid']
-        if wallet_paid:
-            paid = paid + wallet_paid
+        paid = obj.payment_amount + obj.wallet_amount
         return obj.grand_total - paid if obj.grand_total - paid > 0 and \
                                          obj.appointment.payment_status != \
                                          'collected' else 0
 
     def get_paid_amount(self, obj):
-        paid = Payment.objects.filter(invoice=obj.id).aggregate(
-            paid=Sum('price', default=0))['paid']
-        wallet_paid = Wallet.objects.filter(invoice=obj.id).aggregate(
-            paid=Sum('amount', default=0))['paid']
-        return paid + wallet_paid
+        return obj.payment_amount + obj.wallet_amount
 
     def get_advance_amount(self, obj):
         paid_amount = self.get_paid_amount(obj)
@@ -112,31 +136,49 @@ class InvoiceSerializer(serializers.ModelSerializer):
             'patient_data'
         )
 
-    def get_cost(self, obj):
-        res = InvoiceItems.objects.filter(invoice=obj.id).aggregate(
-            cost=Sum('total', default=0))['cost']
+    @staticmethod
+    def setup_eager_loading(queryset):
+        """
+        Everything the serializer reads, in a constant number of queries
+        whatever the number of invoices.
+        """
+        return queryset.select_related('patient', 'clinic').annotate(
+            cost=invoice_sum(InvoiceItems, 'total'),
+            discount=invoice_sum(InvoiceItems, 'discount'),
+            tax=invoice_sum(InvoiceItems, 'tax_amount'),
+            payment_amount=invoice_sum(Payment, 'price'),
+            wallet_amount=invoice_sum(Wallet, 'amount'),
+            procedure_names=invoice_procedure_names(OuterRef('pk')),
+        ).prefetch_related(
+            Prefetch('invoiceitems_set', queryset=InvoiceItems.objects.
+                     select_related('procedure').order_by('id')),
+            Prefetch('payment_set', queryset=PaymentSerializer.
+                     setup_eager_loading(Payment.objects.order_by('id'))),
+            Prefetch('wallet_set', queryset=Wallet.objects.order_by('id')),
+        )
+
+    def to_representation(self, instance):
+        # a single invoice that was not loaded through setup_eager_loading
+        if not hasattr(instance, 'payment_amount'):
+            instance = self.setup_eager_loading(
+                Invoice.objects.filter(pk=instance.pk)).get()
+        return super().to_representation(instance)
 
-        return res
+    def get_cost(self, obj):
+        return obj.cost
 
     def get_discount(self, obj):
-        res = InvoiceItems.objects.filter(invoice=obj.id).aggregate(
-            discount=Sum('discount', default=0))['discount']
-        return res
+        return obj.discount
 
     def get_tax(self, obj):
-        res = InvoiceItems.objects.filter(invoice=obj.id).aggregate(
-            tax=Sum('tax_amount', default=0))['tax']
-        return res
+        return obj.tax
 
     def get_items(self, obj):
-        res = InvoiceItems.objects.filter(invoice=obj.id)
-        return InvoiceItemsSerializer(res, many=True).data
+        return InvoiceItemsSerializer(obj.invoiceitems_set.all(),
+                                      many=True).data
 
     def get_procedure_names(self, obj):
-        res = ", ".join(list(InvoiceItems.objects.filter(invoice=obj.id).prefetch_related(
-            'procedure').values_list(
-            'procedure__name', flat=True)))
-        return res
+        return obj.procedure_names
 
     def get_patient_name(self, obj):
         return f"{obj.patient.first_name} " \
@@ -146,36 +188,26 @@ class InvoiceSerializer(serializers.ModelSerializer):
         # return InvoiceItemsSerializer(res, many=True).data
 
     def get_payment(self, obj):
-        res = Payment.objects.filter(invoice=obj.id)
-        return PaymentSerializer(res, many=True).data
+        return PaymentSerializer(obj.payment_set.all(), many=True).data
 
     def get_payment_amount(self, obj):
-        res = Payment.objects.filter(invoice=obj.id).aggregate(
-            paid=Sum('price', default=0))['paid']
-        return res
+        return obj.payment_amount
 
     def get_wallet_amount(self, obj):
-        res = Wallet.objects.filter(invoice=obj.id).aggregate(
-            paid=Sum('amount', default=0))['paid']
-        return res
+        return obj.wallet_amount
 
     def get_wallet(self, obj):
-        res = Wallet.objects.filter(invoice=obj.id)
-        return WalletSerializer(res, many=True).data
+        return WalletSerializer(obj.wallet_set.all(), many=True).data
 
     def get_due_amount(self, obj):
-        paid = Payment.objects.filter(invoice=obj.id).aggregate(
-            paid=Sum('price', default=0))['paid']
-
+        paid = obj.payment_amount
         return obj.grand_total - paid if obj.grand_total - paid > 0 else 0
 
     def get_paid_amount(self, obj):
-        paid = Payment.objects.filter(invoice=obj.id).aggregate(
-            paid=Sum('price', default=0))['paid']
-        return paid
+        return obj.payment_amount
 
     def get_advance_amount(self, obj):
-        paid_amount = self.get_paid_amount(obj)
+        paid_amount = obj.payment_amount
         return paid_amount - obj.grand_total if paid_amount > obj.grand_total else 0
 
 
@@ -210,8 +242,7 @@ class InvoiceItemsSerializer(serializers.ModelSerializer):
         )
 
     def get_procedure_name(self, obj):
-        res = Procedure.objects.get(id=obj.procedure_id)
-        return res.name
+        return obj.procedure.name
 
 
 class PaymentSerializer(serializers.ModelSerializer):
@@ -259,16 +290,26 @@ class PaymentSerializer(serializers.ModelSerializer):
             'updated_by'
         )
 
+    @staticmethod
+    def setup_eager_loading(queryset):
+        return queryset.select_related(
+            'invoice', 'patient', 'clinic'
+        ).annotate(
+            procedure_names=invoice_procedure_names(OuterRef('invoice'))
+        )
+
+    def to_representation(self, instance):
+        # a single payment that was not loaded through setup_eager_loading
+        if not hasattr(instance, 'procedure_names'):
+            instance = self.setup_eager_loading(
+                Payment.objects.filter(pk=instance.pk)).get()
+        return super().to_representation(instance)
+
     def get_patient_name(self, obj):
         return f"{obj.patient.first_name} {obj.patient.last_name}"
 
     def get_procedure_names(self, obj):
-        if obj.invoice:
-            res = ", ".join(list(InvoiceItems.objects.filter(invoice=obj.invoice.id).prefetch_related(
-                'procedure').values_list(
-                'procedure__name', flat=True)))
-            return res
-        return ''
+        return obj.procedure_names
 
     def get_is_advance(self, obj):
         return 'Yes' if (not obj.invoice) or (obj.price - obj.invoice.grand_total > 0) else 'No'
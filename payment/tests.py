@@ -1,3 +1,74 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from user.models import User
+from .models import Invoice, WalletLedger
+from .utils import compute_users_wallet_balance, get_users_wallet_balance, \
+    patient_migrate
+
+
+@override_settings(WALLET_USE_LEDGER=True)
+class WalletLedgerTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create(username='admin', email='admin@x.com')
+        cls.patients = [User.objects.create(username=f'patient{i}',
+                                            first_name='Patient')
+                        for i in range(2)]
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.admin)
+
+    def add_payment(self, patient, excess_amount, invoice=None):
+        response = self.client.post(reverse('paymentList'), {
+            'patient': patient.id, 'invoice': invoice and invoice.id,
+            'type': 'cash', 'mode': 'offline', 'transaction_id': 'T1',
+            'price': excess_amount, 'excess_amount': excess_amount,
+            'created_by': self.admin.id, 'updated_by': self.admin.id,
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        return response.data['id']
+
+    def assertLedgerBalance(self, patient, balance):
+        self.assertEqual(get_users_wallet_balance([patient.id]),
+                         {patient.id: balance})
+        self.assertEqual(compute_users_wallet_balance([patient.id]),
+                         {patient.id: balance})
+
+    def test_payment_writes_update_ledger(self):
+        patient = self.patients[0]
+        self.add_payment(patient, 300)
+        self.assertLedgerBalance(patient, 300)
+        response = self.client.post(reverse('invoiceList'), {
+            'patient': patient.id, 'grand_total': 500,
+            'invoice_number': 'I1', 'created_by': self.admin.id,
+            'updated_by': self.admin.id}, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertLedgerBalance(patient, -200)
+        invoice = Invoice.objects.get(id=response.data['id'])
+        pk = self.add_payment(patient, 0, invoice)
+        self.client.patch(reverse('paymentView', args=[pk]), {'price': 200},
+                          format='json')
+        self.assertLedgerBalance(patient, 0)
+        self.client.delete(reverse('paymentView', args=[pk]))
+        self.assertLedgerBalance(patient, -200)
+        self.assertEqual(WalletLedger.objects.filter(
+            patient=patient).count(), 4)
+
+    def test_delete_patient(self):
+        patient = self.patients[0]
+        self.add_payment(patient, 300)
+        response = self.client.delete(reverse('UsersView', args=[patient.id]))
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(WalletLedger.objects.filter(
+            patient_id=patient.id).exists())
+
+    def test_patient_migrate(self):
+        from_user, to_user = self.patients
+        self.add_payment(from_user, 300)
+        self.add_payment(to_user, 100)
+        patient_migrate(from_user.id, to_user.id, dry=False)
+        self.assertFalse(User.objects.filter(id=from_user.id).exists())
+        self.assertLedgerBalance(to_user, 400)
@@ -4,6 +4,7 @@ from .views import PaymentList, PaymentView, \
     CollectPayment, InvoiceList, InvoiceView, InvoiceItemsList, \
     InvoiceItemsView, CollectDuePayment, \
     SendInvoiceEmailView, GenerateInvoicePDFView, WalletBalanceView, \
+    WalletBalanceListView, \
     BillingView, AdvanceBalanceView, InvoiceAll, \
     PaymentStatusView
 
@@ -46,6 +47,8 @@ invoice = [
 wallet = [
     # path('', WalletList.as_view(), name='walletList'),
     # path('<int:pk>/', WalletView.as_view(), name='walletView'),
+    path('balance/', WalletBalanceListView.as_view(),
+         name='wallet_balance_list'),
     path('balance/<int:user_id>/', WalletBalanceView.as_view(),
          name='wallet_balance'),
     path('advance/<int:user_id>/', AdvanceBalanceView.as_view(),
@@ -63,5 +66,7 @@ payment_urls = [
     path('wallet/', include(wallet)),
     path('collectpayment/', include(collectpayment)),
     path('billing/', BillingView.as_view({'get': 'list'}), name='billing'),
+    path('billing/feed/', BillingView.as_view({'get': 'feed'}),
+         name='billing_feed'),
     path('payment/status/', PaymentStatusView.as_view(), name='payment-status')
 ]
@@ -6,14 +6,16 @@ import uuid
 import random
 import string
 
+from contextlib import contextmanager
 from copy import deepcopy
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.db import transaction
 from django.db.models import Sum, Q, F
 
 from django.utils import timezone
 from appointment.models import Appointment
-from .models import Payment, Invoice, Wallet
+from .models import Payment, Invoice, Wallet, WalletLedger
 from .serializers import WalletSerializer, WalletPaymentSerializer, PaymentSerializer
 
 from user.models import User
@@ -23,6 +25,9 @@ from base.helpers.sms import SMSUtils
 
 logger = logging.getLogger('fuelapp')
 
+# balances over all of a patient's invoices, not just one
+ANY_INVOICE = object()
+
 
 def get_user_payments(user_id, exclude_invoice=None):
     received_payments = Payment.objects.filter(
@@ -121,18 +126,145 @@ def _get_user_wallet_balance(user_id):
 
 
 def get_user_wallet_balance(user_id):
-    excess_amount = Payment.objects.filter(
-        patient=user_id
-    ).aggregate(
+    return get_users_wallet_balance([user_id])[int(user_id)]
+
+
+def get_users_wallet_balance(user_ids):
+    """
+    Wallet balance of each of ``user_ids`` as {user_id: balance}, read from
+    the wallet ledger when it is enabled.
+    """
+    user_ids = {int(user_id) for user_id in user_ids}
+    balances = {}
+    if settings.WALLET_USE_LEDGER:
+        balances = {user_id: entry.balance for user_id, entry in
+                    latest_wallet_ledger(user_ids).items()}
+    missing = user_ids - set(balances)
+    if missing:
+        balances.update(compute_users_wallet_balance(missing))
+    return balances
+
+
+def compute_users_wallet_balance(user_ids, invoice_id=ANY_INVOICE):
+    """
+    Wallet balance of each of ``user_ids`` as {user_id: balance}, from the
+    payment history: the users' excess payments less what they still owe
+    on unpaid invoices. Two grouped queries however many users there are.
+    With ``invoice_id`` only the payments and due of that invoice count,
+    None for the payments without one.
+    """
+    user_ids = {int(user_id) for user_id in user_ids}
+    payments = Payment.objects.filter(patient__in=user_ids)
+    invoices = Invoice.objects.filter(is_paid=False, patient__in=user_ids)
+    if invoice_id is not ANY_INVOICE:
+        payments = payments.filter(invoice=invoice_id)
+        invoices = invoices.filter(id=invoice_id)
+    excess_amounts = dict.fromkeys(user_ids, 0.0)
+    excess_amounts.update(payments.order_by().values('patient').annotate(
         excess_amount=Sum('excess_amount', default=0)
-    )['excess_amount']
-    unpaid_invoices = Invoice.objects.filter(is_paid=False, patient=user_id)
-    unpaid_amount = unpaid_invoices.annotate(
+    ).values_list('patient', 'excess_amount'))
+
+    dues = {user_id: [] for user_id in user_ids}
+    unpaid_amount = invoices.order_by().values('id', 'patient').annotate(
         payments=Sum('payment__price', default=0),
         total=Sum('grand_total', default=0)
-    )
-    due = [invoice.total - invoice.payments for invoice in unpaid_amount if invoice.total - invoice.payments > 0]
-    return excess_amount - sum(due)
+    ).filter(total__gt=F('payments')) if invoice_id is not None else []
+    for invoice in unpaid_amount:
+        dues[invoice['patient']].append(invoice['total'] - invoice['payments'])
+    return {user_id: excess_amounts[user_id] - sum(dues[user_id])
+            for user_id in user_ids}
+
+
+def compute_users_advance_balance(user_ids, invoice_id=ANY_INVOICE):
+    payments = Payment.objects.filter(patient__in=user_ids)
+    if invoice_id is not ANY_INVOICE:
+        payments = payments.filter(invoice=invoice_id)
+    advance = dict.fromkeys(user_ids, 0.0)
+    advance.update(payments.order_by().values('patient').annotate(
+        amount=Sum('excess_amount', default=0)
+    ).values_list('patient', 'amount'))
+    return advance
+
+
+def latest_wallet_ledger(user_ids):
+    return {entry.patient_id: entry for entry in WalletLedger.objects.filter(
+        patient__in=user_ids).order_by('patient', '-id').distinct('patient')}
+
+
+def wallet_contribution(patient_id, invoice_id):
+    """
+    What the payments and due of ``invoice_id`` (the payments without an
+    invoice for None) add to the patient's (wallet, advance) balances.
+    Takes the patient's ledger lock for the rest of the transaction, so
+    read it in the transaction of the write, before it.
+    """
+    list(User.objects.select_for_update().filter(id=patient_id))
+    balance = compute_users_wallet_balance([patient_id], invoice_id)
+    advance = compute_users_advance_balance([patient_id], invoice_id)
+    return balance[patient_id], advance[patient_id]
+
+
+def record_wallet_ledger(patient_id, reason, invoice_id=None, userid=None,
+                         before=(0.0, 0.0)):
+    """
+    Append what a write changed in the payments and due of ``invoice_id`` to
+    the patient's latest ledger entry. ``before`` is the wallet_contribution
+    of the invoice ahead of the write, nothing for a new one. Call it in the
+    transaction of the write, so the ledger commits or rolls back with it.
+    """
+    after = wallet_contribution(patient_id, invoice_id)
+    # a deleted invoice can't be pointed at
+    entry_invoice_id = invoice_id if reason != 'delete_invoice' else None
+    latest = latest_wallet_ledger([patient_id]).get(patient_id)
+    if not latest:
+        # the first entry of a patient starts from their whole history
+        return reconcile_wallet_ledger(patient_id, reason, entry_invoice_id,
+                                       userid)
+    amount = after[0] - before[0]
+    advance = after[1] - before[1]
+    if not amount and not advance:
+        return latest
+    return WalletLedger.objects.create(
+        patient_id=patient_id, invoice_id=entry_invoice_id, reason=reason,
+        amount=amount, balance=latest.balance + amount,
+        advance_balance=latest.advance_balance + advance,
+        created_by_id=userid)
+
+
+@contextmanager
+def wallet_ledger_write(keys, reason, userid=None):
+    """
+    Record what the block changes in the (patient_id, invoice_id) ``keys``
+    to the wallet ledger, in one transaction with it.
+    """
+    with transaction.atomic():
+        before = {key: wallet_contribution(*key)
+                  for key in set(keys) if key[0] is not None}
+        yield
+        for (patient_id, invoice_id), contribution in before.items():
+            record_wallet_ledger(patient_id, reason, invoice_id, userid,
+                                 contribution)
+
+
+def reconcile_wallet_ledger(patient_id, reason='reconcile', invoice_id=None,
+                            userid=None):
+    """
+    Append the patient's balances computed from their whole history to the
+    wallet ledger when they differ from the latest entry.
+    """
+    with transaction.atomic():
+        # one writer per patient at a time keeps the running balance in order
+        list(User.objects.select_for_update().filter(id=patient_id))
+        latest = latest_wallet_ledger([patient_id]).get(patient_id)
+        balance = compute_users_wallet_balance([patient_id])[patient_id]
+        advance = compute_users_advance_balance([patient_id])[patient_id]
+        if latest and latest.balance == balance and \
+                latest.advance_balance == advance:
+            return latest
+        return WalletLedger.objects.create(
+            patient_id=patient_id, invoice_id=invoice_id, reason=reason,
+            amount=balance - (latest.balance if latest else 0),
+            balance=balance, advance_balance=advance, created_by_id=userid)
 
 
 def get_user_wallet_balance_exclude_pending_invoices(user_id, invoice_id):
@@ -236,6 +368,10 @@ def _get_user_advance_balance(user_id, exclude_invoice_id):
 
 
 def get_user_advance_balance(user_id, exclude_invoice_id):
+    if settings.WALLET_USE_LEDGER and not exclude_invoice_id:
+        entry = latest_wallet_ledger([user_id]).get(int(user_id))
+        if entry:
+            return entry.advance_balance
     payments = Payment.objects.filter(
         Q(patient=user_id)
     )
@@ -318,23 +454,27 @@ def patient_migrate(fromid, toid, dry=True):
     print(f"Payments {len(payments)}")
     print(f"wallet {len(wallet)}")
     if not dry:
-        for appointment in appointments:
-            appointment.patient = to_user
-            appointment.save()
+        with transaction.atomic():
+            for appointment in appointments:
+                appointment.patient = to_user
+                appointment.save()
 
-        for invoice in invoices:
-            invoice.patient = to_user
-            invoice.save()
+            for invoice in invoices:
+                invoice.patient = to_user
+                invoice.save()
 
-        for payment in payments:
-            payment.patient = to_user
-            payment.save()
+            for payment in payments:
+                payment.patient = to_user
+                payment.save()
 
-        for wall in wallet:
-            wall.user = to_user
-            wall.save()
+            for wall in wallet:
+                wall.user = to_user
+                wall.save()
 
-        from_user.delete()
+            # the balances moved with the rows, the old ledger goes with
+            # the user
+            reconcile_wallet_ledger(to_user.id)
+            from_user.delete()
     return "Migrated"
 
 def generate_random_string(length=8):
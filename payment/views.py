@@ -3,6 +3,7 @@ import logging, traceback
 from itertools import chain
 import requests
 
+from django.conf import settings
 from django.core.cache import cache
 from django.db import transaction
 from django.http import HttpResponse
@@ -17,12 +18,16 @@ from rest_framework.views import APIView
 from appointment.models import Appointment
 from appointment.serializers import AppointmentSerializer
 from base.utils import generate_pdf_file, send_attachment_email, appointment_booked_by_patient_notification, confirm_payment_notification
+from fuelapp.filters import COMPARE, EXACT, filter_params
+from fuelapp.pagination import CursorPagination, OptionalCursorPagination
+from .billing import InvalidCursor, billing_page
 from .models import Invoice, InvoiceItems, Payment
 from .serializers import InvoiceSerializer, InvoiceItemsSerializer, \
     PaymentSerializer, BillingSerializer, InvoiceAllSerializer
-from .utils import get_user_wallet_balance, add_user_wallet_balance, \
-    get_user_advance_balance, API_URL, generate_phonepe_payload, \
-    generate_x_verify_header, get_headers, MERCHANT_ID, \
+from .utils import get_user_wallet_balance, get_users_wallet_balance, \
+    add_user_wallet_balance, get_user_advance_balance, record_wallet_ledger, \
+    wallet_contribution, wallet_ledger_write, API_URL, \
+    generate_phonepe_payload, generate_x_verify_header, get_headers, MERCHANT_ID, \
     generate_random_string, base64_to_string
 
 from appointment.serializers import AppointmentSerializer
@@ -31,23 +36,35 @@ from appointment.models import Procedure
 logger = logging.getLogger('fuelapp')
 
 
+def ledger_key(patient, invoice):
+    # the (patient_id, invoice_id) of the wallet ledger a payment counts in
+    return patient and patient.id, invoice and invoice.id
+
+
 class InvoiceList(generics.ListCreateAPIView):
     queryset = Invoice.objects.all()
     filter_backends = [filters.SearchFilter]
+    pagination_class = CursorPagination
     serializer_class = InvoiceSerializer
     search_fields = ['invoice_number', 'appointment__patient__first_name',
                      'appointment__patient__last_name', 'appointment__patient__email']
+    filter_lookups = {'date': COMPARE, 'is_paid': EXACT, 'status': EXACT,
+                      'invoice_number': EXACT}
 
     def get_queryset(self):
-        queryset = Invoice.objects.all().order_by('-id')
-        params = self.request.query_params
-        if params and len(params) > 0:
-            for param in params:
-                if param not in ['page', 'search']:
-                    queryset = queryset.filter(**{param: params[param]})
+        queryset = InvoiceSerializer.setup_eager_loading(
+            Invoice.objects.all()).order_by('-id')
+        queryset = filter_params(self, queryset)
 
         return queryset
 
+    @transaction.atomic
+    def perform_create(self, serializer):
+        invoice = serializer.save()
+        if invoice.patient_id:
+            record_wallet_ledger(invoice.patient_id, 'invoice_change',
+                                 invoice.id, self.request.user.id)
+
 
 class InvoiceAll(viewsets.ViewSet):
     queryset = Invoice.objects.all()
@@ -56,21 +73,25 @@ class InvoiceAll(viewsets.ViewSet):
     search_fields = ['invoice_number', 'appointment__patient__first_name',
                      'appointment__patient__last_name',
                      'appointment__patient__email']
-    pagination_class = None
+    pagination_class = OptionalCursorPagination
+    filter_lookups = {'date': COMPARE, 'is_paid': EXACT, 'status': EXACT,
+                      'invoice_number': EXACT}
 
     def get_queryset(self):
-        queryset = Invoice.objects.all().order_by('-id')
-        params = self.request.query_params
-        if params and len(params) > 0:
-            for param in params:
-                if param not in ['page', 'search']:
-                    queryset = queryset.filter(**{param: params[param]})
+        queryset = InvoiceAllSerializer.setup_eager_loading(
+            Invoice.objects.all()).order_by('-id')
+        queryset = filter_params(self, queryset)
 
         return queryset
 
     @action(detail=False, methods=['get'])
     def list(self, request):
         mixed_results = self.get_queryset()
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(mixed_results, request, self)
+        if page is not None:
+            return paginator.get_paginated_response(
+                InvoiceAllSerializer(page, many=True).data)
         serializer = InvoiceAllSerializer(mixed_results, many=True)
         return Response(serializer.data)
 
@@ -95,28 +116,38 @@ class InvoiceAll(viewsets.ViewSet):
 
 
 class InvoiceView(generics.RetrieveUpdateDestroyAPIView):
-    queryset = Invoice.objects.all()
+    queryset = InvoiceSerializer.setup_eager_loading(Invoice.objects.all())
     serializer_class = InvoiceSerializer
 
+    def perform_update(self, serializer):
+        invoice = serializer.instance
+        patient = serializer.validated_data.get('patient', invoice.patient)
+        keys = [(invoice.patient_id, invoice.id),
+                (patient and patient.id, invoice.id)]
+        with wallet_ledger_write(keys, 'invoice_change', self.request.user.id):
+            serializer.save()
+
+    @transaction.atomic
     def delete(self, request, *args, **kwargs):
         instance = self.get_object()
+        before = wallet_contribution(instance.patient_id, instance.id)
         appointment = instance.appointment
         appointment.payment_status = 'pending'
         appointment.save()
-        return self.destroy(request, *args, **kwargs)
+        response = self.destroy(request, *args, **kwargs)
+        record_wallet_ledger(instance.patient_id, 'delete_invoice',
+                             instance.id, request.user.id, before)
+        return response
 
 
 class InvoiceItemsList(generics.ListCreateAPIView):
     queryset = InvoiceItems.objects.all()
     serializer_class = InvoiceItemsSerializer
+    filter_lookups = {'status': EXACT}
 
     def get_queryset(self):
         queryset = InvoiceItems.objects.all()
-        params = self.request.query_params
-        if params and len(params) > 0:
-            for param in params:
-                if param not in ['page', 'search']:
-                    queryset = queryset.filter(**{param: params[param]})
+        queryset = filter_params(self, queryset)
         return queryset
 
 
@@ -129,31 +160,46 @@ class PaymentList(generics.ListCreateAPIView):
     queryset = Payment.objects.all()
     serializer_class = PaymentSerializer
     filter_backends = [filters.SearchFilter]
+    pagination_class = CursorPagination
     search_fields = ['invoice__appointment__patient__first_name',
                      'invoice__appointment__patient__last_name',
                      'invoice__appointment__patient__email',
                      'invoice__invoice_number']
+    filter_lookups = {'collected_on': COMPARE, 'transaction_type': EXACT,
+                      'payment_status': EXACT, 'type': EXACT,
+                      'mode': EXACT, 'status': EXACT}
 
     def get_queryset(self):
-        queryset = Payment.objects.all().order_by('-id')
-        params = self.request.query_params
-        fields = [field.name for field in Payment._meta.fields]
-        if params and len(params) > 0:
-            for param in params:
-                if param.split('__')[0] in fields:
-                    queryset = queryset.filter(**{param: params[param]})
-        return queryset
+        queryset = PaymentSerializer.setup_eager_loading(
+            Payment.objects.all()).order_by('-id')
+        return filter_params(self, queryset, skip_unknown=True)
 
     def perform_create(self, serializer):
-        # Set created_by and updated_by fields
-        serializer.save(created_by=self.request.user,
-                        updated_by=self.request.user)
+        data = serializer.validated_data
+        keys = [ledger_key(data.get('patient'), data.get('invoice'))]
+        with wallet_ledger_write(keys, 'payment_change', self.request.user.id):
+            # Set created_by and updated_by fields
+            serializer.save(created_by=self.request.user,
+                            updated_by=self.request.user)
 
 
 class PaymentView(generics.RetrieveUpdateDestroyAPIView):
-    queryset = Payment.objects.all()
+    queryset = PaymentSerializer.setup_eager_loading(Payment.objects.all())
     serializer_class = PaymentSerializer
 
+    def perform_update(self, serializer):
+        payment, data = serializer.instance, serializer.validated_data
+        keys = [(payment.patient_id, payment.invoice_id),
+                ledger_key(data.get('patient', payment.patient),
+                           data.get('invoice', payment.invoice))]
+        with wallet_ledger_write(keys, 'payment_change', self.request.user.id):
+            serializer.save()
+
+    def perform_destroy(self, instance):
+        keys = [(instance.patient_id, instance.invoice_id)]
+        with wallet_ledger_write(keys, 'payment_change', self.request.user.id):
+            instance.delete()
+
 
 class CollectPayment(APIView):
     def patch(self, request, pk, format=None):
@@ -166,6 +212,7 @@ class CollectPayment(APIView):
             appointment_id = data.get('appointment')
             data.update({'updated_by': userid})
             invoice = Invoice.objects.get(id=pk)
+            before = wallet_contribution(invoice.patient_id, invoice.id)
             invoice_serializer = InvoiceSerializer(invoice, data=data)
             prev_items = InvoiceItems.objects.filter(invoice=invoice.id)
             valid_items = []
@@ -219,6 +266,8 @@ class CollectPayment(APIView):
                     appointment = Appointment.objects.get(id=appointment_id)
                     appointment.payment_status = 'collected'
                     appointment.save()
+                record_wallet_ledger(invoice.patient_id, 'update_payment',
+                                     invoice.id, userid, before)
                 return Response(invoice_serializer.data,
                                 status=status.HTTP_202_ACCEPTED)
             else:
@@ -228,6 +277,7 @@ class CollectPayment(APIView):
                 return Response(invoice_serializer.errors,
                                 status=status.HTTP_400_BAD_REQUEST)
 
+    @transaction.atomic
     def post(self, request):
         data = request.data
         print(data)
@@ -340,6 +390,8 @@ class CollectPayment(APIView):
                 appointment.payment_status = 'partial_paid' if balance < 0 else 'collected'
                 appointment.save()
                 Invoice.objects.filter(id=invoice_id).update(is_paid=False if balance < 0 else True)
+                record_wallet_ledger(patient.id, 'collect_payment', invoice_id,
+                                     userid)
                 return Response(invoice_serializer.data,
                                 status=status.HTTP_201_CREATED)
             else:
@@ -359,6 +411,7 @@ class CollectDuePayment(APIView):
     def patch(self, request, pk, format=None):
         return Response(status=status.HTTTP_405_METHOD_NOT_ALLOWED)
 
+    @transaction.atomic
     def post(self, request):
         data = request.data
         userid = self.request.user.id
@@ -382,6 +435,7 @@ class CollectDuePayment(APIView):
         appointment = Appointment.objects.get(id=invoice_data['appointment'])
         patient = appointment.patient
         clinic = appointment.clinic
+        before = wallet_contribution(patient.id, invoice.id)
         due = invoice_data['due_amount']
         balance = amount - due
         # balance = balance if balance > 0 else 0
@@ -468,6 +522,8 @@ class CollectDuePayment(APIView):
                 logger.error(f"error on update payment status - {e}")
                 return Response({'message': 'failed to update appointment status after due payment'},
                                 status=status.HTTP_417_EXPECTATION_FAILED)
+            record_wallet_ledger(patient.id, 'collect_due_payment', invoice.id,
+                                 userid, before)
             return Response(invoice_serializer.data,
                             status=status.HTTP_201_CREATED)
 
@@ -498,6 +554,28 @@ class WalletBalanceView(APIView):
             {'user_id': request.user.id, 'final_balance': final_balance})
 
 
+class WalletBalanceListView(APIView):
+    # a page of users at most, as the largest page the list views serve
+    max_user_ids = 100
+
+    def get(self, request):
+        user_ids = request.query_params.get('user_ids', '').split(',')
+        if not all(user_id.strip().isdigit() for user_id in user_ids):
+            return Response({'error': 'Invalid user_ids'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        user_ids = list(dict.fromkeys(int(user_id) for user_id in user_ids))
+        if len(user_ids) > self.max_user_ids:
+            return Response({'error': f'At most {self.max_user_ids} '
+                                      f'user_ids'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        balances = get_users_wallet_balance(user_ids)
+
+        return JsonResponse({'results': [
+            {'user_id': user_id, 'final_balance': balances[user_id]}
+            for user_id in user_ids
+        ]})
+
+
 class AdvanceBalanceView(APIView):
     def get(self, request, user_id):
         # Get sum of debit and credit for the authenticated user
@@ -554,30 +632,45 @@ class SendInvoiceEmailView(APIView):
 
 
 class BillingView(viewsets.ViewSet):
+    filter_lookups = {'date': COMPARE, 'collected_on': COMPARE,
+                      'is_paid': EXACT, 'transaction_type': EXACT,
+                      'payment_status': EXACT, 'status': EXACT}
 
     def list(self, request):
         mixed_results = self.get_queryset()
         serializer = BillingSerializer(mixed_results, many=True)
         return Response(serializer.data)
 
-    def get_queryset(self):
-
-        invoice_results = Invoice.objects.all()
-        invoice_fields = [field.name for field in Invoice._meta.get_fields()]
-
-        payment_results = Payment.objects.all().exclude(
-            invoice__isnull=False)
-        payment_fields = [field.name for field in Payment._meta.get_fields()]
-
-        params = self.request.query_params
-        remove_all = ['page', 'search']
-        if params and len(params) > 0:
-            for param in params:
-                if param in invoice_fields or param.split('__')[0] in invoice_fields and param not in remove_all:
-                    invoice_results = invoice_results.filter(**{param: params[param]})
+    @action(detail=False, methods=['get'])
+    def feed(self, request):
+        invoice_results, payment_results = self.get_querysets()
+        try:
+            page_size = min(int(request.query_params.get(
+                'page_size', settings.REST_FRAMEWORK['PAGE_SIZE'])), 100)
+            results, next_cursor = billing_page(
+                invoice_results, payment_results,
+                request.query_params.get('cursor'), max(page_size, 1))
+        except (InvalidCursor, ValueError):
+            return Response({'error': 'Invalid cursor or page_size'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        return Response({'next': next_cursor, 'results': results})
+
+    def get_querysets(self):
+        invoice_results = InvoiceSerializer.setup_eager_loading(
+            Invoice.objects.all())
+
+        payment_results = PaymentSerializer.setup_eager_loading(
+            Payment.objects.all()).exclude(invoice__isnull=False)
+
+        # each list is filtered by the params that are fields of its model
+        invoice_results = filter_params(self, invoice_results,
+                                        skip_unknown=True)
+        payment_results = filter_params(self, payment_results,
+                                        skip_unknown=True)
+        return invoice_results, payment_results
 
-                if param in payment_fields or param.split('__')[0] in payment_fields and param not in remove_all:
-                    payment_results = payment_results.filter(**{param: params[param]})
+    def get_queryset(self):
+        invoice_results, payment_results = self.get_querysets()
 
         for payment in payment_results:
             payment.sorting_date = payment.collected_on
@@ -711,10 +804,12 @@ class PaymentStatusView(APIView):
                         payment_status="success",
                         invoice=invoice,
                         transaction_type="collected",
-                        collected_on=timezone.now().strftime('%Y-%m-%d')
+                        collected_on=timezone.localdate()
                     )
                     payment.receipt_id = payment.id
                     payment.save()
+                    record_wallet_ledger(payment.patient_id, 'online_payment',
+                                         invoice.id)
 
                     confirm_payment_notification(appointment_data)
                     appointment_booked_by_patient_notification(appointment_data)
@@ -0,0 +1,381 @@
+import datetime
+import inspect
+import random
+import statistics
+import time
+import tracemalloc
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group
+from django.db import connection, transaction
+from django.db.models import QuerySet, Sum
+from django.urls import NoReverseMatch, URLResolver, resolve, reverse
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from appointment.models import Appointment, Category, Procedure, \
+    procedure_family, procedure_session
+from clinic.models import Clinic
+from payment.models import Invoice, InvoiceItems, Payment, Wallet
+from report.rollups import ROLLUPS, rebuild_rollup
+from report.urls import report_urls
+from report.utils import AppointmentReport
+from user.models import User
+
+PROCEDURES = [
+    'Consultation',
+    'Chiropractic Treatment Plan > Session 1/12',
+    'Chiropractic Treatment Plan > Session 12/12',
+    'Chiropractic Treatment Plan > Session 1/20',
+    'Chiropractic Treatment Plan > Session 20/20',
+    'Physiotherapy Plus - 1/12',
+    'Physiotherapy Plus - 12/12',
+    'Physiotherapy Plus - 1/20',
+    'Physiotherapy Plus - 20/20',
+]
+CATEGORIES = ['Chiropractic', 'Physiotherapy', 'Consultation']
+STATUSES = ['checked_out'] * 6 + ['booked', 'checked_in', 'engaged',
+                                  'cancelled', 'not_visited']
+PAYMENT_TYPES = ['card', 'cash', 'upi', 'netbanking', 'wallet']
+
+# arguments for the AppointmentReport methods that take more than the request
+METHOD_ARGS = {
+    'get_category_appointments_count': ('Chiropractic',),
+    'get_category_total_income': ('Chiropractic',),
+    'get_category_total_discount': ('Chiropractic',),
+    'get_procedure_appointments_count': ('Consultation',),
+    'get_procedure_appointments_earning': ('Consultation',),
+    'get_session_appointments_count': ('Chiropractic',),
+    'get_count_on_status': ('cancelled',),
+    'get_cost_on_status': ('not_visited',),
+    'get_unique_patients_by_category': ('Chiropractic',),
+}
+# endpoints that are not plain GET reports
+SKIPPED_ENDPOINTS = {'export_jobs', 'report_cache_stats'}
+# slowdowns below this are timer noise, whatever the tolerance
+MIN_SLOWDOWN_MS = 5
+# extra query parameters an endpoint is also benchmarked with
+ENDPOINT_VARIANTS = {
+    'income_export': [{'stream': 'true'}],
+    'payment_export': [{'stream': 'true'}],
+}
+
+
+def generate_dataset(clinics=2, doctors=10, patients=500, appointments=5000,
+                     days=90, seed=0):
+    """
+    Bulk create a synthetic dataset of ``appointments`` spread over the last
+    ``days`` days, with their invoices, items, payments and wallet entries.
+    Returns the admin user, the clinic ids and the date window covered.
+    """
+    rand = random.Random(seed)
+    tag = f'bench{seed}_{int(time.time())}'
+    to_day = timezone.localdate()
+    from_day = to_day - datetime.timedelta(days=days - 1)
+    password = make_password(None)
+
+    admin = User.objects.create(username=f'{tag}_admin', password=password,
+                                first_name='Bench', last_name='Admin')
+    audit = {'created_by': admin, 'updated_by': admin}
+    clinic_list = Clinic.objects.bulk_create([
+        Clinic(name=f'Bench clinic {i}', tagline='', city='City',
+               state='State', country='India', **audit)
+        for i in range(clinics)])
+    doctor_list = User.objects.bulk_create([
+        User(username=f'{tag}_doctor_{i}', password=password,
+             first_name='Doctor', last_name=str(i))
+        for i in range(doctors)])
+    Group.objects.get_or_create(name='doctor')[0].user_set.add(*doctor_list)
+    patient_list = User.objects.bulk_create([
+        User(username=f'{tag}_patient_{i}', password=password,
+             first_name='Patient', last_name=str(i),
+             atlas_id=f'{tag}_{i}')
+        for i in range(patients)])
+
+    categories, procedures = {}, {}
+    for clinic in clinic_list:
+        categories[clinic.id] = Category.objects.bulk_create([
+            Category(name=name, clinic=clinic, **audit)
+            for name in CATEGORIES])
+        # bulk_create skips Procedure.save(), so fill the report keys here
+        procedures[clinic.id] = Procedure.objects.bulk_create([
+            Procedure(name=name, family=procedure_family(name),
+                      session=procedure_session(name), clinic=clinic,
+                      cost=rand.choice([500.0, 800.0, 1200.0]), **audit)
+            for name in PROCEDURES])
+
+    appointment_list = []
+    for _ in range(appointments):
+        clinic = rand.choice(clinic_list)
+        scheduled_from = timezone.make_aware(datetime.datetime.combine(
+            from_day + datetime.timedelta(days=rand.randrange(days)),
+            datetime.time(rand.randrange(9, 19), rand.choice([0, 15, 30, 45]))
+        ))
+        appointment_status = rand.choice(STATUSES)
+        visited = appointment_status in ('checked_in', 'engaged',
+                                         'checked_out')
+        doctor = rand.choice(doctor_list)
+        appointment_list.append(Appointment(
+            is_new=rand.random() < 0.3,
+            clinic=clinic,
+            doctor=doctor,
+            patient=rand.choice(patient_list),
+            category=rand.choice(categories[clinic.id]),
+            procedure=rand.choice(procedures[clinic.id]),
+            scheduled_from=scheduled_from,
+            scheduled_to=scheduled_from + datetime.timedelta(minutes=30),
+            checked_in=scheduled_from if visited else None,
+            engaged_at=scheduled_from + datetime.timedelta(
+                minutes=rand.randrange(5, 30)) if visited else None,
+            checked_out=scheduled_from + datetime.timedelta(
+                minutes=rand.randrange(30, 60)) if visited else None,
+            appointment_status=appointment_status,
+            # cancellations are split by who made the last change
+            updated_by=rand.choice([admin, doctor]),
+            created_by=admin))
+    appointment_list = Appointment.objects.bulk_create(appointment_list)
+
+    invoice_list = Invoice.objects.bulk_create([
+        Invoice(appointment=appointment, patient_id=appointment.patient_id,
+                clinic_id=appointment.clinic_id,
+                invoice_number=f'BN{index}',
+                date=timezone.localtime(appointment.scheduled_from).date(),
+                **audit)
+        for index, appointment in enumerate(appointment_list)
+        if appointment.appointment_status != 'cancelled'
+        and rand.random() < 0.8])
+
+    items, payments, wallets = [], [], []
+    for invoice in invoice_list:
+        grand_total = 0
+        for procedure in rand.sample(procedures[invoice.clinic_id],
+                                     rand.randint(1, 3)):
+            discount = rand.choice([0.0, 0.0, 50.0, 100.0])
+            tax = round(procedure.cost * 0.18, 2)
+            total = procedure.cost + tax
+            grand_total += total - discount
+            items.append(InvoiceItems(
+                invoice=invoice, procedure=procedure,
+                doctor_id=invoice.appointment.doctor_id, tax_amount=tax,
+                tax_percentage=18.0, price=procedure.cost, total=total,
+                discount=discount, total_after_discount=total - discount,
+                **audit))
+        invoice.grand_total = grand_total
+
+        paid = grand_total if rand.random() < 0.7 else \
+            round(grand_total * rand.random(), 2)
+        invoice.is_paid = paid >= grand_total
+        excess = rand.choice([0.0] * 9 + [500.0])
+        payments.append(Payment(
+            invoice=invoice, clinic_id=invoice.clinic_id,
+            patient_id=invoice.patient_id,
+            receipt_id=f'R{invoice.id}',
+            type=rand.choice(PAYMENT_TYPES),
+            mode=rand.choice(['online', 'offline']),
+            transaction_id=f'T{invoice.id}', price=paid + excess,
+            balance=round(grand_total - paid, 2), excess_amount=excess,
+            transaction_type=rand.choice(['collected'] * 4 +
+                                         ['wallet_payment']),
+            payment_status='success', collected_on=invoice.date, **audit))
+        if excess:
+            wallets.append(Wallet(user_id=invoice.patient_id, amount=excess,
+                                  type='dr', invoice=invoice, **audit))
+    Invoice.objects.bulk_update(invoice_list, ['grand_total', 'is_paid'])
+    InvoiceItems.objects.bulk_create(items)
+    Payment.objects.bulk_create(payments)
+    Wallet.objects.bulk_create(wallets)
+
+    # plan the benchmarked queries on the new rows' statistics
+    with connection.cursor() as cursor:
+        for model in (Appointment, Invoice, InvoiceItems, Payment, Wallet):
+            cursor.execute(f'ANALYZE {model._meta.db_table}')
+
+    # bulk_create sends no signals, so bring the rollups up to date by hand
+    for clinic in clinic_list:
+        for kind in ROLLUPS:
+            rebuild_rollup(kind, from_day, to_day, clinic.id)
+
+    return {
+        'admin': admin,
+        'clinic_ids': [clinic.id for clinic in clinic_list],
+        'from_date': f'{from_day}T00:00:00',
+        'to_date': f'{to_day}T00:00:00',
+    }
+
+
+def evaluate(result):
+    """
+    ``result`` with its querysets, also those in a tuple, list or dict,
+    run into lists, so a method returning a lazy queryset is timed with its
+    query.
+    """
+    if isinstance(result, QuerySet):
+        return list(result)
+    if isinstance(result, (tuple, list)):
+        return type(result)(evaluate(item) for item in result)
+    if isinstance(result, dict):
+        return {key: evaluate(value) for key, value in result.items()}
+    return result
+
+
+def measure(func, repeat=3):
+    """
+    Query count and peak python memory of one instrumented call of ``func``,
+    and its median wall time over ``repeat`` plain calls.
+    """
+    queries = []
+
+    def count(execute, sql, params, many, context):
+        queries.append(sql)
+        return execute(sql, params, many, context)
+
+    tracemalloc.start()
+    with connection.execute_wrapper(count):
+        func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return {
+        'queries': len(queries),
+        'time_ms': round(statistics.median(timings) * 1000, 2),
+        'peak_kb': round(peak / 1024, 1),
+    }
+
+
+def hot_path_queries(dataset):
+    """
+    The billing lookups that run on every payment and balance request and
+    on the daily and weekly views, for the first clinic, the last week of
+    ``dataset`` and a patient with dues.
+    """
+    clinic_id = dataset['clinic_ids'][0]
+    to_day = datetime.date.fromisoformat(dataset['to_date'][:10])
+    window = (to_day - datetime.timedelta(days=6), to_day)
+    payment = Payment.objects.filter(clinic=clinic_id, balance__gt=0).first()
+    patient_id = payment.patient_id if payment else None
+    wallet = Wallet.objects.filter(invoice__clinic=clinic_id).first()
+    return {
+        'payments_collected': lambda: Payment.objects.filter(
+            clinic=clinic_id, collected_on__range=window,
+            transaction_type='collected').aggregate(Sum('price')),
+        'payments_with_balance': lambda: list(Payment.objects.filter(
+            patient=patient_id, balance__gt=0).order_by('id')),
+        'invoices_in_window': lambda: Invoice.objects.filter(
+            clinic=clinic_id, date__range=window).aggregate(
+            Sum('grand_total')),
+        'unpaid_invoices': lambda: list(Invoice.objects.filter(
+            is_paid=False, patient__in=[patient_id]).values('id')),
+        'invoice_items_in_window': lambda: InvoiceItems.objects.filter(
+            invoice__clinic=clinic_id,
+            created_at__range=window).aggregate(Sum('total')),
+        'wallet_of_invoice': lambda: Wallet.objects.filter(
+            user=wallet and wallet.user_id,
+            invoice=wallet and wallet.invoice_id).aggregate(Sum('amount')),
+    }
+
+
+def report_methods():
+    for name, method in inspect.getmembers(AppointmentReport,
+                                           inspect.isfunction):
+        if name.startswith('_') or 'filter_conditions' in name:
+            continue
+        params = list(inspect.signature(method).parameters)[1:]
+        if params and params != ['request'] and name not in METHOD_ARGS:
+            continue
+        yield name, params
+
+
+def report_endpoints(patterns=report_urls):
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            yield from report_endpoints(pattern.url_patterns)
+        elif pattern.name not in SKIPPED_ENDPOINTS:
+            try:
+                yield pattern.name, reverse(pattern.name)
+            except NoReverseMatch:
+                # needs an id, not a report
+                continue
+
+
+def run_benchmarks(dataset, repeat=3):
+    """
+    Time every AppointmentReport method, every report endpoint and the
+    billing hot path queries for the first clinic of ``dataset`` over its
+    whole date window.
+    """
+    clinic_id = dataset['clinic_ids'][0]
+    params = {'clinic_id': clinic_id, 'from_date': dataset['from_date'],
+              'to_date': dataset['to_date']}
+    factory = APIRequestFactory()
+    results = {}
+
+    def call_method(name, args):
+        def call():
+            app = AppointmentReport(**params)
+            method = getattr(app, name)
+            if args == ['request']:
+                return evaluate(method(factory.get('/', {'page': 1})))
+            return evaluate(method(*METHOD_ARGS.get(name, ())))
+        return call
+
+    def call_endpoint(path, extra):
+        view = resolve(path).func
+
+        def call():
+            request = factory.get(path, {**params, **extra})
+            force_authenticate(request, user=dataset['admin'])
+            response = view(request)
+            if response.streaming:
+                for _ in response.streaming_content:
+                    pass
+            elif hasattr(response, 'render'):
+                response.render()
+            return response
+        return call
+
+    benchmarks = [(f'method:{name}', call_method(name, args))
+                  for name, args in report_methods()]
+    for name, path in report_endpoints():
+        benchmarks.append((f'endpoint:{name}', call_endpoint(path, {})))
+        for extra in ENDPOINT_VARIANTS.get(name, []):
+            query = '&'.join(f'{key}={value}' for key, value in extra.items())
+            benchmarks.append((f'endpoint:{name}?{query}',
+                               call_endpoint(path, extra)))
+    benchmarks.extend((f'query:{name}', call) for name, call in
+                      hot_path_queries(dataset).items())
+    for name, call in benchmarks:
+        try:
+            # a savepoint each, a failed query would abort the ones after it
+            with transaction.atomic():
+                results[name] = measure(call, repeat)
+        except Exception as e:
+            results[name] = {'error': str(e)}
+    return results
+
+
+def regressions(baseline, results, tolerance=0.25):
+    """
+    Benchmarks that run more queries than ``baseline``, or take more than
+    ``tolerance`` longer.
+    """
+    found = []
+    for name, result in results.items():
+        before = baseline.get(name)
+        if not before or 'error' in before:
+            continue
+        if 'error' in result:
+            found.append(f'{name}: {result["error"]}')
+            continue
+        if result['queries'] > before['queries']:
+            found.append(f'{name}: {before["queries"]} -> '
+                         f'{result["queries"]} queries')
+        if result['time_ms'] > before['time_ms'] * (1 + tolerance) and \
+                result['time_ms'] - before['time_ms'] > MIN_SLOWDOWN_MS:
+            found.append(f'{name}: {before["time_ms"]} -> '
+                         f'{result["time_ms"]} ms')
+    return found
@@ -0,0 +1,98 @@
+import datetime
+import functools
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from django_redis import get_redis_connection
+
+logger = logging.getLogger('fuelapp')
+
+KEY_PREFIX = 'report'
+# one redis set per clinic listing the cached report keys of that clinic
+REGISTRY_KEY = 'report_cache:keys:{}'
+STATS_KEY = 'report_cache:stats'
+
+
+def report_cache_key(name, clinic_id, from_date, to_date):
+    return f'{KEY_PREFIX}:{name}:{clinic_id}:{from_date}:{to_date}'
+
+
+def parse_window(key):
+    _, _, _, from_date, to_date = key.split(':')
+    if from_date == 'None' or to_date == 'None':
+        # report without a date range covers every day
+        return None, None
+    return datetime.date.fromisoformat(from_date), \
+        datetime.date.fromisoformat(to_date)
+
+
+def record(name, result):
+    get_redis_connection('default').hincrby(STATS_KEY, f'{name}:{result}')
+
+
+def cache_stats():
+    stats = {}
+    for field, count in get_redis_connection('default').hgetall(
+            STATS_KEY).items():
+        name, result = field.decode().rsplit(':', 1)
+        stats.setdefault(name, {'hits': 0, 'misses': 0})[result] = int(count)
+    return stats
+
+
+def cached_report(method):
+    """
+    Cache an AppointmentReport summary under (report name, clinic_id,
+    from_date, to_date) until a write in that clinic and window invalidates
+    it.
+    """
+    @functools.wraps(method)
+    def wrapper(report):
+        if not settings.REPORT_CACHE_ENABLED:
+            return method(report)
+        name = method.__name__
+        key = report_cache_key(name, report.clinic_id, report.fdate,
+                               report.tdate)
+        result = cache.get(key)
+        if result is not None:
+            record(name, 'hits')
+            return result
+        record(name, 'misses')
+        result = method(report)
+        cache.set(key, result, settings.REPORT_CACHE_TIMEOUT)
+        registry = REGISTRY_KEY.format(report.clinic_id)
+        redis = get_redis_connection('default')
+        redis.sadd(registry, key)
+        # outlives every key it lists, and goes once they have all expired
+        redis.expire(registry, settings.REPORT_CACHE_TIMEOUT)
+        return result
+    return wrapper
+
+
+def invalidate_report_cache(clinic_id, day):
+    """
+    Drop every cached report of ``clinic_id`` (and the all-clinics reports)
+    whose date window contains ``day``.
+    """
+    if not settings.REPORT_CACHE_ENABLED or day is None:
+        return
+    try:
+        redis = get_redis_connection('default')
+        for registry in {REGISTRY_KEY.format(clinic_id),
+                         REGISTRY_KEY.format(None)}:
+            stale = []
+            for key in redis.smembers(registry):
+                key = key.decode()
+                from_date, to_date = parse_window(key)
+                if from_date is None or from_date <= day <= to_date:
+                    stale.append(key)
+            if stale:
+                cache.delete_many(stale)
+                redis.srem(registry, *stale)
+                logger.info(f'report cache: dropped {len(stale)} entries for '
+                            f'clinic {clinic_id} on {day}')
+    except Exception as e:
+        # runs after the commit, the write stands; the entries expire with
+        # REPORT_CACHE_TIMEOUT
+        logger.warning(f'report cache: could not drop entries for clinic '
+                       f'{clinic_id} on {day}: {e}')
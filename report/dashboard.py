@@ -0,0 +1,68 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger('fuelapp')
+
+# dashboard section -> AppointmentReport summary behind it
+SECTIONS = {
+    'appointment': 'appointment_summary',
+    'revenue': 'revenue_summary',
+    'billing': 'billing_summary',
+    'payment': 'payment_summary',
+    'payment_mode': 'payment_mode_summary',
+}
+
+# shared by every dashboard request, so a burst of requests can't open more
+# than this many extra database connections
+executor = ThreadPoolExecutor(max_workers=settings.REPORT_DASHBOARD_WORKERS,
+                              thread_name_prefix='report-dashboard')
+
+
+def run_section(app, method, timeout):
+    try:
+        # stop a slow section's query too, not just stop waiting for it
+        with connection.cursor() as cursor:
+            cursor.execute('SET statement_timeout = %s', [int(timeout * 1000)])
+        return getattr(app, method)()
+    finally:
+        connection.close()
+
+
+def dashboard(app, sections=None, timeout=None):
+    """
+    Evaluate the summary ``sections`` of ``app`` concurrently. Sections that
+    fail or run past ``timeout`` seconds are None, with the reason under
+    ``errors``.
+    """
+    sections = sections or list(SECTIONS)
+    timeout = timeout or settings.REPORT_DASHBOARD_TIMEOUT
+    result = {'errors': {}}
+
+    if connection.in_atomic_block:
+        # other threads can't see this transaction's rows
+        for name in sections:
+            result[name] = getattr(app, SECTIONS[name])()
+        return result
+
+    deadline = time.monotonic() + timeout
+    futures = {name: executor.submit(run_section, app, SECTIONS[name], timeout)
+               for name in sections}
+    for name, future in futures.items():
+        try:
+            result[name] = future.result(
+                timeout=max(deadline - time.monotonic(), 0))
+        except TimeoutError:
+            future.cancel()
+            result[name] = None
+            result['errors'][name] = 'timeout'
+            logger.warning(f'dashboard section {name} timed out after '
+                           f'{timeout}s for clinic {app.clinic_id}')
+        except Exception as e:
+            result[name] = None
+            result['errors'][name] = str(e)
+            logger.error(f'dashboard section {name} failed: {e}')
+    return result
@@ -0,0 +1,94 @@
+from django.db.models import F, Min, OuterRef, Subquery, Sum, Value, Window
+from django.db.models.functions import Coalesce, Collate, RowNumber
+
+from payment.models import Payment, Invoice, InvoiceItems
+from payment.serializers import invoice_procedure_names
+from report.summary import _subquery_sum
+
+# Rows are read in chunks from a server side cursor, so an export never
+# holds more than this many rows in memory
+CHUNK_SIZE = 2000
+
+
+def income_rows(clinic_id, from_date, to_date):
+    """
+    Flat IncomeReportExport rows in export order, one dict per invoice.
+    """
+    invoice = OuterRef('pk')
+    return Invoice.objects.filter(
+        clinic=clinic_id, date__range=(from_date, to_date)
+    ).annotate(
+        clinic_name=F('clinic__name'),
+        patient_first_name=F('patient__first_name'),
+        patient_last_name=F('patient__last_name'),
+        patient_atlas_id=F('patient__atlas_id'),
+        procedure_names=invoice_procedure_names(invoice),
+        cost=Coalesce(_subquery_sum(InvoiceItems, 'total', invoice=invoice),
+                      Value(0.0)),
+        discount=Coalesce(_subquery_sum(InvoiceItems, 'discount',
+                                        invoice=invoice), Value(0.0)),
+        tax=Coalesce(_subquery_sum(InvoiceItems, 'tax_amount',
+                                   invoice=invoice), Value(0.0)),
+        paid_amount=Coalesce(_subquery_sum(Payment, 'price', invoice=invoice),
+                             Value(0.0)),
+    ).order_by(
+        # "C" collation sorts invoice numbers the same way python does
+        'date', Collate('invoice_number', 'C'), 'id'
+    ).values(
+        'date', 'invoice_number', 'clinic_name', 'patient_first_name',
+        'patient_last_name', 'patient_atlas_id', 'procedure_names', 'cost',
+        'discount', 'tax', 'grand_total', 'paid_amount'
+    ).iterator(chunk_size=CHUNK_SIZE)
+
+
+def report_payments(clinic_id, from_date, to_date):
+    return Payment.objects.filter(
+        clinic=clinic_id,
+        collected_on__range=(from_date, to_date),
+        transaction_type__in=['collected', 'wallet_payment']
+    )
+
+
+def payment_rows(clinic_id, from_date, to_date):
+    """
+    Flat PaymentReportExport rows in export order. ``last_for_patient`` is 1
+    on the last row of each patient, where the advance row goes.
+    """
+    order = ['collected_on', 'receipt_id', 'invoice__invoice_number', 'id']
+    return report_payments(clinic_id, from_date, to_date).annotate(
+        clinic_name=F('clinic__name'),
+        patient_first_name=F('patient__first_name'),
+        patient_last_name=F('patient__last_name'),
+        patient_atlas_id=F('patient__atlas_id'),
+        invoice_number=F('invoice__invoice_number'),
+        invoice_date=F('invoice__date'),
+        procedure_names=invoice_procedure_names(OuterRef('invoice')),
+        last_for_patient=Window(
+            RowNumber(), partition_by=F('patient'),
+            order_by=[F(field).desc() for field in order]),
+    ).order_by(*order).values(
+        'patient', 'collected_on', 'receipt_id', 'clinic_name',
+        'patient_first_name', 'patient_last_name', 'patient_atlas_id',
+        'invoice_number', 'invoice_date', 'procedure_names', 'price', 'type',
+        'mode', 'transaction_id', 'payment_status', 'last_for_patient'
+    ).iterator(chunk_size=CHUNK_SIZE)
+
+
+def positive_balances(clinic_id, from_date, to_date):
+    """
+    Total positive balance per patient of the payment report, with the
+    clinic of the patient's first such payment, in one grouped query.
+    """
+    positive = Payment.objects.filter(
+        balance__gt=0, collected_on__range=(from_date, to_date))
+    first = positive.filter(patient=OuterRef('patient')).order_by('id')
+    return {
+        row['patient']: row for row in positive.filter(
+            patient__in=report_payments(
+                clinic_id, from_date, to_date).values('patient')
+        ).order_by().values('patient').annotate(
+            total_balance=Sum('balance'),
+            first_id=Min('id'),
+            clinic_name=Subquery(first.values('clinic__name')[:1]),
+        )
+    }
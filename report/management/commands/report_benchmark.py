@@ -0,0 +1,82 @@
+import json
+import platform
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from report.benchmark import generate_dataset, regressions, run_benchmarks
+
+
+class Command(BaseCommand):
+    help = 'Time every report method and endpoint against a synthetic ' \
+           'dataset and write the results as a JSON baseline.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clinics', type=int, default=2)
+        parser.add_argument('--doctors', type=int, default=10)
+        parser.add_argument('--patients', type=int, default=500)
+        parser.add_argument('--appointments', type=int, default=5000)
+        parser.add_argument('--days', type=int, default=90)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--repeat', type=int, default=3,
+                            help='timed runs per benchmark, the median is '
+                                 'reported')
+        parser.add_argument('--output', help='write the results to this file')
+        parser.add_argument('--compare',
+                            help='baseline file to check the results against')
+        parser.add_argument('--tolerance', type=float, default=0.25,
+                            help='allowed slowdown against the baseline')
+        parser.add_argument('--keep', action='store_true',
+                            help='keep the synthetic data instead of rolling '
+                                 'it back')
+
+    def handle(self, *args, **options):
+        dataset_options = {key: options[key] for key in (
+            'clinics', 'doctors', 'patients', 'appointments', 'days', 'seed')}
+
+        # cached reports would only time redis
+        with override_settings(REPORT_CACHE_ENABLED=False), \
+                transaction.atomic():
+            dataset = generate_dataset(**dataset_options)
+            results = run_benchmarks(dataset, options['repeat'])
+            if not options['keep']:
+                transaction.set_rollback(True)
+
+        baseline = {
+            'meta': {
+                'created_at': timezone.now().isoformat(),
+                'dataset': dataset_options,
+                'repeat': options['repeat'],
+                'report_use_rollups': settings.REPORT_USE_ROLLUPS,
+                'django': django.get_version(),
+                'python': platform.python_version(),
+            },
+            'results': results,
+        }
+        output = json.dumps(baseline, indent=2, sort_keys=True)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output)
+            self.stdout.write(f'results written to {options["output"]}')
+        else:
+            self.stdout.write(output)
+
+        for name, result in sorted(results.items()):
+            if 'error' in result:
+                self.stderr.write(f'{name}: {result["error"]}')
+
+        if options['compare']:
+            with open(options['compare']) as f:
+                previous = json.load(f)
+            if previous['meta']['dataset'] != dataset_options:
+                self.stderr.write('baseline was recorded on a different '
+                                  'dataset, results may not be comparable')
+            found = regressions(previous['results'], results,
+                                options['tolerance'])
+            if found:
+                raise CommandError('report regressions:\n' + '\n'.join(found))
+            self.stdout.write('no regressions against the baseline')
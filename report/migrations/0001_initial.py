@@ -0,0 +1,87 @@
+# Generated by Django 4.2.13 on 2026-10-18 18:08
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('appointment', '0016_doctorcategory'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('clinic', '0010_alter_clinicpeople_user'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PaymentDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('type', models.CharField(choices=[('card', 'Card'), ('cash', 'Cash'), ('upi', 'Upi'), ('netbanking', 'Net Banking'), ('wallet', 'Wallet')], max_length=10)),
+                ('mode', models.CharField(choices=[('online', 'Online'), ('offline', 'Offline')], max_length=10)),
+                ('transaction_type', models.CharField(choices=[('collected', 'Collected'), ('paid', 'Paid'), ('wallet_payment', 'Wallet')], max_length=20)),
+                ('payment_status', models.CharField(choices=[('pending', 'Pending'), ('success', 'Success'), ('failed', 'Failed')], max_length=15)),
+                ('payments', models.IntegerField(default=0)),
+                ('price', models.FloatField(default=0)),
+                ('excess_amount', models.FloatField(default=0)),
+                ('balance', models.FloatField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('clinic', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='clinic.clinic')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['clinic', 'day'], name='report_paym_clinic__a90156_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='InvoiceDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('payment_status', models.CharField(choices=[('pending', 'Pending'), ('partial_paid', 'Partial Paid'), ('collected', 'Collected')], max_length=20, null=True)),
+                ('invoices', models.IntegerField(default=0)),
+                ('grand_total', models.FloatField(default=0)),
+                ('cost', models.FloatField(default=0)),
+                ('discount', models.FloatField(default=0)),
+                ('tax', models.FloatField(default=0)),
+                ('total_after_discount', models.FloatField(default=0)),
+                ('paid', models.FloatField(default=0)),
+                ('wallet', models.FloatField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('category', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='appointment.category')),
+                ('clinic', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='clinic.clinic')),
+                ('doctor', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('procedure', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='appointment.procedure')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['clinic', 'day'], name='report_invo_clinic__cc4ef5_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='AppointmentDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('appointment_status', models.CharField(choices=[('booked', 'Booked'), ('checked_in', 'Checked In'), ('engaged', 'Engaged'), ('checked_out', 'Checked Out'), ('cancelled', 'Cancelled'), ('not_visited', 'Not Visited')], max_length=20)),
+                ('payment_status', models.CharField(choices=[('pending', 'Pending'), ('partial_paid', 'Partial Paid'), ('collected', 'Collected')], max_length=20)),
+                ('appointments', models.IntegerField(default=0)),
+                ('new_appointments', models.IntegerField(default=0)),
+                ('procedure_cost', models.FloatField(default=0)),
+                ('waiting_time', models.DurationField(null=True)),
+                ('waiting_count', models.IntegerField(default=0)),
+                ('treatment_time', models.DurationField(null=True)),
+                ('treatment_count', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('category', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='appointment.category')),
+                ('clinic', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='clinic.clinic')),
+                ('doctor', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('procedure', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='appointment.procedure')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['clinic', 'day'], name='report_appo_clinic__d586dd_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 4.2.13 on 2026-10-18 18:13
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clinic', '0010_alter_clinicpeople_user'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('report', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('report', models.CharField(choices=[('income', 'Income'), ('payment', 'Payment')], max_length=10)),
+                ('filetype', models.CharField(choices=[('csv', 'CSV'), ('pdf', 'PDF')], default='csv', max_length=5)),
+                ('from_date', models.DateField()),
+                ('to_date', models.DateField()),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('success', 'Success'), ('failed', 'Failed'), ('expired', 'Expired')], default='pending', max_length=10)),
+                ('file', models.FileField(blank=True, null=True, upload_to='uploads/exports/')),
+                ('error', models.TextField(blank=True, null=True)),
+                ('expires_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('clinic', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='clinic.clinic')),
+                ('created_by', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='export_job_created_by', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
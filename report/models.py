@@ -0,0 +1,134 @@
+from django.db import models
+
+from appointment.models import Appointment, Category, Procedure
+from clinic.models import Clinic
+from payment.models import MODE, PAYMENT_STATUS, TYPE, Payment
+from user.models import User
+
+
+# Create your models here.
+# Daily rollups are derived data: a celery task rebuilds a (clinic, day)
+# bucket whenever a source row in it changes, and
+# report.tasks.backfill_report_rollups rebuilds whole date ranges.
+
+
+class AppointmentDailyRollup(models.Model):
+    clinic = models.ForeignKey(Clinic, on_delete=models.CASCADE,
+                               related_name='+')
+    day = models.DateField()
+    doctor = models.ForeignKey(User, on_delete=models.CASCADE, null=True,
+                               related_name='+')
+    category = models.ForeignKey(Category, on_delete=models.CASCADE,
+                                 null=True, related_name='+')
+    procedure = models.ForeignKey(Procedure, on_delete=models.CASCADE,
+                                  null=True, related_name='+')
+    appointment_status = models.CharField(
+        choices=Appointment.APPOINTMENT_STAUTS, max_length=20)
+    payment_status = models.CharField(choices=Appointment.PAYMENT_STATUS,
+                                      max_length=20)
+    appointments = models.IntegerField(default=0)
+    new_appointments = models.IntegerField(default=0)
+    procedure_cost = models.FloatField(default=0)
+    waiting_time = models.DurationField(null=True)
+    waiting_count = models.IntegerField(default=0)
+    treatment_time = models.DurationField(null=True)
+    treatment_count = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['clinic', 'day'])]
+
+    def __str__(self):
+        return f"{self.clinic_id} {self.day} - {self.appointments}"
+
+
+class InvoiceDailyRollup(models.Model):
+    clinic = models.ForeignKey(Clinic, on_delete=models.CASCADE, null=True,
+                               related_name='+')
+    day = models.DateField()
+    # doctor, category, procedure and payment_status come from the
+    # invoice's appointment
+    doctor = models.ForeignKey(User, on_delete=models.CASCADE, null=True,
+                               related_name='+')
+    category = models.ForeignKey(Category, on_delete=models.CASCADE,
+                                 null=True, related_name='+')
+    procedure = models.ForeignKey(Procedure, on_delete=models.CASCADE,
+                                  null=True, related_name='+')
+    payment_status = models.CharField(choices=Appointment.PAYMENT_STATUS,
+                                      max_length=20, null=True)
+    invoices = models.IntegerField(default=0)
+    grand_total = models.FloatField(default=0)
+    cost = models.FloatField(default=0)
+    discount = models.FloatField(default=0)
+    tax = models.FloatField(default=0)
+    total_after_discount = models.FloatField(default=0)
+    paid = models.FloatField(default=0)
+    wallet = models.FloatField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['clinic', 'day'])]
+
+    def __str__(self):
+        return f"{self.clinic_id} {self.day} - {self.grand_total}"
+
+
+class PaymentDailyRollup(models.Model):
+    clinic = models.ForeignKey(Clinic, on_delete=models.CASCADE, null=True,
+                               related_name='+')
+    day = models.DateField()
+    type = models.CharField(choices=TYPE, max_length=10)
+    mode = models.CharField(choices=MODE, max_length=10)
+    # payment.models.TRANSACTION_TYPE is shadowed by the wallet choices
+    transaction_type = models.CharField(
+        choices=Payment._meta.get_field('transaction_type').choices,
+        max_length=20)
+    payment_status = models.CharField(choices=PAYMENT_STATUS, max_length=15)
+    payments = models.IntegerField(default=0)
+    price = models.FloatField(default=0)
+    excess_amount = models.FloatField(default=0)
+    balance = models.FloatField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['clinic', 'day'])]
+
+    def __str__(self):
+        return f"{self.clinic_id} {self.day} {self.type} - {self.price}"
+
+
+class ExportJob(models.Model):
+    REPORT = (
+        ('income', 'Income'),
+        ('payment', 'Payment'),
+    )
+    FILETYPE = (
+        ('csv', 'CSV'),
+        ('pdf', 'PDF'),
+    )
+    STATUS = (
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('success', 'Success'),
+        ('failed', 'Failed'),
+        ('expired', 'Expired'),
+    )
+    report = models.CharField(choices=REPORT, max_length=10)
+    filetype = models.CharField(choices=FILETYPE, max_length=5, default='csv')
+    clinic = models.ForeignKey(Clinic, on_delete=models.CASCADE,
+                               related_name='+')
+    from_date = models.DateField()
+    to_date = models.DateField()
+    status = models.CharField(choices=STATUS, max_length=10,
+                              default='pending')
+    file = models.FileField(upload_to='uploads/exports/', null=True,
+                            blank=True)
+    error = models.TextField(null=True, blank=True)
+    expires_at = models.DateTimeField(null=True, blank=True)
+    created_by = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name='export_job_created_by')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"#{self.id} {self.report} {self.filetype} - {self.status}"
@@ -0,0 +1,398 @@
+import logging
+
+from django.db import transaction
+from django.db.models import CharField, Count, F, OuterRef, Q, Sum, Value
+from django.db.models.functions import Concat, TruncDate, TruncMonth
+
+from appointment.models import Appointment
+from base.utils import convert_timedelta, price_format
+from clinic.models import Clinic
+from payment.models import Payment, Invoice, Wallet, InvoiceItems
+from report.summary import CHIROPRACTIC, PHYSIOTHERAPY, SESSIONS, \
+    _subquery_sum
+from .models import AppointmentDailyRollup, InvoiceDailyRollup, \
+    PaymentDailyRollup
+
+logger = logging.getLogger('fuelapp')
+
+APPOINTMENT = 'appointment'
+INVOICE = 'invoice'
+PAYMENT = 'payment'
+
+
+def _group(queryset, keys, aggregates):
+    # values() returns FK ids under the field name, the models want *_id
+    for row in queryset.order_by().values(*keys).annotate(**aggregates):
+        yield {f'{key}_id' if key in ('clinic', 'doctor', 'category',
+                                      'procedure') else key: value
+               for key, value in row.items()}
+
+
+def appointment_rows(queryset):
+    return _group(
+        queryset.filter(scheduled_from__isnull=False).annotate(
+            day=TruncDate('scheduled_from')),
+        ('clinic', 'day', 'doctor', 'category', 'procedure',
+         'appointment_status', 'payment_status'),
+        {
+            'appointments': Count('id'),
+            'new_appointments': Count('id', filter=Q(is_new=True)),
+            'procedure_cost': Sum('procedure__cost', default=0),
+            'waiting_time': Sum(F('engaged_at') - F('checked_in')),
+            'waiting_count': Count('id', filter=Q(engaged_at__isnull=False,
+                                                  checked_in__isnull=False)),
+            'treatment_time': Sum(F('checked_out') - F('engaged_at')),
+            'treatment_count': Count('id', filter=Q(checked_out__isnull=False,
+                                                    engaged_at__isnull=False)),
+        })
+
+
+def invoice_rows(queryset):
+    invoice = OuterRef('pk')
+    return _group(
+        queryset.annotate(
+            day=F('date'),
+            doctor=F('appointment__doctor'),
+            category=F('appointment__category'),
+            procedure=F('appointment__procedure'),
+            payment_status=F('appointment__payment_status'),
+            items_cost=_subquery_sum(InvoiceItems, 'price', invoice=invoice),
+            items_discount=_subquery_sum(InvoiceItems, 'discount',
+                                         invoice=invoice),
+            items_tax=_subquery_sum(InvoiceItems, 'tax_amount',
+                                    invoice=invoice),
+            items_total=_subquery_sum(InvoiceItems, 'total_after_discount',
+                                      invoice=invoice),
+            payments=_subquery_sum(Payment, 'price', invoice=invoice),
+            wallet_payments=_subquery_sum(Wallet, 'amount', invoice=invoice),
+        ),
+        ('clinic', 'day', 'doctor', 'category', 'procedure',
+         'payment_status'),
+        {
+            'invoices': Count('id'),
+            'grand_total': Sum('grand_total', default=0),
+            'cost': Sum('items_cost', default=0),
+            'discount': Sum('items_discount', default=0),
+            'tax': Sum('items_tax', default=0),
+            'total_after_discount': Sum('items_total', default=0),
+            'paid': Sum('payments', default=0),
+            'wallet': Sum('wallet_payments', default=0),
+        })
+
+
+def payment_rows(queryset):
+    return _group(
+        queryset.filter(collected_on__isnull=False).annotate(
+            day=F('collected_on')),
+        ('clinic', 'day', 'type', 'mode', 'transaction_type',
+         'payment_status'),
+        {
+            'payments': Count('id'),
+            'price': Sum('price', default=0),
+            'excess_amount': Sum('excess_amount', default=0),
+            'balance': Sum('balance', default=0),
+        })
+
+
+ROLLUPS = {
+    APPOINTMENT: (AppointmentDailyRollup, Appointment, 'scheduled_from__date',
+                  appointment_rows),
+    INVOICE: (InvoiceDailyRollup, Invoice, 'date', invoice_rows),
+    PAYMENT: (PaymentDailyRollup, Payment, 'collected_on', payment_rows),
+}
+
+
+def rebuild_rollup(kind, from_day, to_day, clinic_id=None):
+    """
+    Replace the rollup rows of ``kind`` between ``from_day`` and ``to_day``
+    (inclusive) with fresh aggregates of the source table. ``clinic_id``
+    limits the rebuild to a single clinic.
+    """
+    model, source, day_lookup, rows = ROLLUPS[kind]
+    source_rows = source.objects.filter(
+        **{f'{day_lookup}__range': (from_day, to_day)})
+    rollup_rows = model.objects.filter(day__range=(from_day, to_day))
+    with transaction.atomic():
+        if clinic_id is not None:
+            # serialise concurrent rebuilds of the same clinic's buckets
+            Clinic.objects.select_for_update().filter(id=clinic_id).exists()
+            source_rows = source_rows.filter(clinic=clinic_id)
+            rollup_rows = rollup_rows.filter(clinic=clinic_id)
+        rollup_rows.delete()
+        model.objects.bulk_create(
+            [model(**row) for row in rows(source_rows)], batch_size=1000)
+
+
+def schedule_rebuild(kind, clinic_id, day):
+    """
+    Rebuild a (clinic, day) bucket on a celery worker once the current
+    transaction commits. A bucket touched several times in one transaction
+    is rebuilt once.
+    """
+    if day is None:
+        return
+    connection = transaction.get_connection()
+    pending = connection.__dict__.setdefault('rollup_buckets', set())
+    if not connection.run_on_commit:
+        # the transaction that queued these was rolled back
+        pending.clear()
+    bucket = (kind, clinic_id, day)
+    if bucket in pending:
+        return
+    pending.add(bucket)
+
+    def rebuild():
+        from report.tasks import rebuild_report_rollup
+        pending.discard(bucket)
+        try:
+            rebuild_report_rollup.delay(kind, clinic_id, str(day))
+        except Exception as e:
+            # the write stands, the bucket waits for a backfill
+            logger.error(f'report rollups: could not queue the {kind} '
+                         f'rebuild of clinic {clinic_id} on {day}: {e}')
+
+    transaction.on_commit(rebuild)
+
+
+class RollupReport:
+    """
+    Read side of the daily rollups for AppointmentReport. Every method
+    mirrors the AppointmentReport getter of the same name.
+    """
+
+    def __init__(self, report):
+        self.report = report
+
+    def filter_rollup(self, model):
+        conditions = Q()
+        if self.report.clinic_id is not None:
+            conditions &= Q(clinic=self.report.clinic_id)
+        if self.report.fdate is not None and self.report.tdate is not None:
+            conditions &= Q(day__range=(self.report.fdate, self.report.tdate))
+        return model.objects.filter(conditions)
+
+    def appointments(self, **filters):
+        return self.filter_rollup(AppointmentDailyRollup).filter(**filters)
+
+    def invoices(self, **filters):
+        return self.filter_rollup(InvoiceDailyRollup).filter(**filters)
+
+    def payments(self, **filters):
+        return self.filter_rollup(PaymentDailyRollup).filter(**filters)
+
+    def _sum(self, queryset, field):
+        return queryset.aggregate(total=Sum(field, default=0))['total']
+
+    def get_total(self):
+        return self._sum(self.appointments(), 'appointments')
+
+    def get_category_appointments_count(self, category_name):
+        return self._sum(self.appointments(category__name=category_name),
+                         'appointments')
+
+    def get_procedure_appointments_count(self, procedure_name):
+        return self._sum(self.appointments(procedure__name=procedure_name),
+                         'appointments')
+
+    def get_session_appointments_count(self, family):
+        return dict(self.appointments(procedure__family=family).values_list(
+            'procedure__session').annotate(total=Sum('appointments')))
+
+    def get_procedure_appointments_earning(self, procedure_name):
+        return self._sum(self.appointments(procedure__name=procedure_name),
+                         'procedure_cost')
+
+    def get_cancelled_appointments_earning(self):
+        return self.get_cost_on_status('cancelled')
+
+    def get_cancelled_appointments(self):
+        return self.get_count_on_status('cancelled')
+
+    def get_count_on_status(self, status):
+        return self._sum(self.appointments(appointment_status=status),
+                         'appointments')
+
+    def get_cost_on_status(self, status):
+        return self._sum(self.appointments(appointment_status=status),
+                         'procedure_cost')
+
+    def get_advance_payment_count(self):
+        return self._sum(
+            self.appointments(payment_status__in=['collected',
+                                                  'partial_paid']),
+            'appointments')
+
+    def _average(self, time_field, count_field):
+        totals = self.appointments().aggregate(
+            time=Sum(time_field), count=Sum(count_field, default=0))
+        if not totals['count'] or totals['time'] is None:
+            return convert_timedelta(None)
+        return convert_timedelta(totals['time'] / totals['count'])
+
+    def get_avg_waiting_time(self):
+        return self._average('waiting_time', 'waiting_count')
+
+    def get_avg_treatment_time(self):
+        return self._average('treatment_time', 'treatment_count')
+
+    def get_total_income(self):
+        return self._sum(self.invoices(), 'grand_total')
+
+    def get_invoices_amount(self):
+        return self.get_total_income()
+
+    def get_category_total_income(self, category_name):
+        return self._sum(self.invoices(category__name=category_name),
+                         'grand_total')
+
+    def get_category_total_discount(self, category_name):
+        return self._sum(self.invoices(category__name=category_name),
+                         'discount')
+
+    def get_total_discount(self):
+        return self._sum(self.invoices(), 'discount')
+
+    def get_total_earning(self):
+        return self._sum(self.invoices(), 'paid')
+
+    def get_tax(self):
+        return self._sum(self.invoices(), 'tax')
+
+    def get_due_amount(self):
+        totals = self.invoices(payment_status='partial_paid').aggregate(
+            grand_total=Sum('grand_total', default=0),
+            paid=Sum('paid', default=0),
+            wallet=Sum('wallet', default=0))
+        return totals['grand_total'] - totals['paid'] - totals['wallet']
+
+    def appointment_metrics(self):
+        # the distinct patient counts are left to AppointmentSummary, a
+        # rollup row doesn't know its patients
+        cancelled = Q(appointment_status='cancelled')
+        no_show = Q(appointment_status='not_visited')
+        aggregates = {
+            'total': Sum('appointments', default=0),
+            'doctors': Sum('appointments', filter=Q(doctor__isnull=False),
+                           default=0),
+            'waiting_time': Sum('waiting_time'),
+            'waiting_count': Sum('waiting_count', default=0),
+            'treatment_time': Sum('treatment_time'),
+            'treatment_count': Sum('treatment_count', default=0),
+            'cancelled': Sum('appointments', filter=cancelled, default=0),
+            'cancelled_cost': Sum('procedure_cost', filter=cancelled,
+                                  default=0),
+            'no_show': Sum('appointments', filter=no_show, default=0),
+            'no_show_cost': Sum('procedure_cost', filter=no_show, default=0),
+        }
+        for category in (CHIROPRACTIC, PHYSIOTHERAPY):
+            aggregates[f'{category.lower()}_appointments'] = Sum(
+                'appointments', filter=Q(category__name=category), default=0)
+        for family in (CHIROPRACTIC, PHYSIOTHERAPY):
+            for session in SESSIONS:
+                key = f"{family.lower()}_{session.replace('/', '_')}"
+                aggregates[key] = Sum('appointments', filter=Q(
+                    procedure__family=family, procedure__session=session),
+                    default=0)
+        totals = self.appointments().aggregate(
+            **{f'total_{key}': value for key, value in aggregates.items()})
+        metrics = {key[len('total_'):]: value
+                   for key, value in totals.items()}
+        for name in ('waiting', 'treatment'):
+            time = metrics.pop(f'{name}_time')
+            count = metrics.pop(f'{name}_count')
+            metrics[f'avg_{name}_time'] = time / count \
+                if count and time is not None else None
+        return metrics
+
+    def invoice_metrics(self):
+        partial_paid = Q(payment_status='partial_paid')
+        aggregates = {
+            'income': Sum('grand_total', default=0),
+            'discount': Sum('discount', default=0),
+            'due_total': Sum('grand_total', filter=partial_paid, default=0),
+            'due_payments': Sum('paid', filter=partial_paid, default=0),
+            'due_wallet': Sum('wallet', filter=partial_paid, default=0),
+        }
+        for category in (CHIROPRACTIC, PHYSIOTHERAPY):
+            key = category.lower()
+            in_category = Q(category__name=category)
+            aggregates[f'{key}_income'] = Sum('grand_total',
+                                              filter=in_category, default=0)
+            aggregates[f'{key}_discount'] = Sum('discount',
+                                                filter=in_category, default=0)
+        # aggregate aliases may not shadow the rollup's own columns
+        totals = self.invoices().aggregate(
+            **{f'total_{key}': value for key, value in aggregates.items()})
+        return {key[len('total_'):]: value for key, value in totals.items()}
+
+    def payment_metrics(self):
+        return self.payments().aggregate(
+            advance=Sum('excess_amount', filter=Q(transaction_type='collected'),
+                        default=0),
+            collected=Sum('price', filter=Q(transaction_type='collected'),
+                          default=0),
+            paid=Sum('price', filter=Q(transaction_type='paid'), default=0),
+        )
+
+    def get_total_advance(self):
+        return self._sum(self.payments(transaction_type='collected'),
+                         'excess_amount')
+
+    def get_total_payments(self):
+        totals = self.payments().aggregate(
+            collected=Sum('price', filter=Q(transaction_type='collected'),
+                          default=0),
+            paid=Sum('price', filter=Q(transaction_type='paid'), default=0))
+        return totals['collected'] - totals['paid']
+
+    def payment_mode_summary(self):
+        payment_mode = list(self.payments().exclude(
+            type='wallet'
+        ).values('type').annotate(total=Sum('price', default=0)))
+        payment_mode.append({
+            'type': 'total',
+            'total': price_format(sum(row['total'] for row in payment_mode))
+        })
+        return payment_mode
+
+    def payments_per_day(self):
+        types = {'upi': 'upi', 'card': 'card', 'cash': 'cash',
+                 'net_banking': 'netbanking', 'wallet': 'wallet'}
+        totals = {key: Sum('price', filter=Q(type=value))
+                  for key, value in types.items()}
+        totals['total'] = Sum('price')
+        payments = self.payments(transaction_type='collected',
+                                 payment_status='success')
+        daily = payments.values('day').annotate(**totals).order_by('day')
+        overall = payments.aggregate(**totals)
+
+        def row(date, values):
+            return dict({'date': date}, **{
+                key: price_format(values[key] or 0)
+                for key in list(types) + ['total']})
+
+        return [row('Total', overall)] + [row(day['day'], day)
+                                          for day in daily]
+
+    def appointments_per_doctor(self):
+        return self.appointments().values(
+            full_name=Concat(F('doctor__first_name'), Value(' '),
+                             F('doctor__last_name'), output_field=CharField())
+        ).annotate(
+            total_appointments=Sum('appointments'),
+            total_attended_appointments=Sum(
+                'appointments', filter=Q(appointment_status='checked_out'),
+                default=0),
+            total_cancelled_appointments=Sum(
+                'appointments', filter=Q(appointment_status='cancelled'),
+                default=0),
+            total_no_show=Sum(
+                'appointments', filter=Q(appointment_status='not_visited'),
+                default=0))
+
+    def monthly_appointments(self):
+        return self.appointments().annotate(
+            month=TruncMonth('day')
+        ).values('month').annotate(
+            total_appointments=Sum('appointments')
+        ).order_by('month')
@@ -0,0 +1,42 @@
+from django.urls import reverse
+from rest_framework import serializers
+
+from .models import ExportJob
+
+
+class ExportJobSerializer(serializers.ModelSerializer):
+    # the export endpoints take datetimes, plain dates work as well
+    from_date = serializers.DateField(
+        input_formats=['%Y-%m-%dT%H:%M:%S', 'iso-8601'])
+    to_date = serializers.DateField(
+        input_formats=['%Y-%m-%dT%H:%M:%S', 'iso-8601'])
+    download_url = serializers.SerializerMethodField(read_only=True)
+
+    class Meta:
+        model = ExportJob
+        fields = (
+            'id',
+            'report',
+            'filetype',
+            'clinic',
+            'from_date',
+            'to_date',
+            'status',
+            'error',
+            'expires_at',
+            'download_url',
+            'created_at',
+        )
+        read_only_fields = ('status', 'error', 'expires_at', 'created_at')
+
+    def validate(self, data):
+        if data['from_date'] > data['to_date']:
+            raise serializers.ValidationError("Invalid date range")
+        return data
+
+    def get_download_url(self, obj):
+        if obj.status != 'success':
+            return None
+        url = reverse('export_job_download', args=[obj.id])
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
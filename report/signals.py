@@ -0,0 +1,102 @@
+import datetime
+import functools
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from appointment.models import Appointment
+from payment.models import Invoice, InvoiceItems, Payment, Wallet
+from report.cache import invalidate_report_cache
+from report.rollups import APPOINTMENT, INVOICE, PAYMENT, schedule_rebuild
+
+
+def appointment_buckets(appointment):
+    buckets = set()
+    if appointment.scheduled_from is not None:
+        buckets.add((APPOINTMENT, appointment.clinic_id,
+                     timezone.localtime(appointment.scheduled_from).date()))
+    if appointment.pk:
+        # invoice rollups carry the appointment's doctor, category and status
+        for clinic_id, day in Invoice.objects.filter(
+                appointment=appointment.pk).values_list('clinic', 'date'):
+            buckets.add((INVOICE, clinic_id, day))
+    return buckets
+
+
+def invoice_buckets(invoice):
+    return {(INVOICE, invoice.clinic_id, invoice.date)}
+
+
+def invoice_child_buckets(instance):
+    if instance.invoice_id is None:
+        return set()
+    return {(INVOICE, clinic_id, day) for clinic_id, day in
+            Invoice.objects.filter(id=instance.invoice_id).values_list(
+                'clinic', 'date')}
+
+
+def payment_buckets(payment):
+    return invoice_child_buckets(payment) | {
+        (PAYMENT, payment.clinic_id, payment.collected_on)}
+
+
+ROLLUP_BUCKETS = {
+    Appointment: appointment_buckets,
+    Invoice: invoice_buckets,
+    InvoiceItems: invoice_child_buckets,
+    Payment: payment_buckets,
+    Wallet: invoice_child_buckets,
+}
+
+
+def writes_rollups():
+    # kept up to date before reads switch over, so a backfill stays current
+    return settings.REPORT_WRITE_ROLLUPS or settings.REPORT_USE_ROLLUPS
+
+
+def enabled(sender):
+    return sender in ROLLUP_BUCKETS and (writes_rollups() or
+                                         settings.REPORT_CACHE_ENABLED)
+
+
+def schedule(buckets):
+    # a date field assigned a string keeps it until the row is read back
+    buckets = {(kind, clinic_id, datetime.date.fromisoformat(day)
+                if isinstance(day, str) else day)
+               for kind, clinic_id, day in buckets}
+    if writes_rollups():
+        for kind, clinic_id, day in buckets:
+            schedule_rebuild(kind, clinic_id, day)
+    # the rebuild tasks drop these again once the rollups are fresh
+    for clinic_id, day in {(clinic_id, day) for _, clinic_id, day in buckets}:
+        transaction.on_commit(
+            functools.partial(invalidate_report_cache, clinic_id, day))
+
+
+@receiver(pre_save)
+def track_rollup_buckets(sender, instance, **kwargs):
+    if not enabled(sender):
+        return
+    # a moved row also has to leave its old (clinic, day) bucket
+    previous = sender.objects.filter(pk=instance.pk).first() \
+        if instance.pk else None
+    instance._rollup_buckets = ROLLUP_BUCKETS[sender](previous) \
+        if previous else set()
+
+
+@receiver(post_save)
+def update_rollups(sender, instance, **kwargs):
+    if not enabled(sender):
+        return
+    schedule(getattr(instance, '_rollup_buckets', set()) |
+             ROLLUP_BUCKETS[sender](instance))
+
+
+@receiver(post_delete)
+def delete_rollups(sender, instance, **kwargs):
+    if not enabled(sender):
+        return
+    schedule(ROLLUP_BUCKETS[sender](instance))
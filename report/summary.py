@@ -0,0 +1,206 @@
+from django.contrib.auth.models import Group
+from django.db.models import Avg, Count, Exists, F, OuterRef, Q, Subquery, \
+    Sum
+
+from appointment.models import Appointment
+from base.utils import convert_timedelta, price_format
+from payment.models import Payment, Invoice, Wallet, InvoiceItems
+
+CHIROPRACTIC = 'Chiropractic'
+PHYSIOTHERAPY = 'Physiotherapy'
+
+SESSIONS = ('1/12', '12/12', '1/20', '20/20')
+
+
+def _subquery_sum(model, field, **filters):
+    # Correlated SUM per outer row, so child rows never fan out the parent
+    key = next(iter(filters))
+    return Subquery(
+        model.objects.filter(**filters).order_by().values(key).annotate(
+            total=Sum(field)).values('total')[:1])
+
+
+class AppointmentSummary:
+    """
+    Computes the appointment summary dashboard with one conditional
+    aggregate per table instead of one query per metric.
+    """
+
+    def __init__(self, report):
+        self.report = report
+
+    def appointment_metrics(self):
+        updated_by_doctor = Exists(
+            Group.objects.filter(user=OuterRef('updated_by'), name='doctor'))
+        cancelled = Q(appointment_status='cancelled')
+        # distinct counts, which only the appointments themselves can give
+        aggregates = {
+            'patients': Count('patient', distinct=True),
+            'old_patients': Count('patient', distinct=True,
+                                  filter=~Q(is_new=True)),
+            'new_patients': Count('patient', distinct=True,
+                                  filter=Q(is_new=True)),
+            'cancelled_by_doctors': Count(
+                'doctor', distinct=True,
+                filter=cancelled & Q(updated_by_doctor=True)),
+            'cancelled_by_patients': Count(
+                'patient', distinct=True,
+                filter=cancelled & Q(updated_by_doctor=False)),
+        }
+        for category in (CHIROPRACTIC, PHYSIOTHERAPY):
+            aggregates[f'{category.lower()}_patients'] = Count(
+                'patient', distinct=True, filter=Q(category__name=category))
+        if self.report.rollup:
+            metrics = self.report.rollup.appointment_metrics()
+        else:
+            metrics = {}
+            aggregates.update({
+                'total': Count('id'),
+                'doctors': Count('doctor'),
+                'avg_waiting_time': Avg(F('engaged_at') - F('checked_in')),
+                'avg_treatment_time': Avg(F('checked_out') - F('engaged_at')),
+                'cancelled': Count('id', filter=cancelled),
+                'cancelled_cost': Sum('procedure__cost', filter=cancelled,
+                                      default=0),
+                'no_show': Count('id',
+                                 filter=Q(appointment_status='not_visited')),
+                'no_show_cost': Sum('procedure__cost',
+                                    filter=Q(appointment_status='not_visited'),
+                                    default=0),
+            })
+            for category in (CHIROPRACTIC, PHYSIOTHERAPY):
+                aggregates[f'{category.lower()}_appointments'] = Count(
+                    'id', filter=Q(category__name=category))
+            for family in (CHIROPRACTIC, PHYSIOTHERAPY):
+                for session in SESSIONS:
+                    key = f"{family.lower()}_{session.replace('/', '_')}"
+                    aggregates[key] = Count('id', filter=Q(
+                        procedure__family=family, procedure__session=session))
+
+        metrics.update(Appointment.objects.filter(
+            self.report.get_appointment_filter_conditions()
+        ).annotate(
+            updated_by_doctor=updated_by_doctor
+        ).aggregate(**aggregates))
+        return metrics
+
+    def invoice_metrics(self):
+        if self.report.rollup:
+            return self.report.rollup.invoice_metrics()
+        invoice = OuterRef('pk')
+        partial_paid = Q(appointment__payment_status='partial_paid')
+        aggregates = {
+            'income': Sum('grand_total', default=0),
+            'discount': Sum('items_discount', default=0),
+            'due_total': Sum('grand_total', filter=partial_paid, default=0),
+            'due_payments': Sum('payments', filter=partial_paid, default=0),
+            'due_wallet': Sum('wallet_payments', filter=partial_paid,
+                              default=0),
+        }
+        for category in (CHIROPRACTIC, PHYSIOTHERAPY):
+            key = category.lower()
+            in_category = Q(appointment__category__name=category)
+            aggregates[f'{key}_income'] = Sum('grand_total',
+                                              filter=in_category, default=0)
+            aggregates[f'{key}_discount'] = Sum('items_discount',
+                                                filter=in_category, default=0)
+
+        return Invoice.objects.filter(
+            self.report.get_filter_conditions_invoices()
+        ).annotate(
+            items_discount=_subquery_sum(InvoiceItems, 'discount',
+                                         invoice=invoice),
+            payments=_subquery_sum(Payment, 'price', invoice=invoice),
+            wallet_payments=_subquery_sum(Wallet, 'amount', invoice=invoice),
+        ).aggregate(**aggregates)
+
+    def payment_metrics(self):
+        if self.report.rollup:
+            return self.report.rollup.payment_metrics()
+        return Payment.objects.filter(
+            self.report.get_filter_conditions_payment()
+        ).aggregate(
+            advance=Sum('excess_amount', filter=Q(transaction_type='collected'),
+                        default=0),
+            collected=Sum('price', filter=Q(transaction_type='collected'),
+                          default=0),
+            paid=Sum('price', filter=Q(transaction_type='paid'), default=0),
+        )
+
+    def summary(self):
+        appointments = self.appointment_metrics()
+        invoices = self.invoice_metrics()
+        payments = self.payment_metrics()
+
+        chiropractic_earning = invoices['chiropractic_income'] - \
+            invoices['chiropractic_discount']
+        physiotherapy_earning = invoices['physiotherapy_income'] - \
+            invoices['physiotherapy_discount']
+        due_amount = invoices['due_total'] - invoices['due_payments'] - \
+            invoices['due_wallet']
+
+        return {
+            'total_appointments': appointments['total'],
+            'count_of_doctors_with_appointments': appointments['doctors'],
+            'chiropractic_appointments':
+                appointments['chiropractic_appointments'],
+            'physiotherapy_appointments':
+                appointments['physiotherapy_appointments'],
+            'session_12_12_appointments': appointments['chiropractic_12_12'],
+            'session_20_20_appointments': appointments['chiropractic_20_20'],
+            'avg_waiting_time': convert_timedelta(
+                appointments['avg_waiting_time']),
+            'avg_treatment_time': convert_timedelta(
+                appointments['avg_treatment_time']),
+
+            'chiropractic_session_1_12': appointments['chiropractic_1_12'],
+            'chiropractic_session_12_12': appointments['chiropractic_12_12'],
+            'chiropractic_session_1_20': appointments['chiropractic_1_20'],
+            'chiropractic_session_20_20': appointments['chiropractic_20_20'],
+            'total_earnings_chiropractic_sessions':
+                price_format(chiropractic_earning),
+
+            'physiotherapy_sessions_1_12': appointments['physiotherapy_1_12'],
+            'physiotherapy_sessions_12_12':
+                appointments['physiotherapy_12_12'],
+            'physiotherapy_sessions_1_20': appointments['physiotherapy_1_20'],
+            'physiotherapy_sessions_20_20':
+                appointments['physiotherapy_20_20'],
+            'total_earnings_Physiotherapy_sessions':
+                price_format(physiotherapy_earning),
+
+            'cancelled_by_doctors': appointments['cancelled_by_doctors'],
+            'cancelled_by_patients': appointments['cancelled_by_patients'],
+            'no_cancelled_appointments': appointments['cancelled'],
+            'total_cost_cancelled_appointments':
+                price_format(appointments['cancelled_cost']),
+            'no_show': appointments['no_show'],
+            'total_cost_no_show_appointments':
+                price_format(appointments['no_show_cost']),
+
+            'patients': appointments['patients'],
+            'old_patients': appointments['old_patients'],
+            'new_patients': appointments['new_patients'],
+            'chiropractic_patients': appointments['chiropractic_patients'],
+            'physiotherapy_patients': appointments['physiotherapy_patients'],
+
+            'total_income': price_format(invoices['income']),
+            'total_discount': price_format(invoices['discount']),
+            'total_earning': price_format(
+                invoices['income'] - invoices['discount']),
+            'total_due_payment': price_format(due_amount),
+            'total_advance': price_format(payments['advance']),
+
+            'total_income_chiropractic':
+                price_format(invoices['chiropractic_income']),
+            'total_discount_chiropractic':
+                price_format(invoices['chiropractic_discount']),
+            'total_earning_chiropractic': price_format(chiropractic_earning),
+
+            'total_income_physiotherapy':
+                price_format(invoices['physiotherapy_income']),
+            'total_discount_physiotherapy':
+                price_format(invoices['physiotherapy_discount']),
+            'total_earning_physiotherapy':
+                price_format(physiotherapy_earning),
+        }
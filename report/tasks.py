@@ -0,0 +1,97 @@
+import datetime
+import logging
+import tempfile
+
+from celery import shared_task
+from django.conf import settings
+from django.core.files import File
+from django.utils import timezone
+
+from base.utils import generate_pdf_file
+from report.cache import invalidate_report_cache
+from report.models import ExportJob
+from report.rollups import ROLLUPS, rebuild_rollup
+from report.utils import AppointmentReport
+
+logger = logging.getLogger('fuelapp')
+
+
+@shared_task
+def backfill_report_rollups(from_date=None, to_date=None, days=None,
+                            clinic_id=None):
+    """
+    Rebuild the daily report rollups for ``from_date``..``to_date``
+    (YYYY-MM-DD), or for the last ``days`` days. Ranges are rebuilt a month
+    at a time so a large backfill never holds one long transaction.
+    """
+    today = timezone.localdate()
+    to_day = datetime.date.fromisoformat(to_date) if to_date else today
+    if from_date:
+        from_day = datetime.date.fromisoformat(from_date)
+    else:
+        from_day = to_day - datetime.timedelta(days=(days or 1) - 1)
+
+    start = from_day
+    while start <= to_day:
+        end = min(start + datetime.timedelta(days=30), to_day)
+        for kind in ROLLUPS:
+            rebuild_rollup(kind, start, end, clinic_id)
+        start = end + datetime.timedelta(days=1)
+    logger.info(f'report rollups rebuilt for {from_day} - {to_day}')
+
+
+@shared_task
+def rebuild_report_rollup(kind, clinic_id, day):
+    """
+    Rebuild the ``kind`` rollup of one clinic on one day (YYYY-MM-DD) after
+    a write in it, then drop the cached reports that read it.
+    """
+    day = datetime.date.fromisoformat(day)
+    rebuild_rollup(kind, day, day, clinic_id)
+    invalidate_report_cache(clinic_id, day)
+
+
+@shared_task
+def run_export_job(job_id):
+    from report.views import IncomeReportExport, PaymentReportExport
+    exporters = {'income': IncomeReportExport, 'payment': PaymentReportExport}
+
+    job = ExportJob.objects.select_related('clinic', 'created_by').get(
+        id=job_id)
+    job.status = 'running'
+    job.save(update_fields=['status', 'updated_at'])
+
+    exporter = exporters[job.report]()
+    app = AppointmentReport(clinic_id=job.clinic_id,
+                            from_date=f'{job.from_date}T00:00:00',
+                            to_date=f'{job.to_date}T00:00:00')
+    try:
+        with tempfile.TemporaryFile() as content:
+            if job.filetype == 'csv':
+                for line in exporter.csv_lines(
+                        exporter.stream_rows(app, job.clinic_id)):
+                    content.write(line.encode())
+            else:
+                _, data = exporter.get_report_data(job.created_by, job.clinic,
+                                                   app)
+                content.write(
+                    generate_pdf_file(f'pdf/{exporter.template}', data))
+            job.file.save(f'{exporter.type_name}_{job.id}.{job.filetype}',
+                          File(content), save=False)
+        job.status = 'success'
+        job.expires_at = timezone.now() + datetime.timedelta(
+            hours=settings.EXPORT_JOB_EXPIRY_HOURS)
+    except Exception as e:
+        logger.error(f'export job {job.id} failed: {e}')
+        job.status = 'failed'
+        job.error = str(e)
+    job.save()
+
+
+@shared_task
+def expire_export_jobs():
+    for job in ExportJob.objects.filter(status='success',
+                                        expires_at__lt=timezone.now()):
+        job.file.delete(save=False)
+        job.status = 'expired'
+        job.save()
@@ -5,15 +5,25 @@ from .views import AppointmentsReportView, RevenueReportView, BillingReportView,
         EarningsPerProcedureReportView, AppointmentsPerDoctorReportView, \
           InvoiceIncomePerDoctorReportView, PaymentPerDayReportView, IncomePerProcedureReportView, \
                AppointmentPerProcedureReportView, AdvancePaymentsReportView, AppointmentReportView, \
-               CancelReportView, DailyAppoitmentsReportView, MonthlyAppoitmentsReportView
+               CancelReportView, DailyAppoitmentsReportView, MonthlyAppoitmentsReportView, \
+               ReportCacheStatsView, ExportJobList, ExportJobView, ExportJobDownloadView, \
+               DashboardReportView
 
 report_urls = [
     path('report/', include([
         path('export/', include([
             path('income/', IncomeReportExport.as_view(), name="income_export"),
-            path('payment/', PaymentReportExport.as_view(), name="payment_export")
+            path('payment/', PaymentReportExport.as_view(), name="payment_export"),
+            path('jobs/', ExportJobList.as_view(), name="export_jobs"),
+            path('jobs/<int:pk>/', ExportJobView.as_view(), name="export_job"),
+            path('jobs/<int:pk>/download/', ExportJobDownloadView.as_view(),
+                 name="export_job_download"),
         ])),
+        path('cache-stats/', ReportCacheStatsView.as_view(),
+             name="report_cache_stats"),
         path('summery/', include([
+            path('dashboard/', DashboardReportView.as_view(),
+                 name="dashboard_summery"),
             path('appointment/', AppointmentsReportView.as_view(),
                  name="appintment_summery"),
             path('revenue/', RevenueReportView.as_view(),
@@ -1,10 +1,56 @@
+import functools
+import math
+import threading
+
+from django.conf import settings
 from django.db.models import Count, F, Avg, Q, Sum, Value, Case, DecimalField, When, CharField
 from django.db.models.functions import Concat, Coalesce, TruncDate, TruncMonth
-from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
 
 from appointment.models import Appointment, Category, Procedure
 from base.utils import convert_timedelta, price_format, str_to_date
 from payment.models import Payment, Invoice, Wallet, InvoiceItems
+from report.cache import cached_report
+from report.rollups import RollupReport
+from report.summary import CHIROPRACTIC, AppointmentSummary
+
+
+def paginate_report(request, rows, per_page, total, row):
+    """
+    The ``page`` of ``[total()] + rows`` that Paginator would return, with
+    only that slice of the ``rows`` queryset fetched (LIMIT/OFFSET). The
+    total row is only built for the first page. ``row(index, item)`` formats
+    one item, ``index`` being its serial number.
+    """
+    num_pages = math.ceil((rows.count() + 1) / per_page)
+    try:
+        page = int(request.GET.get('page', 1))
+    except (TypeError, ValueError):
+        page = 1
+    if page < 1 or page > num_pages:
+        page = num_pages
+
+    start = (page - 1) * per_page
+    # the total row takes the first slot of the first page
+    offset = max(start - 1, 0)
+    result = [total()] if start == 0 else []
+    result += [row(index, item) for index, item in enumerate(
+        rows[offset:start + per_page - 1], start=offset + 1)]
+    return result
+
+
+def shared_total(method):
+    """
+    Compute a total that several summaries use only once per report, also
+    when the summaries run on different threads.
+    """
+    @functools.wraps(method)
+    def wrapper(report):
+        name = method.__name__
+        with report._shared_locks.setdefault(name, threading.Lock()):
+            if name not in report._shared:
+                report._shared[name] = method(report)
+        return report._shared[name]
+    return wrapper
 
 
 class AppointmentReport:
@@ -18,6 +64,10 @@ class AppointmentReport:
             to_date
         self.fdate = str_to_date(self.from_date, '%Y-%m-%dT%H:%M:%S', '%Y-%m-%d')
         self.tdate = str_to_date(self.to_date, '%Y-%m-%dT%H:%M:%S', '%Y-%m-%d')
+        self.rollup = RollupReport(self) if settings.REPORT_USE_ROLLUPS \
+            else None
+        self._shared = {}
+        self._shared_locks = {}
 
     def get_appointment_filter_conditions(self, check_clinic=True,
                                           check_date=True):
@@ -76,112 +126,11 @@ class AppointmentReport:
         return conditions
 
     def appointment_summary(self):
+        return AppointmentSummary(self).summary()
 
-        count_doctors = self.get_doctors_appointments()
-        # count_categories, categories_appointments =
-        # self.get_categories_appointments()
-        # count_procedures, procedures_appointments =
-        # self.get_procedure_appointments()
-        chiropractic_appointments = self.get_category_appointments_count(
-            'Chiropractic')
-        physiotherapy_appointments = self.get_category_appointments_count(
-            'Physiotherapy')
-        session_12_12_appointments = self.get_procedure_appointments_count(
-            'Chiropractic '
-            'Treatment Plan > '
-            'Session 12/12')
-        session_20_20_appointments = self.get_procedure_appointments_count(
-            'Chiropractic '
-            'Treatment Plan > '
-            'Session 20/20')
-        physiotherapy_1_12_appointments = self.get_procedure_appointments_count('Physiotherapy Plus - 1/12'
-                                                            ) + self.get_procedure_appointments_count(
-                                                                       'Physiotherapy Standard - 1/12')
-        
-        physiotherapy_12_12_appointments = self.get_procedure_appointments_count('Physiotherapy Plus - 12/12'
-                                                            ) + self.get_procedure_appointments_count(
-                                                                       'Physiotherapy Standard - 12/12')
-        
-        physiotherapy_1_20_appointments = self.get_procedure_appointments_count('Physiotherapy Plus - 1/20'
-                                                            ) + self.get_procedure_appointments_count(
-                                                                       'Physiotherapy Standard - 1/20')
-        
-        physiotherapy_20_20_appointments = self.get_procedure_appointments_count('Physiotherapy Plus - 20/20'
-                                                            ) + self.get_procedure_appointments_count(
-                                                                       'Physiotherapy Standard - 20/20')
-
-        return {
-            'total_appointments': self.get_total(),
-            'count_of_doctors_with_appointments': count_doctors,
-            'chiropractic_appointments': chiropractic_appointments,
-            'physiotherapy_appointments': physiotherapy_appointments,
-            'session_12_12_appointments': session_12_12_appointments,
-            'session_20_20_appointments': session_20_20_appointments,
-            # 'count_of_categories_appointments': count_categories,
-            # 'count_of_procedures_appointments': count_procedures,
-            # 'total_advance_payments': self.get_advance_payment_count(),
-            'avg_waiting_time': self.get_avg_waiting_time(),
-            'avg_treatment_time': self.get_avg_treatment_time(),
-
-            'chiropractic_session_1_12':
-                self.get_procedure_appointments_count('Chiropractic '
-                                                        'Treatment Plan > '
-                                                        'Session 1/12'),
-            'chiropractic_session_12_12':
-                self.get_procedure_appointments_count('Chiropractic '
-                                                        'Treatment Plan > '
-                                                        'Session 12/12'),
-            'chiropractic_session_1_20':
-                self.get_procedure_appointments_count('Chiropractic '
-                                                        'Treatment Plan > '
-                                                        'Session 1/20'),
-            'chiropractic_session_20_20':
-                self.get_procedure_appointments_count('Chiropractic '
-                                                        'Treatment Plan > '
-                                                        'Session 20/20'),
-            'total_earnings_chiropractic_sessions': price_format(self.get_category_total_income(
-                            'Chiropractic')-self.get_category_total_discount('Chiropractic')),
-
-            'physiotherapy_sessions_1_12': physiotherapy_1_12_appointments,
-            'physiotherapy_sessions_12_12': physiotherapy_12_12_appointments,
-            'physiotherapy_sessions_1_20': physiotherapy_1_20_appointments,
-            'physiotherapy_sessions_20_20': physiotherapy_20_20_appointments,
-            'total_earnings_Physiotherapy_sessions': price_format(self.get_category_total_income(
-                            'Physiotherapy')-self.get_category_total_discount('Physiotherapy')),
-
-            'cancelled_by_doctors': self.get_cancelled_doctors_count(),
-            'cancelled_by_patients': self.get_cancelled_patients_count(),
-            'no_cancelled_appointments': self.get_count_on_status('cancelled'),
-            'total_cost_cancelled_appointments': price_format(self.get_cancelled_appointments_earning()),
-            'no_show': self.get_count_on_status('not_visited'),
-            'total_cost_no_show_appointments': price_format(self.get_cost_on_status('not_visited')),
-
-            'patients': self.get_patients_count(),
-            'old_patients': self.get_old_patients(),
-            'new_patients': self.get_new_patients(),
-            'chiropractic_patients': self.get_unique_patients_by_category(
-                'Chiropractic'),  # 'Chiropractic',
-            'physiotherapy_patients': self.get_unique_patients_by_category(
-                'Physiotherapy'),  # 'Physiotherapy',
-
-            'total_income': price_format(self.get_total_income()),
-            'total_discount': price_format(self.get_total_discount()),
-            'total_earning': price_format(self.get_total_income()-self.get_total_discount()),
-            'total_due_payment':price_format(self.get_due_amount()),
-            'total_advance': price_format(self.get_total_advance()),
-
-            'total_income_chiropractic': price_format(self.get_category_total_income('Chiropractic')),
-            'total_discount_chiropractic': price_format(self.get_category_total_discount('Chiropractic')),
-            'total_earning_chiropractic': price_format(self.get_category_total_income(
-                            'Chiropractic')-self.get_category_total_discount('Chiropractic')),
-
-            'total_income_physiotherapy': price_format(self.get_category_total_income('Physiotherapy')),
-            'total_discount_physiotherapy': price_format(self.get_category_total_discount('Physiotherapy')),
-            'total_earning_physiotherapy': price_format(self.get_category_total_income(
-                            'Physiotherapy')-self.get_category_total_discount('Physiotherapy')),
-        }
-
+    @cached_report
     def revenue_summary(self):
+        sessions = self.get_session_appointments_count(CHIROPRACTIC)
         return {
             'total_appointments': self.get_total(),
             'total_revenue': self.get_total_income(),
@@ -189,22 +138,10 @@ class AppointmentReport:
             'avg_waiting_time': self.get_avg_waiting_time(),
             'avg_treatment_time': self.get_avg_treatment_time(),
 
-            'chiropracti_session_1_12':
-                self.get_procedure_appointments_count('Chiropractic '
-                                                        'Treatment Plan > '
-                                                        'Session 1/12'),
-            'chiropracti_session_12_12':
-                self.get_procedure_appointments_count('Chiropractic '
-                                                        'Treatment Plan > '
-                                                        'Session 12/12'),
-            'chiropracti_session_1_20':
-                self.get_procedure_appointments_count('Chiropractic '
-                                                        'Treatment Plan > '
-                                                        'Session 1/20'),
-            'chiropracti_session_20_20':
-                self.get_procedure_appointments_count('Chiropractic '
-                                                        'Treatment Plan > '
-                                                        'Session 20/20'),
+            'chiropracti_session_1_12': sessions.get('1/12', 0),
+            'chiropracti_session_12_12': sessions.get('12/12', 0),
+            'chiropracti_session_1_20': sessions.get('1/20', 0),
+            'chiropracti_session_20_20': sessions.get('20/20', 0),
 
             'total_income': price_format(self.get_total_income()+self.get_total_discount()),
             'total_discount': price_format(self.get_total_discount()),
@@ -223,6 +160,7 @@ class AppointmentReport:
             'invoice_amount': price_format(self.get_invoices_amount()),
         }
 
+    @cached_report
     def billing_summary(self):
         invoice_grand_total = self.get_total_income()
         discount = self.get_total_discount()
@@ -240,12 +178,16 @@ class AppointmentReport:
         }
 
     def get_total(self):
+        if self.rollup:
+            return self.rollup.get_total()
         total = Appointment.objects.filter(
             self.get_appointment_filter_conditions()
         ).count()
         return total
 
     def get_category_appointments_count(self, category_name):
+        if self.rollup:
+            return self.rollup.get_category_appointments_count(category_name)
         total_cat_appointments = Appointment.objects.filter(
             self.get_appointment_filter_conditions(),
             category__name=category_name
@@ -253,6 +195,8 @@ class AppointmentReport:
         return total_cat_appointments
         
     def get_category_total_income(self, category_name):
+        if self.rollup:
+            return self.rollup.get_category_total_income(category_name)
         total_revenue = Invoice.objects.filter(
             self.get_filter_conditions_invoices(),
             appointment__category__name=category_name
@@ -262,6 +206,8 @@ class AppointmentReport:
         return total_revenue['total_revenue']
     
     def get_category_total_discount(self, category_name):
+        if self.rollup:
+            return self.rollup.get_category_total_discount(category_name)
         invoices = Invoice.objects.filter(
             self.get_filter_conditions_invoices(),
             appointment__category__name=category_name
@@ -271,13 +217,25 @@ class AppointmentReport:
         return invoices['total_discount']
 
     def get_procedure_appointments_count(self, procedure_name):
+        if self.rollup:
+            return self.rollup.get_procedure_appointments_count(procedure_name)
         total_cat_appointments = Appointment.objects.filter(
             self.get_appointment_filter_conditions(),
             procedure__name=procedure_name
         ).count()
         return total_cat_appointments
 
+    def get_session_appointments_count(self, family):
+        if self.rollup:
+            return self.rollup.get_session_appointments_count(family)
+        return dict(Appointment.objects.filter(
+            self.get_appointment_filter_conditions(),
+            procedure__family=family
+        ).values_list('procedure__session').annotate(total=Count('id')))
+
     def get_procedure_appointments_earning(self, procedure_name):
+        if self.rollup:
+            return self.rollup.get_procedure_appointments_earning(procedure_name)
         appointments = Appointment.objects.filter(
             self.get_appointment_filter_conditions(),
             procedure__name=procedure_name
@@ -285,6 +243,8 @@ class AppointmentReport:
         return appointments['total_earnings']
     
     def get_cancelled_appointments_earning(self):
+        if self.rollup:
+            return self.rollup.get_cancelled_appointments_earning()
         appointments = Appointment.objects.filter(
             self.get_appointment_filter_conditions(),
             appointment_status='cancelled'
@@ -292,6 +252,8 @@ class AppointmentReport:
         return appointments['total_earnings']
 
     def get_avg_treatment_time(self):
+        if self.rollup:
+            return self.rollup.get_avg_treatment_time()
         avg_treatment_time = Appointment.objects.filter(
             self.get_appointment_filter_conditions()
         ).annotate(
@@ -300,6 +262,8 @@ class AppointmentReport:
         return convert_timedelta(avg_treatment_time['avg_treatment_time'])
 
     def get_advance_payment_count(self):
+        if self.rollup:
+            return self.rollup.get_advance_payment_count()
         total_advance_payments = Appointment.objects.filter(
             self.get_appointment_filter_conditions(),
             Q(
@@ -310,6 +274,8 @@ class AppointmentReport:
         return total_advance_payments
 
     def get_avg_waiting_time(self):
+        if self.rollup:
+            return self.rollup.get_avg_waiting_time()
         avg_waiting_time = Appointment.objects.filter(
             self.get_appointment_filter_conditions()
         ).annotate(
@@ -347,13 +313,18 @@ class AppointmentReport:
         return procedures_appointments.count(), procedures_appointments
 
     def get_cancelled_appointments(self):
+        if self.rollup:
+            return self.rollup.get_cancelled_appointments()
         cancelled_appointments = Appointment.objects.filter(
             self.get_appointment_filter_conditions(),
             appointment_status='cancelled'
         ).count()
         return cancelled_appointments
 
+    @shared_total
     def get_total_income(self):
+        if self.rollup:
+            return self.rollup.get_total_income()
         total_revenue = Invoice.objects.filter(
             self.get_filter_conditions_invoices(),
         ).aggregate(
@@ -362,6 +333,8 @@ class AppointmentReport:
         return total_revenue['total_revenue']
 
     def get_total_advance(self):
+        if self.rollup:
+            return self.rollup.get_total_advance()
         # invoices = Invoice.objects.filter(
         #     self.get_filter_conditions_invoices(),
         # )
@@ -387,6 +360,8 @@ class AppointmentReport:
         return balance
 
     def get_due_amount(self):
+        if self.rollup:
+            return self.rollup.get_due_amount()
         invoices = Invoice.objects.filter(
             self.get_filter_conditions_invoices(),
             appointment__payment_status='partial_paid'
@@ -429,12 +404,16 @@ class AppointmentReport:
         return appointments['cancelled_patients_count']
 
     def get_count_on_status(self, status):
+        if self.rollup:
+            return self.rollup.get_count_on_status(status)
         return Appointment.objects.filter(
             self.get_appointment_filter_conditions(),
             appointment_status=status
         ).count()
 
     def get_cost_on_status(self, status):
+        if self.rollup:
+            return self.rollup.get_cost_on_status(status)
         appointments = Appointment.objects.filter(
             self.get_appointment_filter_conditions(),
             appointment_status=status
@@ -500,7 +479,10 @@ class AppointmentReport:
             category__name=category_name
         ).distinct('patient').count()
 
+    @shared_total
     def get_total_discount(self):
+        if self.rollup:
+            return self.rollup.get_total_discount()
         invoices = Invoice.objects.filter(
             self.get_filter_conditions_invoices(),
         ).aggregate(
@@ -509,12 +491,17 @@ class AppointmentReport:
         return invoices['total_discount']
 
     def get_total_earning(self):
+        if self.rollup:
+            return self.rollup.get_total_earning()
         invoices = Invoice.objects.filter(
             self.get_filter_conditions_invoices(),
         ).aggregate(total_earning=Sum('payment__price', default=0))
         return invoices['total_earning']
 
+    @shared_total
     def get_total_payments(self):
+        if self.rollup:
+            return self.rollup.get_total_payments()
         collected = Payment.objects.filter(
             self.get_filter_conditions_payment(),
             transaction_type='collected',
@@ -542,7 +529,10 @@ class AppointmentReport:
             'total_payments': price_format(self.get_total_payments()),
         }
 
+    @cached_report
     def payment_mode_summary(self):
+        if self.rollup:
+            return self.rollup.payment_mode_summary()
         payment_mode = Payment.objects.filter(
             self.get_filter_conditions_payment(),
         ).exclude(
@@ -562,6 +552,8 @@ class AppointmentReport:
         return payment_mode_list
 
     def get_invoices_amount(self):
+        if self.rollup:
+            return self.rollup.get_invoices_amount()
         invoices = Invoice.objects.filter(
             self.get_filter_conditions_invoices(),
         ).aggregate(grand_total=Sum('grand_total', default=0))
@@ -586,6 +578,8 @@ class AppointmentReport:
         }
 
     def appointments_per_doctor(self):
+        if self.rollup:
+            return self.rollup.appointments_per_doctor()
         appoinments = Appointment.objects.filter(
             self.get_appointment_filter_conditions()
         ).values(
@@ -629,12 +623,17 @@ class AppointmentReport:
 
 
     def get_tax(self):
+        if self.rollup:
+            return self.rollup.get_tax()
         invoices = InvoiceItems.objects.select_related('invoice').filter(
             self.get_filter_conditions_invoiceitems(),
         ).aggregate(tax=Sum('tax_amount', default=0))
         return invoices['tax']
 
+    @cached_report
     def payments_per_day(self):
+        if self.rollup:
+            return self.rollup.payments_per_day()
     # Get daily aggregations
         daily_payments = Payment.objects.filter(
             self.get_filter_conditions_payment(),
@@ -693,128 +692,56 @@ class AppointmentReport:
         return report
     
     def get_income_per_procedure(self, request):
-        invoice = Invoice.objects.filter(
+        families = Invoice.objects.filter(
             self.get_filter_conditions_invoices(),
-        ).values('invoiceitems__procedure__name').annotate(
+            invoiceitems__procedure__family__isnull=False,
+        ).values(
+            family=F('invoiceitems__procedure__family')
+        ).annotate(
             cost=Coalesce(Sum('invoiceitems__price'), Value(0.0)),
             total_discount=Coalesce(Sum('invoiceitems__discount'), Value(0.0)),
             income=Coalesce(Sum('invoiceitems__total_after_discount'), Value(0.0)),
-        )
-        invoice_list = list(invoice)
-        procedure_aggregates = {}
-
-        total_cost = 0.0
-        total_discount = 0.0
-        total_income = 0.0
-
-        for item in invoice_list:
-            if '>' in item['invoiceitems__procedure__name']:
-                main_procedure_name = item['invoiceitems__procedure__name'].split(' ')[0].strip()
-
-            elif '-' in item['invoiceitems__procedure__name']:
-                main_procedure_name = item['invoiceitems__procedure__name'].split(' ')[0].strip()
-
-            else:
-                main_procedure_name = item['invoiceitems__procedure__name']
-
-            if main_procedure_name in procedure_aggregates:
-                procedure_aggregates[main_procedure_name]['cost'] += item['cost']
-                procedure_aggregates[main_procedure_name]['total_discount'] += item['total_discount']
-                procedure_aggregates[main_procedure_name]['income'] += item['income']
-            else:
-                procedure_aggregates[main_procedure_name] = {
-                'cost': item['cost'],
-                'total_discount': item['total_discount'],
-                'income': item['income'],
-                }
-
-            total_cost += item['cost']
-            total_discount += item['total_discount']
-            total_income += item['income']
-
-        result_list = []
-        result_list.append({
-        's.no.': '',
-        'invoiceitems__procedure__name': 'total',
-        'cost': total_cost,
-        'total_discount': total_discount,
-        'income': total_income,
+        ).order_by('family')
+
+        def total():
+            totals = families.aggregate(
+                sum_cost=Sum('cost', default=0),
+                sum_discount=Sum('total_discount', default=0),
+                sum_income=Sum('income', default=0))
+            return {
+                's.no.': '',
+                'invoiceitems__procedure__name': 'total',
+                'cost': totals['sum_cost'],
+                'total_discount': totals['sum_discount'],
+                'income': totals['sum_income'],
+            }
+
+        return paginate_report(request, families, 50, total, lambda index, item: {
+            's.no.': index,
+            'invoiceitems__procedure__name': item['family'],
+            'cost': item['cost'],
+            'total_discount': item['total_discount'],
+            'income': item['income'],
         })
 
-        for index, (procedure_name, aggregates) in enumerate(procedure_aggregates.items(), start=1):
-            result_list.append({
-                's.no.': index,
-                'invoiceitems__procedure__name': procedure_name,
-                'cost': aggregates['cost'],
-                'total_discount': aggregates['total_discount'],
-                'income': aggregates['income'],
-            })
-
-        page = request.GET.get('page', 1)
-        paginator = Paginator(result_list, 50)
-
-        try:
-            paginated_result_list = paginator.page(page)
-        except PageNotAnInteger:
-            paginated_result_list = paginator.page(1)
-        except EmptyPage:
-            paginated_result_list = paginator.page(paginator.num_pages)
-
-        return paginated_result_list.object_list
-    
     def get_appointment_per_procedure(self, request):
-        total_cat_appointments = list(
-        Invoice.objects.filter(
+        families = Invoice.objects.filter(
             self.get_filter_conditions_invoices(),
-        )
-        .values('appointment__procedure__name',)
-        .annotate(count=Count('appointment__procedure__name'))
-    )
-        procedure_aggregates = {}
-
-        for item in total_cat_appointments:
-            if '>' in item['appointment__procedure__name']:
-                main_procedure_name = item['appointment__procedure__name'].split(' ')[0].strip()
-
-            elif '-' in item['appointment__procedure__name']:
-                main_procedure_name = item['appointment__procedure__name'].split(' ')[0].strip()
-
-            else:
-                main_procedure_name = item['appointment__procedure__name']
-        
-            if main_procedure_name in procedure_aggregates:
-                procedure_aggregates[main_procedure_name] += item['count']
-            else:
-                procedure_aggregates[main_procedure_name] = item['count']
-
-        result_list = []
-        total_count = 0
-        for index, (procedure_name, count) in enumerate(procedure_aggregates.items(), start=1):
-            result_list.append({
-            's.no.': index,
-            'appointment__procedure__name': procedure_name,
-            'count': count
-            })
-            total_count += count
+            appointment__procedure__family__isnull=False,
+        ).values(
+            family=F('appointment__procedure__family')
+        ).annotate(count=Count('id')).order_by('family')
 
-        result_list.insert(0, {
+        return paginate_report(request, families, 20, lambda: {
             's.no.': '',
             'appointment__procedure__name': 'total_count',
-            'count': total_count
+            'count': families.aggregate(total=Sum('count', default=0))['total']
+        }, lambda index, item: {
+            's.no.': index,
+            'appointment__procedure__name': item['family'],
+            'count': item['count']
         })
 
-        page = request.GET.get('page', 1)
-        paginator = Paginator(result_list, 20)
-
-        try:
-            paginated_result_list = paginator.page(page)
-        except PageNotAnInteger:
-            paginated_result_list = paginator.page(1)
-        except EmptyPage:
-            paginated_result_list = paginator.page(paginator.num_pages)
-
-        return paginated_result_list.object_list
-
     def get_advance_payments(self):
         payment = list(Payment.objects.filter(
             self.get_filter_conditions_payment(),
@@ -849,18 +776,7 @@ class AppointmentReport:
         return result_list
     
     def get_appointment(self, request):
-        appointment=self.get_appointment_per_procedure(request)
-        page = request.GET.get('page', 1)
-        paginator = Paginator(appointment, 20)
-
-        try:
-            paginated_result_list = paginator.page(page)
-        except PageNotAnInteger:
-            paginated_result_list = paginator.page(1)
-        except EmptyPage:
-            paginated_result_list = paginator.page(paginator.num_pages)
-
-        return paginated_result_list.object_list
+        return self.get_appointment_per_procedure(request)
 
     def get_cancellations(self, request):
         total=self.get_count_on_status('cancelled')
@@ -880,17 +796,8 @@ class AppointmentReport:
         {'s.no': '3', '': 'cancelled_by_patients', 'count': cancelled_by_patients, 'total_cost_cancelled_by_patient':total_cost_cancelled_by_patient},
     ]
 
-        page = request.GET.get('page', 1)
-        paginator = Paginator(data, 20)
-
-        try:
-            paginated_result_list = paginator.page(page)
-        except PageNotAnInteger:
-            paginated_result_list = paginator.page(1)
-        except EmptyPage:
-            paginated_result_list = paginator.page(paginator.num_pages)
-
-        return paginated_result_list.object_list
+        # a single page, whatever the page number
+        return data
     
     def get_daily_appointments(self, request):
         appointments_by_day = (
@@ -901,71 +808,36 @@ class AppointmentReport:
         .annotate(total_appointments=Count('id'))
         .order_by('scheduled_from')
         )
-    
-        response_data = []
-        overall_total = 0
-    
-        total_appointments = sum([item['total_appointments'] for item in appointments_by_day])
-        response_data.append({
-        "s.no": "",
-        "day": "total",
-        "total appointments": total_appointments
-        })
-    
-        for index, item in enumerate(appointments_by_day, start=1):
-            response_data.append({
+
+        return paginate_report(request, appointments_by_day, 20, lambda: {
+            "s.no": "",
+            "day": "total",
+            "total appointments": appointments_by_day.aggregate(
+                total=Sum('total_appointments', default=0))['total']
+        }, lambda index, item: {
             "s.no": index,
             "day": item['scheduled_from'].strftime('%Y-%m-%d'),
             "total appointments": item['total_appointments']
         })
-            overall_total += item['total_appointments']
-
-        page = request.GET.get('page', 1)
-        paginator = Paginator(response_data, 20)
-
-        try:
-            paginated_result_list = paginator.page(page)
-        except PageNotAnInteger:
-            paginated_result_list = paginator.page(1)
-        except EmptyPage:
-            paginated_result_list = paginator.page(paginator.num_pages)
-
-        return paginated_result_list.object_list
-    
 
     def get_monthly_appointments(self, request):
-        appointments_by_month = Appointment.objects.filter(
-            self.get_appointment_filter_conditions()
-        ).annotate(month=TruncMonth('scheduled_from')
-            ).values('month'
-            ).annotate(total_appointments=Count('id')
-            ).order_by('month')
-    
-        response_data = []
-    
-        total_appointments = sum([item['total_appointments'] for item in appointments_by_month])
-        response_data.append({
-        "s.no": "",
-        "month": "total",
-        "total appointments": total_appointments
-        })
-    
-        for index, item in enumerate(appointments_by_month, start=1):
-            formatted_month = item['month'].strftime('%B %Y')  # Format to 'Month YYYY'
-            response_data.append({
+        if self.rollup:
+            appointments_by_month = self.rollup.monthly_appointments()
+        else:
+            appointments_by_month = Appointment.objects.filter(
+                self.get_appointment_filter_conditions()
+            ).annotate(month=TruncMonth('scheduled_from')
+                ).values('month'
+                ).annotate(total_appointments=Count('id')
+                ).order_by('month')
+
+        return paginate_report(request, appointments_by_month, 20, lambda: {
+            "s.no": "",
+            "month": "total",
+            "total appointments": appointments_by_month.aggregate(
+                total=Sum('total_appointments', default=0))['total']
+        }, lambda index, item: {
             "s.no": index,
-            "month": formatted_month,
+            "month": item['month'].strftime('%B %Y'),  # Format to 'Month YYYY'
             "total appointments": item['total_appointments']
-            })
-
-        page = request.GET.get('page', 1)
-        paginator = Paginator(response_data, 20)
-
-        try:
-            paginated_result_list = paginator.page(page)
-        except PageNotAnInteger:
-            paginated_result_list = paginator.page(1)
-        except EmptyPage:
-            paginated_result_list = paginator.page(paginator.num_pages)
-
-        return paginated_result_list.object_list
+        })
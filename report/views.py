@@ -1,10 +1,11 @@
 import csv
 
 from datetime import datetime
-from django.db.models import Sum
-from django.http import HttpResponse
+from django.db import transaction
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
-from rest_framework import status
+from django.utils import timezone
+from rest_framework import generics, status
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
@@ -12,12 +13,24 @@ from base.utils import generate_pdf_file, custom_strftime
 from clinic.models import Clinic
 from payment.models import Payment, Invoice
 from payment.serializers import PaymentSerializer, InvoiceSerializer
+from report.cache import cache_stats
+from report.dashboard import SECTIONS, dashboard
+from report.exports import income_rows, payment_rows, positive_balances
+from report.models import ExportJob
+from report.serializers import ExportJobSerializer
+from report.tasks import run_export_job
 from report.utils import AppointmentReport
 
 
 # Create your views here.
 
 
+class Echo:
+    # file-like object for csv.writer that hands each line back
+    def write(self, value):
+        return value
+
+
 class AppointmentsReportView(APIView):
     def get(self, request):
         query = request.query_params
@@ -84,6 +97,24 @@ class PaymentModeReportView(APIView):
             return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+class DashboardReportView(APIView):
+    def get(self, request):
+        query = request.query_params
+        from_date = query.get('from_date', None)
+        to_date = query.get('to_date', None)
+        clinic_id = query.get('clinic_id', query.get('clinic'))
+        sections = query.get('sections')
+        sections = sections.split(',') if sections else list(SECTIONS)
+        unknown = [name for name in sections if name not in SECTIONS]
+        if unknown:
+            return Response({'error': f'Invalid sections: {", ".join(unknown)}'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        app = AppointmentReport(from_date=from_date, to_date=to_date,
+                                clinic_id=clinic_id)
+        summery = dashboard(app, sections)
+        return Response(summery, status=status.HTTP_200_OK)
+
+
 class EarningsPerProcedureReportView(APIView):
     def get(self, request):
         query = request.query_params
@@ -120,6 +151,11 @@ class InvoiceIncomePerDoctorReportView(APIView):
         return Response({"results": summery}, status=status.HTTP_200_OK)
 
 
+class ReportCacheStatsView(APIView):
+    def get(self, request):
+        return Response({"results": cache_stats()}, status=status.HTTP_200_OK)
+
+
 class ReportBaseView(APIView):
     type_name = None
     csv_column_names = None
@@ -149,11 +185,28 @@ class ReportBaseView(APIView):
 
         writer = csv.writer(response)
         writer.writerow(self.csv_column_names.values())
-        head_keys = self.csv_column_names.keys()
         for row in data:
-            new_row = {k: v for k, v in row.items() if k in head_keys}
-            writer.writerow([self.prefix_sufix(column, new_row[column]) if column in new_row else '-' for column in
-                             head_keys])
+            writer.writerow(self.csv_row(row))
+
+        return response
+
+    def csv_row(self, row):
+        head_keys = self.csv_column_names.keys()
+        new_row = {k: v for k, v in row.items() if k in head_keys}
+        return [self.prefix_sufix(column, new_row[column]) if column in new_row else '-' for column in
+                head_keys]
+
+    def csv_lines(self, rows):
+        writer = csv.writer(Echo())
+        yield writer.writerow(self.csv_column_names.values())
+        for index, row in enumerate(rows, start=1):
+            row['sl_no'] = index
+            yield writer.writerow(self.csv_row(row))
+
+    def export_csv_stream(self, rows):
+        response = StreamingHttpResponse(self.csv_lines(rows),
+                                         content_type='text/csv')
+        response['Content-Disposition'] = f'attachment; filename="{self.type_name}.csv"'
 
         return response
 
@@ -179,6 +232,13 @@ class IncomeReportExport(ReportBaseView):
             return datetime.strptime(date_string, '%Y-%m-%d').strftime('%d-%m-%Y')
         return ''
 
+    def stream_rows(self, app, clinic_id):
+        for row in income_rows(clinic_id, app.fdate, app.tdate):
+            row['date'] = row['date'].strftime('%d-%m-%Y')
+            row['patient_name'] = f"{row.pop('patient_first_name')} " \
+                                  f"{row.pop('patient_last_name')}"
+            yield row
+
     def get(self, request):
         query = request.query_params
         user = request.user
@@ -193,12 +253,23 @@ class IncomeReportExport(ReportBaseView):
         if not clinic_id:
             return Response({'error': 'Invalid clinic ID'}, status=status.HTTP_400_BAD_REQUEST)
         clinic = get_object_or_404(Clinic, id=clinic_id)
-        clinic_location = clinic.name
-        today = custom_strftime('%d-%m-%Y')
         app = AppointmentReport(from_date=from_date, to_date=to_date,
                                 clinic_id=clinic_id)
+        if export_format == 'csv' and query.get('stream') == 'true':
+            return self.export_csv_stream(self.stream_rows(app, clinic_id))
+        details, data = self.get_report_data(user, clinic, app)
+
+        if export_format == 'csv':
+            return self.export_csv(details)
+        elif export_format == 'pdf':
+            return self.export_pdf(data)
+
+    def get_report_data(self, user, clinic, app):
+        clinic_location = clinic.name
+        today = custom_strftime('%d-%m-%Y')
         summery = app.income_summary()
-        income = Invoice.objects.filter(clinic=clinic_id, date__range=(app.fdate, app.tdate))
+        income = InvoiceSerializer.setup_eager_loading(Invoice.objects.filter(
+            clinic=clinic.id, date__range=(app.fdate, app.tdate)))
 
         details = InvoiceSerializer(income, many=True).data
 
@@ -212,11 +283,7 @@ class IncomeReportExport(ReportBaseView):
 
         data = {"user": user, "summery": summery, "details": details, "clinic_location": clinic_location,
                 "from_date": app.fdate, "to_date": app.tdate, "today": today}
-
-        if export_format == 'csv':
-            return self.export_csv(details)
-        elif export_format == 'pdf':
-            return self.export_pdf(data)
+        return details, data
 
 class PaymentReportExport(ReportBaseView):
     csv_column_names = {
@@ -251,21 +318,27 @@ class PaymentReportExport(ReportBaseView):
             row['payment_status'] = ''
         return row
 
-    def get_positive_balance_payments(self, patient_id, from_date, to_date):
-        return Payment.objects.filter(
-            patient=patient_id,
-            balance__gt=0,
-            collected_on__range=(from_date, to_date)
-        )
-
-    def aggregate_positive_balances(self, patient_id, from_date, to_date):
-        positive_balance_payments = self.get_positive_balance_payments(patient_id, from_date, to_date)
-        if positive_balance_payments.exists():
-            total_balance = positive_balance_payments.aggregate(Sum('balance'))['balance__sum']
-            if total_balance:
-                base_record = PaymentSerializer(positive_balance_payments.first()).data
-                return self.balance_fix(base_record, total_balance)
-        return None
+    def advance_row(self, balance, row):
+        # one row per patient with the total of their positive balances,
+        # shown after the patient's last payment
+        return self.balance_fix({
+            'id': balance['first_id'],
+            'clinic_name': balance['clinic_name'],
+            'patient_name': row['patient_name'],
+            'patient_atlas_id': row['patient_atlas_id'],
+        }, balance['total_balance'])
+
+    def stream_rows(self, app, clinic_id):
+        balances = positive_balances(clinic_id, app.fdate, app.tdate)
+        for row in payment_rows(clinic_id, app.fdate, app.tdate):
+            row['patient_name'] = f"{row.pop('patient_first_name')} " \
+                                  f"{row.pop('patient_last_name')}"
+            row['collected_on'] = row['collected_on'].strftime('%d-%m-%Y')
+            row['invoice_date'] = row['invoice_date'].strftime('%d-%m-%Y') \
+                if row['invoice_date'] else ''
+            yield row
+            if row['last_for_patient'] == 1 and row['patient'] in balances:
+                yield self.advance_row(balances[row['patient']], row)
 
     def get(self, request):
         query = request.query_params
@@ -285,40 +358,49 @@ class PaymentReportExport(ReportBaseView):
             return Response({'error': 'Invalid clinic ID'}, status=status.HTTP_400_BAD_REQUEST)
 
         clinic = get_object_or_404(Clinic, id=clinic_id)
-        clinic_location = clinic.name
-        today = custom_strftime('%d-%m-%Y')
 
         app = AppointmentReport(from_date=from_date, to_date=to_date, clinic_id=clinic_id)
+        if export_format == 'csv' and query.get('stream') == 'true':
+            return self.export_csv_stream(self.stream_rows(app, clinic_id))
+        details, data = self.get_report_data(user, clinic, app)
+
+        if export_format == 'csv':
+            return self.export_csv(details)
+        elif export_format == 'pdf':
+            return self.export_pdf(data)
+
+    def get_report_data(self, user, clinic, app):
+        clinic_location = clinic.name
+        today = custom_strftime('%d-%m-%Y')
         summery = app.payment_summary()
 
         payments = Payment.objects.filter(
-            clinic=clinic_id,
+            clinic=clinic.id,
             collected_on__range=(app.fdate, app.tdate),
             transaction_type__in=['collected', 'wallet_payment']
         ).order_by('collected_on', 'receipt_id', 'invoice__invoice_number')
 
-        receipt_records = payments.distinct()
-        details = PaymentSerializer(receipt_records, many=True).data
-
-        unique_patient_ids = set(record['patient'] for record in details)
+        receipt_records = PaymentSerializer.setup_eager_loading(
+            payments.distinct())
+        payment_details = PaymentSerializer(receipt_records, many=True).data
+        balances = positive_balances(clinic.id, app.fdate, app.tdate)
 
-        aggregated_rows = {}
-        for patient_id in unique_patient_ids:
-            aggregated_row = self.aggregate_positive_balances(patient_id, app.fdate, app.tdate)
-            if aggregated_row:
-                aggregated_rows[patient_id] = aggregated_row
+        last_payment_index = {record['patient']: index for index, record in enumerate(payment_details)}
 
-        for patient_id in unique_patient_ids:
-            if patient_id in aggregated_rows:
-                last_payment_index = max(index for index, detail in enumerate(details) if detail['patient'] == patient_id)
-                details.insert(last_payment_index + 1, aggregated_rows[patient_id])
+        details = []
+        for index, detail in enumerate(payment_details):
+            details.append(detail)
+            if last_payment_index[detail['patient']] == index and detail['patient'] in balances:
+                details.append(self.advance_row(balances[detail['patient']], detail))
 
         for index, detail in enumerate(details, start=1):
             detail['sl_no'] = index
 
         for detail in details:
             detail['collected_on'] = self.format_date(detail['collected_on'])
-            detail['invoice_date'] = self.format_date(detail['invoice_date'])
+            # payments without an invoice have no invoice fields
+            detail['invoice_date'] = self.format_date(detail.get('invoice_date'))
+            detail.setdefault('invoice_number', '')
 
         data = {
             "user": user,
@@ -329,11 +411,7 @@ class PaymentReportExport(ReportBaseView):
             "to_date": app.tdate,
             "today": today
         }
-
-        if export_format == 'csv':
-            return self.export_csv(details)
-        elif export_format == 'pdf':
-            return self.export_pdf(data)
+        return details, data
 
 class PaymentPerDayReportView(APIView):
     def get(self, request):
@@ -427,3 +505,29 @@ class MonthlyAppoitmentsReportView(APIView):
         summery = app.get_monthly_appointments(request)
         
         return Response({"results": summery}, status=status.HTTP_200_OK)
+
+
+class ExportJobList(generics.CreateAPIView):
+    serializer_class = ExportJobSerializer
+
+    def perform_create(self, serializer):
+        job = serializer.save(created_by=self.request.user)
+        # rendering happens on a celery worker, never in the request
+        transaction.on_commit(lambda: run_export_job.delay(job.id))
+
+
+class ExportJobView(generics.RetrieveAPIView):
+    serializer_class = ExportJobSerializer
+
+    def get_queryset(self):
+        return ExportJob.objects.filter(created_by=self.request.user)
+
+
+class ExportJobDownloadView(ExportJobView):
+    def get(self, request, *args, **kwargs):
+        job = self.get_object()
+        if job.status != 'success' or job.expires_at < timezone.now():
+            return Response({'error': 'Export is not available'},
+                            status=status.HTTP_404_NOT_FOUND)
+        return FileResponse(job.file.open('rb'), as_attachment=True,
+                            filename=f'{job.report}_report.{job.filetype}')
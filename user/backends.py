@@ -8,17 +8,16 @@ User = get_user_model()
 class EmailBackend(ModelBackend):
     def authenticate(self, request, email=None, username=None, password=None,
                      **kwargs):
-        try:
-            if email:
-                user = User.objects.get(
-                    Q(email__iexact=email) | Q(username__iexact=email))
-            elif username:
-                user = User.objects.get(
-                    Q(email__iexact=username) | Q(username__iexact=username))
+        login = email or username
+        if not login or password is None:
+            return None
+        # served by the upper(email) and upper(username) indexes; emails
+        # aren't unique, so try the password on every match
+        users = User.objects.filter(
+            Q(email__iexact=login) | Q(username__iexact=login)).order_by('id')
+        for user in users:
             if user.check_password(password):
                 return user
-        except User.DoesNotExist:
-            pass
         return None
 
     def get_user(self, user_id):
@@ -0,0 +1,64 @@
+# Generated by Django 4.2.13 on 2026-10-18 19:26
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations, models
+import django.db.models.functions.text
+
+SEARCH_VECTOR = """
+    setweight(to_tsvector('simple', coalesce(NEW.first_name, '') || ' ' ||
+                          coalesce(NEW.last_name, '') || ' ' ||
+                          coalesce(NEW.atlas_id, '')), 'A') ||
+    setweight(to_tsvector('simple', coalesce(NEW.email, '') || ' ' ||
+                          regexp_replace(coalesce(NEW.email, ''),
+                                         '[^[:alnum:]]', ' ', 'g') || ' ' ||
+                          regexp_replace(coalesce(NEW.phone_number, ''),
+                                         '\\D', '', 'g') || ' ' ||
+                          right(regexp_replace(coalesce(NEW.phone_number, ''),
+                                               '\\D', '', 'g'), 10)), 'B')
+"""
+
+CREATE_TRIGGER = f"""
+CREATE FUNCTION user_user_search_vector() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector := {SEARCH_VECTOR};
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER user_user_search_vector
+    BEFORE INSERT OR UPDATE OF first_name, last_name, email, phone_number,
+        atlas_id
+    ON user_user FOR EACH ROW EXECUTE FUNCTION user_user_search_vector();
+
+UPDATE user_user SET first_name = first_name;
+"""
+
+DROP_TRIGGER = """
+DROP TRIGGER user_user_search_vector ON user_user;
+DROP FUNCTION user_user_search_vector();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0029_otp'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunSQL(CREATE_TRIGGER, DROP_TRIGGER),
+        migrations.AddIndex(
+            model_name='user',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='user_search_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('atlas_id'), name='text_pattern_ops'), name='user_atlas_id_prefix_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.13 on 2026-10-18 19:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0030_user_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='phone_key',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=10),
+        ),
+        # same as user.models.normalize_phone
+        migrations.RunSQL(
+            "UPDATE user_user SET phone_key = "
+            "right(regexp_replace(phone_number, '\\D', '', 'g'), 10)",
+            migrations.RunSQL.noop),
+    ]
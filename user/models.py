@@ -1,11 +1,15 @@
 # Create your models here.
 import logging
+import re
 from datetime import timedelta, datetime
 
 from django.conf import settings
 from django.contrib.auth.models import AbstractUser
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import RegexValidator
 from django.db import models
+from django.db.models.functions import Upper
 from django.dispatch import receiver
 from django.forms.models import model_to_dict
 from django_rest_passwordreset.signals import reset_password_token_created
@@ -30,6 +34,15 @@ BLOOD_GROUP = (('', 'Select'),
                ('O+', 'O+'), ('O-', 'O-'))
 
 
+
+def normalize_phone(phone_number):
+    """
+    The national number of ``phone_number``: its last 10 digits, without
+    the country code, spaces or punctuation.
+    """
+    return re.sub(r'\D', '', str(phone_number or ''))[-10:]
+
+
 class User(AbstractUser):
     # phone_regex = RegexValidator(regex=r'^[2-9]\d{9}$',
     #                              message="Phone number must be entered in "
@@ -42,6 +55,9 @@ class User(AbstractUser):
     )
     phone_number = models.CharField(validators=[phone_regex], max_length=20,
                                     blank=True)
+    # normalize_phone(phone_number), to look patients up by phone
+    phone_key = models.CharField(max_length=10, blank=True, default='',
+                                 editable=False, db_index=True)
     email = models.EmailField('Email address', unique=False)
     username = models.CharField(max_length=50, blank=True, null=True,
                                 unique=True)
@@ -83,10 +99,20 @@ class User(AbstractUser):
                                    null=True, default='')
     patient_notes = models.TextField(blank=True,
                                      null=True, default='')
+    # names, email, phone digits and atlas ID for the patient search, set
+    # by a database trigger
+    search_vector = SearchVectorField(null=True, editable=False)
 
     USERNAME_FIELD = 'username'
     REQUIRED_FIELDS = ['first_name', 'last_name']
 
+    def save(self, *args, **kwargs):
+        self.phone_key = normalize_phone(self.phone_number)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'phone_number' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'phone_key'}
+        super().save(*args, **kwargs)
+
     # def save(self, *args, **kwargs):
     #     if not self.atlas_id and not self.id:
     #         super().save(*args, **kwargs)
@@ -103,6 +129,15 @@ class User(AbstractUser):
             ("manage_reports", "Manage Reports"),
             ("manage_patients", "Manage Patients"),
         )
+        indexes = [
+            GinIndex(fields=['search_vector'], name='user_search_idx'),
+            # atlas ID prefix lookups (istartswith)
+            models.Index(OpClass(Upper('atlas_id'), name='text_pattern_ops'),
+                         name='user_atlas_id_prefix_idx'),
+            # case insensitive logins (iexact) in EmailBackend
+            models.Index(Upper('email'), name='user_email_upper_idx'),
+            models.Index(Upper('username'), name='user_username_upper_idx'),
+        ]
 
 
 @receiver(reset_password_token_created)
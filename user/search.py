@@ -0,0 +1,50 @@
+import functools
+import operator
+import re
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db.models import Case, F, FloatField, Value, When
+from django.db.models.functions import Cast
+
+
+def is_atlas_id(word):
+    prefix = settings.PREFIX_ATLAS_ID
+    return word.upper().startswith(prefix.upper()) and \
+        word[len(prefix):].isdigit()
+
+
+def prefix_query(word):
+    # phone numbers are indexed by their digits alone, anything else by
+    # the words the text search parser splits it into
+    if re.fullmatch(r'\+?[\d\-.\s()]+', word):
+        parts = [re.sub(r'\D', '', word)]
+    else:
+        parts = re.findall(r'[^\W_]+', word)
+    parts = [f"'{part}':*" for part in parts if part]
+    if not parts:
+        return None
+    return SearchQuery(' & '.join(parts), search_type='raw', config='simple')
+
+
+def search_users(queryset, search):
+    """
+    Users of ``queryset`` whose search_vector (kept up to date by a trigger,
+    see migration 0030) has a name, email, phone number or atlas ID
+    starting with every word of ``search``, annotated with their ``rank``.
+    A lone atlas ID is matched by prefix on its own index, exact first.
+    """
+    words = search.split()
+    if len(words) == 1 and is_atlas_id(words[0]):
+        return queryset.filter(atlas_id__istartswith=words[0]).annotate(
+            rank=Case(When(atlas_id__iexact=words[0], then=Value(1.0)),
+                      default=Value(0.0), output_field=FloatField()))
+
+    queries = [query for query in map(prefix_query, words) if query]
+    if not queries:
+        return queryset.none().annotate(
+            rank=Value(0.0, output_field=FloatField()))
+    query = functools.reduce(operator.and_, queries)
+    # float8, so the rank survives a round trip through a cursor
+    return queryset.filter(search_vector=query).annotate(
+        rank=Cast(SearchRank(F('search_vector'), query), FloatField()))
@@ -1,6 +1,7 @@
 from django.contrib.auth import authenticate
 from django.contrib.auth.hashers import make_password
 from django.contrib.auth.models import Permission
+from django.db.models import Prefetch, prefetch_related_objects
 from rest_framework import serializers
 
 from .models import User, Address, DoctorTiming, Leaves
@@ -25,6 +26,18 @@ class CreateUserSerializer(serializers.ModelSerializer):
         return user
 
 
+class UserListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        from payment.utils import get_users_wallet_balance
+        users = list(data.all() if hasattr(data, 'all') else data)
+        self.child.prefetch(users)
+        if 'wallet_balance' in self.child.fields:
+            # one batch for the page instead of two queries per user
+            self.child.wallet_balances = get_users_wallet_balance(
+                [user.id for user in users])
+        return super().to_representation(users)
+
+
 class UserSerializer(serializers.ModelSerializer):
     # email = serializers.EmailField(required=True)
     address = serializers.SerializerMethodField(read_only=True)
@@ -43,9 +56,42 @@ class UserSerializer(serializers.ModelSerializer):
         # , 'referred_by'
         extra_kwargs = {'first_name': {
             'required': True}}
+        list_serializer_class = UserListSerializer
 
         # validators = []
 
+    def __init__(self, *args, **kwargs):
+        # only these fields, from the argument or ?fields= of a GET request
+        fields = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if fields is None and request is not None and \
+                request.method == 'GET' and request.GET.get('fields'):
+            fields = request.GET['fields'].split(',')
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+    def prefetch(self, users):
+        """
+        Load the related data of the selected fields for all ``users`` in a
+        fixed number of queries.
+        """
+        permissions = Permission.objects.select_related('content_type')
+        # permissions first, the same lookups below are then already done
+        lookups = {
+            'permissions': [
+                Prefetch('groups__permissions', queryset=permissions),
+                Prefetch('user_permissions', queryset=permissions)],
+            'address': ['address_set'],
+            'groups': ['groups'],
+            'user_permissions': ['user_permissions'],
+            'clinics': ['clinicpeople__clinic'],
+        }
+        for name, fields in lookups.items():
+            if name in self.fields:
+                prefetch_related_objects(users, *fields)
+
     # Skipped to check email uniqueness due to patients can have same email
     # def validate_email(self, value):
     #     """
@@ -56,17 +102,33 @@ class UserSerializer(serializers.ModelSerializer):
     #     return value
 
     def get_address(self, obj):
-        address = Address.objects.filter(user=obj)
-        return AddressSerializer(address, many=True).data
+        return AddressSerializer(obj.address_set.all(), many=True).data
 
     def get_wallet_balance(self, obj):
         from payment.utils import get_user_wallet_balance
+        wallet_balances = getattr(self, 'wallet_balances', {})
+        if obj.id in wallet_balances:
+            return wallet_balances[obj.id]
         return get_user_wallet_balance(obj.id)
 
     def get_full_name(self, obj):
         return f"{obj.first_name} {obj.last_name}"
 
     def get_permissions(self, obj):
+        if 'user_permissions' in getattr(obj, '_prefetched_objects_cache', {}):
+            combined_permissions = {
+                permission.id: permission
+                for group in obj.groups.all()
+                for permission in group.permissions.all()}
+            combined_permissions.update(
+                (permission.id, permission)
+                for permission in obj.user_permissions.all())
+            # in the Permission ordering, like the query below
+            return [permission.codename for permission in sorted(
+                combined_permissions.values(),
+                key=lambda p: (p.content_type.app_label,
+                               p.content_type.model, p.codename))]
+
         # Get the user's group-assigned permissions
         group_permissions = Permission.objects.filter(group__user=obj)
 
@@ -79,9 +141,13 @@ class UserSerializer(serializers.ModelSerializer):
 
     def get_clinics(self, obj):
         from clinic.models import ClinicPeople
-        clinics = ClinicPeople.objects.filter(
-            user=obj
-        ).first()
+        related = User.clinicpeople.related
+        if related.is_cached(obj):
+            clinics = related.get_cached_value(obj)
+        else:
+            clinics = ClinicPeople.objects.filter(
+                user=obj
+            ).first()
         from clinic.serializers import ClinicPeopleSerializer
         return ClinicPeopleSerializer(clinics).data  # clinics
 
@@ -10,15 +10,18 @@ from django.core.mail import send_mail
 from django.db.models import Q, Value, F
 from django.db.models.functions import Lower
 from knox.models import AuthToken
-from rest_framework import permissions, generics, filters, status
+from rest_framework import permissions, generics, status
 from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from django.db.models.functions import Concat
 
 from clinic.serializers import ClinicPeopleSerializer
-from fuelapp.pagination import CustomPagination
-from .models import User, Address, DoctorTiming, Leaves, Otp
+from fuelapp.filters import COMPARE, EXACT, filter_params
+from fuelapp.pagination import CustomPagination, CursorPagination
+from .models import User, Address, DoctorTiming, Leaves, Otp, \
+    normalize_phone
+from .search import search_users
 from .serializers import LoginUserSerializer, AddressSerializer, \
     ForgetPasswordSerializer, CreateUserSerializer, UserSerializer, \
     DoctorTimingSerializer, LeaveSerializer, DoctorSerializer, \
@@ -162,8 +165,10 @@ class UserAPI(generics.RetrieveAPIView):
 class UserList(generics.ListCreateAPIView):
     queryset = User.objects.all().order_by(Lower('first_name'))
     serializer_class = UserSerializer
-    filter_backends = [filters.SearchFilter]
-    search_fields = ['first_name', 'last_name', '^email', '^phone_number', 'atlas_id']
+    pagination_class = CursorPagination
+    cursor_ordering = ('first_name_lower', 'id')
+    # the group join table is indexed on both sides
+    filter_lookups = {'groups': EXACT}
     ordering_fields = ['first_name']
 
     def perform_create(self, serializer):
@@ -175,31 +180,16 @@ class UserList(generics.ListCreateAPIView):
     def get_queryset(self):
         queryset = User.objects.all()
         params = self.request.query_params
-        if params and len(params) > 0:
-            for param in params:
-                if param not in ['page', 'search']:
-                    queryset = queryset.filter(**{param: params[param]})
-
-        search_query = params.get('search','')
-        search_query_values = search_query.split(" ")
-        if search_query_values:
-            for search_query_value in search_query_values:
-                queryset = queryset.filter(
-                    Q(first_name__icontains=search_query_value) |
-                    Q(last_name__icontains=search_query_value) |
-                    Q(email__icontains=search_query_value) |
-                    Q(phone_number__icontains=search_query_value) |
-                    Q(atlas_id__icontains=search_query_value)
-                )
-        # if search_query:
-        #     queryset = queryset.filter(
-        #         Q(first_name__icontains=search_query) |
-        #         Q(last_name__icontains=search_query) |
-        #         Q(email__icontains=search_query) |
-        #         Q(phone_number__icontains=search_query) |
-        #         Q(atlas_id__icontains=search_query)
-        #     )
-        return queryset.order_by(Lower('first_name'))
+        queryset = filter_params(self, queryset)
+
+        queryset = queryset.annotate(first_name_lower=Lower('first_name'))
+        search_query = params.get('search', '').strip()
+        if search_query:
+            # best matches first, by name among equals
+            self.cursor_ordering = ('-rank',) + self.cursor_ordering
+            return search_users(queryset, search_query).order_by(
+                '-rank', 'first_name_lower', 'id')
+        return queryset.order_by('first_name_lower')
 
 
 class UserView(generics.RetrieveUpdateDestroyAPIView):
@@ -219,6 +209,7 @@ class UserView(generics.RetrieveUpdateDestroyAPIView):
 class AddressList(generics.ListCreateAPIView):
     queryset = Address.objects.all()
     serializer_class = AddressSerializer
+    filter_lookups = {'type': EXACT, 'status': EXACT}
 
     def perform_create(self, serializer):
         # Set created_by and updated_by fields
@@ -227,11 +218,7 @@ class AddressList(generics.ListCreateAPIView):
 
     def get_queryset(self):
         queryset = Address.objects.all()
-        params = self.request.query_params
-        if params and len(params) > 0:
-            for param in params:
-                if param not in ['page', 'search']:
-                    queryset = queryset.filter(**{param: params[param]})
+        queryset = filter_params(self, queryset)
         return queryset
 
 
@@ -247,6 +234,8 @@ class AddressView(generics.RetrieveUpdateDestroyAPIView):
 class DoctorTimingList(generics.ListCreateAPIView):
     queryset = DoctorTiming.objects.all()
     serializer_class = DoctorTimingSerializer
+    filter_lookups = {'week_day': EXACT, 'is_available': EXACT,
+                      'status': EXACT}
 
     def perform_create(self, serializer):
         # Set created_by and updated_by fields
@@ -255,11 +244,7 @@ class DoctorTimingList(generics.ListCreateAPIView):
 
     def get_queryset(self):
         queryset = DoctorTiming.objects.all()
-        params = self.request.query_params
-        if params and len(params) > 0:
-            for param in params:
-                if param not in ['page', 'search']:
-                    queryset = queryset.filter(**{param: params[param]})
+        queryset = filter_params(self, queryset)
         return queryset
 
 
@@ -275,6 +260,8 @@ class DoctorTimingView(generics.RetrieveUpdateDestroyAPIView):
 class LeavesList(generics.ListCreateAPIView):
     queryset = Leaves.objects.all()
     serializer_class = LeaveSerializer
+    filter_lookups = {'scheduled_from': COMPARE, 'scheduled_to': COMPARE,
+                      'status': EXACT}
 
     def perform_create(self, serializer):
         # Set created_by and updated_by fields
@@ -283,11 +270,7 @@ class LeavesList(generics.ListCreateAPIView):
 
     def get_queryset(self):
         queryset = Leaves.objects.all()
-        params = self.request.query_params
-        if params and len(params) > 0:
-            for param in params:
-                if param not in ['page', 'search']:
-                    queryset = queryset.filter(**{param: params[param]})
+        queryset = filter_params(self, queryset)
         return queryset
 
 
@@ -325,18 +308,16 @@ class DoctorList(generics.ListCreateAPIView):
     queryset = User.objects.filter(groups=group_id)
     pagination_class = CustomPagination
     serializer_class = DoctorSerializer
+    filter_lookups = {'is_active': EXACT}
 
     # parser_classes = (MultiPartParser, FormParser)
     def get_queryset(self):
         queryset = self.queryset
         params = self.request.query_params
-        if params and len(params) > 0:
-            for param in params:
-                if param == 'clinic':
-                    queryset = queryset.filter(
-                        clinicpeople__clinic__in=[params[param]])
-                elif param not in ['page', 'search']:
-                    queryset = queryset.filter(**{param: params[param]})
+        if 'clinic' in params:
+            queryset = queryset.filter(
+                clinicpeople__clinic__in=[params['clinic']])
+        queryset = filter_params(self, queryset, exclude=('clinic',))
 
         return queryset
 
@@ -478,7 +459,7 @@ class PatientHandleAPI(generics.GenericAPIView):
         first_name = request.data.get('first_name')
         last_name = request.data.get('last_name', '')
         email = request.data.get('email')
-        phone_number = str(request.data.get('phone_number', ''))[-10:]
+        phone_number = normalize_phone(request.data.get('phone_number'))
 
         errors = {}
 
@@ -522,7 +503,7 @@ class PatientHandleAPI(generics.GenericAPIView):
                         }
                     }, status=status.HTTP_400_BAD_REQUEST)
                 
-                if User.objects.filter(Q(phone_number__endswith=phone_number)).exists():
+                if User.objects.filter(Q(phone_key=phone_number)).exists():
                     return Response({
                         'state': False,
                         'data': {
@@ -577,7 +558,7 @@ class PatientHandleAPI(generics.GenericAPIView):
                 if email:
                     patient_query &= Q(email=email)
                 if phone_number:
-                    patient_query &= Q(phone_number__endswith=phone_number)    
+                    patient_query &= Q(phone_key=phone_number)    
                 user = User.objects.filter(patient_query).first()
 
                 if user:
@@ -707,7 +688,7 @@ class PatientHandleAPI(generics.GenericAPIView):
                                         'PhoneNotRegisteredError': ['Phone number is not registered. Please enter the registered phone number']
                                     }
                                 }, status=status.HTTP_400_BAD_REQUEST)
-                            if User.objects.filter(phone_number__endswith=phone_number).exists():
+                            if User.objects.filter(phone_key=phone_number).exists():
                                 return Response({
                                     'state': False,
                                     'data': {
@@ -755,7 +736,7 @@ class PatientVerifyOtpAPI(generics.GenericAPIView):
     def post(self, request):
         auth = request.query_params.get('auth')
         email = request.data.get('email')
-        phone_number = str(request.data.get('phone_number', ''))[-10:]
+        phone_number = normalize_phone(request.data.get('phone_number'))
         otp = request.data.get('otp')
 
         if not auth:
@@ -793,7 +774,7 @@ class PatientVerifyOtpAPI(generics.GenericAPIView):
             if auth == 'email':
                 user = User.objects.get(email=email)
             else:
-                user = User.objects.get(phone_number__endswith=phone_number)
+                user = User.objects.get(phone_key=phone_number)
         except User.DoesNotExist:
             return Response({
                 'state': False,
@@ -871,7 +852,7 @@ class PatientLoginAPI(generics.GenericAPIView):
         first_name = request.data.get('first_name')
         last_name = request.data.get('last_name', '')
         email = request.data.get('email')
-        phone_number = str(request.data.get('phone_number', ''))[-10:]
+        phone_number = normalize_phone(request.data.get('phone_number'))
 
         if not auth:
             return Response({
@@ -910,7 +891,7 @@ class PatientLoginAPI(generics.GenericAPIView):
         if email:
             patient_query &= Q(email=email)
         if phone_number:
-            patient_query &= Q(phone_number__endswith=phone_number)    
+            patient_query &= Q(phone_key=phone_number)    
         
         try:
             user = User.objects.get(patient_query)